@@ -1,24 +1,18 @@
-from flask import Flask, render_template, request, send_from_directory, jsonify
+from flask import Flask, render_template, request, send_from_directory, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
-import numpy as np
-from io import BytesIO
-import base64
-from collections import Counter
-from datetime import datetime, timedelta
-from tensorflow.keras.models import load_model
-from keras.preprocessing.image import load_img, img_to_array
 import numpy as np
 import os
 import datetime
+import time
+import threading
 from werkzeug.utils import secure_filename  # Import secure_filename
-from sklearn.metrics import confusion_matrix, classification_report
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 from bson import ObjectId
+from bson.errors import InvalidId
+
+# TensorFlow/Keras and matplotlib are imported on first use (model loader thread,
+# chart workers), so importing this module stays fast; see scripts/profile_startup.py
 
 # Load environment variables
 load_dotenv()
@@ -26,7 +20,27 @@ load_dotenv()
 # Import authentication and database
 from routes.auth_routes import auth_bp
 from config.database import get_database
-from utils.auth import token_required, optional_token, decode_token
+from utils.auth import token_required, optional_token, decode_token, admin_required, is_admin, is_admin_user, token_cache
+from utils.inference import InferenceEngine
+from utils.worker_pool import InferenceWorkerPool, INFERENCE_WORKERS, is_worker_process
+from utils.preprocessing import IMAGE_SHAPE, preprocess_image, preprocess_batch, warmup_preprocessing
+from utils.model_registry import ModelRegistry, ModelNotReady, ModelReloadInProgress, MODEL_RELOAD_POLL_SECONDS
+from utils.upload_storage import SAVE_UPLOADS, save_upload_async
+from utils.prediction_cache import PredictionCache, PREDICTION_CACHE_PERSISTENT
+from utils.batch_jobs import BatchJobManager, ResultsNotPersisted
+from utils.persistence import write_behind, enqueue_prediction, enqueue_audit_log
+from utils.prediction_history import PredictionHistory, local_utc_offset
+from utils.chart_cache import ChartCache, make_etag, CHART_DEFAULT_DPI, CHART_MIN_DPI, CHART_MAX_DPI, CHART_FORMATS
+from utils.chart_rendering import ChartRenderer, prepare_chart_inputs, CHART_NAMES
+from utils import analytics
+from utils.analytics import parse_time_range
+from utils.user_stats import apply_rollups, summarize as summarize_user_stats
+from utils.export import EXPORT_FORMATS, export_query, stream_export
+from utils.pagination import (DEFAULT_HISTORY_PAGE_SIZE, encode_cursor, history_query, parse_fields,
+                              parse_history_args)
+from utils.metrics import (METRICS_ENABLED, metrics, http_requests, http_request_seconds, observe_stage,
+                           observe_stages)
+from utils.profiling import request_profiler
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -36,6 +50,12 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Reverse proxies in front of the app: request.remote_addr (login limits, audit logs)
+# is then the client from X-Forwarded-For instead of the proxy's own address
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+if TRUSTED_PROXY_COUNT > 0:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_COUNT, x_proto=TRUSTED_PROXY_COUNT)
+
 # CORS Configuration
 allowed_origins = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5173').split(',')
 CORS(app, resources={
@@ -51,33 +71,200 @@ CORS(app, resources={
 # Register authentication blueprint
 app.register_blueprint(auth_bp, url_prefix='/api/auth')
 
-# Create necessary directories
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+# Request counts and latency per route template, exposed on /metrics
+if METRICS_ENABLED:
+    def record_request(status):
+        start = g.pop('request_start', None)
+        if start is None:
+            return
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        http_requests.labels(request.method, route, str(status)).inc()
+        http_request_seconds.labels(request.method, route).observe(time.perf_counter() - start)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        record_request(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        # after_request is skipped for unhandled exceptions
+        if exc is not None:
+            record_request(500)
+
+# Opt-in profiling: X-Profile header with the admin token, or a sampled fraction
+# of PROFILE_ROUTES while enabled; results are listed under /api/admin/profiles
+def finish_profile(status):
+    session = g.pop('profile', None)
+    if session is None:
+        return None
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    return request_profiler.finish(session, request.method, route, status)
+
+@app.before_request
+def start_request_profile():
+    forced_mode = request.headers.get('X-Profile')
+    if forced_mode is not None and not is_admin(request.headers):
+        forced_mode = None
+    route = request.url_rule.rule if request.url_rule else None
+    g.profile = request_profiler.maybe_start(route, forced_mode)
+
+@app.after_request
+def finish_request_profile(response):
+    profile = finish_profile(response.status_code)
+    if profile is not None:
+        response.headers['X-Profile-Id'] = profile['id']
+    return response
+
+@app.teardown_request
+def finish_failed_profile(exc):
+    if exc is not None:
+        finish_profile(500)
+
+# Create necessary directories (uploads only when originals are persisted)
+if SAVE_UPLOADS:
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs('models', exist_ok=True)
 
 # Load the trained model
-MODEL_PATH = 'models/brain_tumor_model.h5'
-model = None
+MODEL_PATH = os.getenv('MODEL_PATH', 'models/brain_tumor_model.h5')
+MODEL_VERSION = os.getenv('MODEL_VERSION', 'brain_tumor_model_v1')
+# 'float' serves the Keras H5 model; 'quantized' the TFLite variant from scripts/quantize_model.py
+MODEL_VARIANT = os.getenv('MODEL_VARIANT', 'float')
+QUANTIZED_MODEL_PATH = os.getenv('QUANTIZED_MODEL_PATH', 'models/brain_tumor_model_quant.tflite')
+# Distilled student for "fast" triage (scripts/distill_student.py); falls back to the teacher
+STUDENT_MODEL_PATH = os.getenv('STUDENT_MODEL_PATH', 'models/brain_tumor_student.h5')
+STUDENT_MODEL_VERSION = os.getenv('STUDENT_MODEL_VERSION', 'brain_tumor_student_v1')
+FAST_MODE_CONFIDENCE_THRESHOLD = float(os.getenv('FAST_MODE_CONFIDENCE_THRESHOLD', 0.85))
+# Load models on a background thread: the server takes traffic at once and
+# /api/health/ready answers 503 until the main model is warmed up
+MODEL_LOAD_IN_BACKGROUND = os.getenv('MODEL_LOAD_IN_BACKGROUND', 'true').lower() == 'true'
 
-try:
-    model = load_model(MODEL_PATH)
-    print("✅ Model loaded successfully from:", MODEL_PATH)
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    print("⚠️ Application will run but predictions will fail")
+ACTIVE_MODEL_PATH = QUANTIZED_MODEL_PATH if MODEL_VARIANT == 'quantized' else MODEL_PATH
+
+student_model = None
+model_load_seconds = None
+
+# Repeat uploads of the same scan skip the forward pass
+prediction_cache = PredictionCache(
+    ACTIVE_MODEL_PATH,
+    f"{MODEL_VERSION}-{MODEL_VARIANT}",
+    collection_getter=(lambda: get_database().prediction_cache) if PREDICTION_CACHE_PERSISTENT else None
+)
+
+def load_model_file(path):
+    """Build the MODEL_VARIANT predictor for a model file: (predictor, Keras model or None)"""
+    if INFERENCE_WORKERS > 0:
+        # Inference runs in pinned worker processes; the web tier never loads the model
+        pool = InferenceWorkerPool(path, MODEL_VARIANT, num_workers=INFERENCE_WORKERS)
+        try:
+            pool.start()
+        except Exception:
+            pool.stop()
+            raise
+        return pool, None
+    if MODEL_VARIANT == 'quantized':
+        from utils.quantized_model import QuantizedModel
+        return QuantizedModel(path), None
+    
+    from tensorflow.keras.models import load_model
+    from utils.compiled_model import CompiledModel
+    keras_model = load_model(path)
+    # Fixed-signature graph instead of model.predict
+    return CompiledModel(keras_model), keras_model
+
+def cache_version(entry):
+    """Prediction cache tag of a model version: same format as the cache's own fingerprint"""
+    mtime_ns, size = entry.fingerprint
+    return f"{entry.version}-{MODEL_VARIANT}:{mtime_ns}:{size}"
+
+def on_model_activated(entry):
+    """Cached probabilities of the replaced version stop matching"""
+    prediction_cache.set_model_version(f"{entry.version}-{MODEL_VARIANT}", entry.path)
+
+# Active model version; hot reloads swap it without failing in-flight requests
+model_registry = ModelRegistry(
+    load_model_file,
+    concurrency=max(1, INFERENCE_WORKERS),
+    on_activate=on_model_activated
+)
+
+def load_models():
+    """Warm up preprocessing, activate the main model and load the student model"""
+    global student_model, model_load_seconds
+    start = time.perf_counter()
+    
+    try:
+        warmup_preprocessing()
+    except Exception as e:
+        print(f"⚠️ Error warming up preprocessing: {e}")
+    
+    try:
+        model_registry.load(ACTIVE_MODEL_PATH, MODEL_VERSION)
+    except Exception:
+        print("⚠️ Application will run but predictions will fail until a model loads (POST /api/model/reload)")
+    
+    if os.path.exists(STUDENT_MODEL_PATH):
+        try:
+            from tensorflow.keras.models import load_model
+            from utils.compiled_model import CompiledModel
+            student = CompiledModel(load_model(STUDENT_MODEL_PATH))
+            student.warmup()
+            student_model = student
+            print("✅ Student model loaded successfully from:", STUDENT_MODEL_PATH)
+        except Exception as e:
+            print(f"⚠️ Error loading student model: {e} (fast mode will use the main model)")
+    
+    model_load_seconds = time.perf_counter() - start
+    print(f"⏱️ Models loaded in {model_load_seconds:.1f}s")
+    
+    # Replacing the model file triggers a background load and swap
+    model_registry.watch(ACTIVE_MODEL_PATH, MODEL_RELOAD_POLL_SECONDS)
+
+# Spawned inference/chart workers re-import this module but never serve requests
+if not is_worker_process():
+    # Starts the writer now so spill files orphaned by a crashed process are replayed
+    write_behind.start()
+    if MODEL_LOAD_IN_BACKGROUND:
+        print("🔄 Loading model in background...")
+        threading.Thread(target=load_models, name='model-startup', daemon=True).start()
+    else:
+        load_models()
+
+# Seconds clients are told to wait (Retry-After) while the model is still loading
+MODEL_NOT_READY_RETRY_AFTER = int(os.getenv('MODEL_NOT_READY_RETRY_AFTER', 5))
+
+# Micro-batching engine for the student model (the main model's engine lives in its registry entry)
+student_engine = InferenceEngine(lambda batch: student_model(batch), name='student')
 
 # Class labels
 class_labels = ['glioma', 'meningioma', 'notumor', 'pituitary']
 
+# Images per forward pass for /api/predict/batch
+BATCH_INFERENCE_CHUNK_SIZE = int(os.getenv('BATCH_INFERENCE_CHUNK_SIZE', 32))
+
 # Define the uploads folder (backwards compatibility)
 UPLOAD_FOLDER = './uploads'
-if not os.path.exists(UPLOAD_FOLDER):
+if SAVE_UPLOADS and not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
-# Store prediction history (simple in-memory storage)
-prediction_history = []
+# Background executor for asynchronous batch jobs
+batch_job_manager = BatchJobManager(get_database)
+if not is_worker_process():
+    # Fails jobs whose process died mid-run, then keeps this process's jobs' heartbeats fresh
+    batch_job_manager.start()
+
+# Largest page of results returned by the batch job status endpoint
+MAX_JOB_RESULTS_PAGE_SIZE = 200
+
+# Recent predictions in a bounded columnar ring buffer (PREDICTION_HISTORY_CAPACITY)
+prediction_history = PredictionHistory()
 
 # ============================================================================
 # HELPER FUNCTIONS
@@ -195,58 +382,271 @@ def get_tumor_information(prediction, confidence):
         'tumorType': tumor_type
     }
 
-def save_prediction_to_db(user_info, prediction_data):
-    """Save prediction to MongoDB"""
+def get_client_info():
+    """Request metadata for audit logs (captured before handing work to background threads)"""
+    return {
+        'ipAddress': request.remote_addr,
+        'userAgent': request.headers.get('User-Agent')
+    }
+
+def save_prediction_to_db(user_info, prediction_data, client_info=None):
+    """Queue prediction for MongoDB (write-behind); returns the pre-assigned id"""
     try:
-        db = get_database()
+        client_info = client_info or get_client_info()
         
         # Add user information
         prediction_data['userId'] = ObjectId(user_info['user_id'])
         prediction_data['username'] = user_info['username']
         prediction_data['createdAt'] = datetime.datetime.utcnow()
         
-        # Insert into database
-        result = db.predictions.insert_one(prediction_data)
+        # Buffered and bulk-inserted off the request path
+        prediction_id = enqueue_prediction(prediction_data)
         
         # Log the prediction
-        db.audit_logs.insert_one({
+        enqueue_audit_log({
             'userId': ObjectId(user_info['user_id']),
             'username': user_info['username'],
             'action': 'prediction',
-            'ipAddress': request.remote_addr,
-            'userAgent': request.headers.get('User-Agent'),
+            'ipAddress': client_info['ipAddress'],
+            'userAgent': client_info['userAgent'],
             'timestamp': datetime.datetime.utcnow(),
             'details': {
-                'predictionId': str(result.inserted_id),
+                'predictionId': str(prediction_id),
                 'predictionType': prediction_data.get('predictionType'),
                 'tumorType': prediction_data.get('tumorType')
             }
         })
         
-        return str(result.inserted_id)
+        return str(prediction_id)
     except Exception as e:
         print(f"Error saving to database: {e}")
         return None
 
+def interpret_prediction(predictions):
+    """Turn one probability row into (result label, confidence)"""
+    predicted_class_index = int(np.argmax(predictions))
+    confidence_score = np.max(predictions)
+
+    if class_labels[predicted_class_index] == 'notumor':
+        return "No Tumor", confidence_score
+    else:
+        return f"Tumor: {class_labels[predicted_class_index]}", confidence_score
+
 # Helper function to predict tumor type
-def predict_tumor(image_path):
-    """Predict tumor from image"""
-    if model is None:
-        raise Exception("Model not loaded")
+def predict_tumor(image_source):
+    """Predict tumor from image (file path, file-like object or raw bytes)
+
+    Returns (result, confidence, probabilities, model version used).
+    """
+    # The version is pinned for the whole request, so a hot reload cannot swap it midway
+    with model_registry.acquire() as entry:
+        stage_start = time.perf_counter()
+        cache_key = None
+        predictions = None
+        if isinstance(image_source, (bytes, bytearray)):
+            # Keyed by the pinned version: the cache's own version only follows the swap
+            cache_key = prediction_cache.make_key(image_source, cache_version(entry))
+            predictions = prediction_cache.get(cache_key)
+            stage_start = observe_stage('cache_lookup', stage_start)
+
+        if predictions is None:
+            img_array = preprocess_image(image_source)
+            stage_start = observe_stage('decode', stage_start)
+
+            # Queued and batched with any concurrent requests
+            predictions = entry.engine.predict(img_array)
+            observe_stage('inference', stage_start)
+            if cache_key is not None:
+                prediction_cache.put(cache_key, predictions, f"{entry.version}-{MODEL_VARIANT}")
+
+        result, confidence_score = interpret_prediction(predictions)
+        return result, confidence_score, predictions, entry.version
+
+def predict_tumor_fast(image_source):
+    """Predict with the student model, falling back to the teacher when it is unsure
+
+    Returns (result, confidence, probabilities, model version used).
+    """
+    if student_model is None:
+        return predict_tumor(image_source)
+
+    stage_start = time.perf_counter()
+    img_array = preprocess_image(image_source)
+    stage_start = observe_stage('decode', stage_start)
+    predictions = student_engine.predict(img_array)
+    observe_stage('inference', stage_start)
+    result, confidence_score = interpret_prediction(predictions)
+
+    if confidence_score < FAST_MODE_CONFIDENCE_THRESHOLD:
+        # Low student confidence: defer to the full model
+        return predict_tumor(image_source)
+
+    return result, confidence_score, predictions, STUDENT_MODEL_VERSION
+
+def predict_tumor_batch(batch_array, chunk_size=BATCH_INFERENCE_CHUNK_SIZE):
+    """Predict a preprocessed (N, 128, 128, 3) batch in one chunked forward pass
+
+    Returns (probability rows, model version used).
+    """
+    with model_registry.acquire() as entry:
+        return entry.predictor.predict(batch_array, chunk_size=chunk_size), entry.version
+
+def build_single_prediction(filename, file_size, result, confidence, all_predictions,
+                            processing_time, mode, model_version):
+    """Build the database document and API response for one prediction"""
+    # Get tumor information
+    confidence_percentage = float(confidence * 100)
+    tumor_info = get_tumor_information(result, confidence_percentage)
+    probabilities = {
+        class_labels[i]: float(all_predictions[i]) 
+        for i in range(len(class_labels))
+    }
+
+    # Prepare prediction data for database
+    prediction_data = {
+        'predictionType': 'single',
+        'filename': filename,
+        'fileSize': file_size,
+        'prediction': result,
+        'tumorType': tumor_info['tumorType'],
+        'confidence': float(confidence),
+        'confidencePercentage': confidence_percentage,
+        'confidenceLevel': tumor_info['confidenceLevel'],
+        'severity': tumor_info['severity'],
+        'medicalDescription': tumor_info['description'],
+        'recommendations': tumor_info['recommendations'],
+        'processingTime': f"{processing_time:.3f}s",
+        'predictionMode': mode,
+        'modelVersion': model_version,
+        'modelVariant': MODEL_VARIANT,
+        'analysisDate': datetime.datetime.utcnow(),
+        'probabilities': probabilities
+    }
+
+    # Prepare response
+    response_data = {
+        'prediction': result,
+        'confidence': float(confidence),
+        'confidence_percentage': round(confidence_percentage, 2),
+        'tumorInfo': tumor_info,
+        'all_predictions': dict(probabilities),
+        'filename': filename,
+        'timestamp': datetime.datetime.now().isoformat(),
+        'processing_time': f"{processing_time:.3f}s",
+        'mode': mode,
+        'modelVersion': model_version
+    }
+    return prediction_data, response_data
+
+def record_single_prediction(user_info, prediction_data, response_data, client_info=None):
+    """Persist a prediction, add it to the in-memory history and return the response"""
+    # Save to database
+    prediction_id = save_prediction_to_db(user_info, prediction_data, client_info)
+
+    # Add to prediction history (backwards compatibility)
+    prediction_history.append(
+        prediction_data['prediction'], prediction_data['confidence'], 'api', prediction_data['filename']
+    )
+
+    return {**response_data, 'predictionId': prediction_id}
+
+def build_batch_entries(batch_id, user_info, filenames, file_sizes, all_batch_predictions,
+                        per_image_time, model_version, image_indexes=None):
+    """Turn a batch of probability rows into API results and batch_results documents"""
+    user_id = ObjectId(user_info['user_id'])
+    created_at = datetime.datetime.utcnow()
+    results = []
+    batch_documents = []
+    
+    for offset, (filename, file_size, all_predictions) in enumerate(zip(filenames, file_sizes, all_batch_predictions)):
+        result, confidence = interpret_prediction(all_predictions)
+        confidence_percentage = float(confidence * 100)
+        tumor_info = get_tumor_information(result, confidence_percentage)
+        probabilities = {
+            class_labels[i]: float(all_predictions[i]) 
+            for i in range(len(class_labels))
+        }
+        
+        batch_documents.append({
+            'batchId': batch_id,
+            'imageIndex': image_indexes[offset] if image_indexes else offset,
+            'userId': user_id,
+            'username': user_info['username'],
+            'filename': filename,
+            'fileSize': file_size,
+            'prediction': result,
+            'tumorType': tumor_info['tumorType'],
+            'confidence': float(confidence),
+            'confidencePercentage': confidence_percentage,
+            'severity': tumor_info['severity'],
+            'probabilities': probabilities,
+            'processingTime': f"{per_image_time:.3f}s",
+            'modelVersion': model_version,
+            'createdAt': created_at
+        })
+        
+        results.append({
+            "filename": filename,
+            "prediction": result,
+            "confidence": f"{confidence*100:.2f}%",
+            "confidence_percentage": confidence_percentage,
+            "confidence_score": float(confidence),
+            "processing_time": f"{per_image_time:.3f}s",
+            "probabilities": probabilities
+        })
     
-    IMAGE_SIZE = 128
-    img = load_img(image_path, target_size=(IMAGE_SIZE, IMAGE_SIZE))
-    img_array = img_to_array(img) / 255.0  # Normalize pixel values
-    img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
+    return results, batch_documents
 
-    predictions = model.predict(img_array)
-    predicted_class_index = np.argmax(predictions, axis=1)[0]
-    confidence_score = np.max(predictions, axis=1)[0]
+def record_batch_history(results):
+    """Add a batch's per-image results to the in-memory history"""
+    prediction_history.extend(
+        [r['prediction'] for r in results],
+        [r['confidence_score'] for r in results],
+        'batch_api',
+        [r['filename'] for r in results]
+    )
 
-    if class_labels[predicted_class_index] == 'notumor':
-        return "No Tumor", confidence_score, predictions[0]
-    else:
-        return f"Tumor: {class_labels[predicted_class_index]}", confidence_score, predictions[0]
+def summarize_batch(predictions, tumor_types, confidences):
+    """Batch summary: detections, per-type counts and average confidence"""
+    tumor_detected = sum(1 for p in predictions if "No Tumor" not in p)
+    tumor_type_counts = {}
+    for tumor_type in tumor_types:
+        if tumor_type != 'notumor':
+            tumor_type_counts[tumor_type] = tumor_type_counts.get(tumor_type, 0) + 1
+    
+    avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+    
+    return {
+        "tumor_detected": tumor_detected,
+        "no_tumor": len(predictions) - tumor_detected,
+        "average_confidence": f"{avg_confidence*100:.2f}%",
+        "by_tumor_type": tumor_type_counts
+    }
+
+def get_health_status():
+    """System status shared by the Flask and ASGI health endpoints"""
+    db_status = "connected"
+    try:
+        db = get_database()
+        db.command('ping')
+    except:
+        db_status = "disconnected"
+    
+    return {
+        "status": "healthy",
+        "ready": model_registry.status == 'ready',
+        "model_status": model_registry.status,
+        "model_version": model_registry.version,
+        "model_load_seconds": model_load_seconds,
+        "model_loaded": model_registry.current() is not None,
+        "model_variant": MODEL_VARIANT,
+        "student_model_loaded": student_model is not None,
+        "database": db_status,
+        "timestamp": datetime.datetime.now().isoformat(),
+        "upload_folder": UPLOAD_FOLDER,
+        "upload_folder_exists": os.path.exists(UPLOAD_FOLDER),
+        "save_uploads": SAVE_UPLOADS
+    }
 
 def clean_for_json(obj):
     """Convert numpy types to Python types for JSON serialization"""
@@ -262,6 +662,81 @@ def clean_for_json(obj):
         return int(obj)
     return obj
 
+def get_analytics_summary(user_id):
+    """User's totals and tumor distribution from one point read of user_stats, plus its recent predictions"""
+    db = get_database()
+    rollup = db.user_stats.find_one({'_id': user_id}, {'appliedIds': 0})
+    
+    # The rollup keeps only the ids; fetch those few documents by _id
+    recent_ids = (rollup or {}).get('recentPredictionIds', [])
+    recent = list(db.predictions.find({'_id': {'$in': recent_ids}}).sort('createdAt', -1)) if recent_ids else []
+    for item in recent:
+        item['_id'] = str(item['_id'])
+        item['userId'] = str(item['userId'])
+        if 'batchId' in item:
+            item['batchId'] = str(item['batchId'])
+    
+    return clean_for_json(summarize_user_stats(rollup, recent))
+
+def get_analytics_summary_fallback():
+    """Analytics summary from the in-memory history (database unavailable)"""
+    if not prediction_history:
+        return {
+            "total_predictions": 0,
+            "message": "No predictions made yet"
+        }
+    
+    total = len(prediction_history)
+    tumor_count = prediction_history.tumor_count()
+    no_tumor_count = total - tumor_count
+    
+    return clean_for_json({
+        "total_predictions": total,
+        "tumor_detected": tumor_count,
+        "no_tumor_detected": no_tumor_count,
+        "tumor_detection_rate": f"{(tumor_count/total)*100:.1f}%" if total > 0 else "0%",
+        "recent_predictions": prediction_history.recent(5)
+    })
+
+def get_predictions_history(user_id, limit=DEFAULT_HISTORY_PAGE_SIZE, cursor=None, projection=None,
+                            tumor_type=None, start=None, end=None):
+    """One keyset page of the user's predictions from MongoDB, newest first"""
+    db = get_database()
+    
+    # One extra row tells us whether another page exists
+    predictions = list(db.predictions.find(
+        history_query(user_id, cursor, tumor_type, start, end),
+        projection or parse_fields(None)
+    ).sort([('createdAt', -1), ('_id', -1)]).limit(limit + 1))
+    
+    has_more = len(predictions) > limit
+    predictions = predictions[:limit]
+    next_cursor = encode_cursor(predictions[-1]['createdAt'], predictions[-1]['_id']) if has_more else None
+    
+    # Convert ObjectId to string
+    for pred in predictions:
+        pred['_id'] = str(pred['_id'])
+        if 'userId' in pred:
+            pred['userId'] = str(pred['userId'])
+        if 'batchId' in pred:
+            pred['batchId'] = str(pred['batchId'])
+    
+    return {
+        'total': len(predictions),
+        'predictions': predictions,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'limit': limit
+    }
+
+def get_predictions_history_fallback(limit=10):
+    """Recent predictions from the in-memory history (database unavailable)"""
+    return clean_for_json({
+        "total_predictions": len(prediction_history),
+        "recent_predictions": prediction_history.recent(limit),
+        "limit": limit
+    })
+
 # ============================================================================
 # EXISTING ROUTES (Unchanged)
 # ============================================================================
@@ -286,11 +761,17 @@ def index():
         "endpoints": {
             "/": "GET - API Documentation",
             "/test": "GET/POST - Web Interface for Testing",
-            "/api/predict": "POST - Analyze single brain scan image [PROTECTED]",
+            "/api/predict": "POST - Analyze single brain scan image (mode=fast uses the distilled student) [PROTECTED]",
             "/api/predict/batch": "POST - Analyze multiple brain scan images [PROTECTED]",
+            "/api/predict/batch/jobs": "POST - Submit an asynchronous batch job, returns a job id [PROTECTED]",
+            "/api/predict/batch/jobs/<job_id>": "GET - Batch job progress and paginated results [PROTECTED]",
             "/api/health": "GET - Health check and system status",
             "/api/classes": "GET - Available tumor classes",
             "/api/model/info": "GET - Model information and configuration",
+            "/api/inference/stats": "GET - Micro-batching queue depth and batch-size histogram",
+            "/api/cache/stats": "GET - Prediction cache hit/miss counters",
+            "/api/inference/workers": "GET - Inference worker pool health",
+            "/api/persistence/stats": "GET - Write-behind persistence queue and spill counters",
             "/api/debug/prediction": "POST - Detailed prediction analysis",
             "/api/debug/class-order": "GET - Test different class interpretations",
             "/api/analytics/summary": "GET - Prediction statistics [PROTECTED]",
@@ -348,21 +829,16 @@ def test_interface():
         # Handle file upload
         file = request.files['file']
         if file:
-            # Save the file
+            # Decode in memory; saving the original happens in the background
+            image_bytes = file.read()
             file_location = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-            file.save(file_location)
+            save_upload_async(image_bytes, file_location)
 
             # Predict the tumor
-            result, confidence, all_predictions = predict_tumor(file_location)
+            result, confidence, all_predictions, _ = predict_tumor(image_bytes)
             
             # Store in history
-            prediction_history.append({
-                "timestamp": datetime.datetime.now().isoformat(),
-                "filename": file.filename,
-                "result": result,
-                "confidence": float(confidence),  # Convert to Python float
-                "method": "web_interface"
-            })
+            prediction_history.append(result, float(confidence), 'web_interface', file.filename)
 
             # Return result along with image path for display
             return render_template('index.html', result=result, confidence=f"{confidence*100:.2f}%", file_path=f'/uploads/{file.filename}')
@@ -378,11 +854,18 @@ def get_uploaded_file(filename):
 # UPDATED API ENDPOINTS (With Authentication)
 # ============================================================================
 
+def model_not_ready(message):
+    """503 while no model version is active (startup load or a failed first load)"""
+    response = jsonify({"error": message, "model_status": model_registry.status})
+    response.headers['Retry-After'] = str(MODEL_NOT_READY_RETRY_AFTER)
+    return response, 503
+
 @app.route('/api/predict', methods=['POST'])
 @token_required  # NEW: Authentication required
 def predict():
     """Single image prediction - PROTECTED"""
     try:
+        stage_start = time.perf_counter()
         if 'image' not in request.files:
             return jsonify({'error': 'No image file provided'}), 400
         
@@ -390,77 +873,36 @@ def predict():
         if file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
 
-        # Save uploaded file
+        # Read upload into memory; saving the original happens in the background
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        image_bytes = file.read()
+        save_upload_async(image_bytes, os.path.join(app.config['UPLOAD_FOLDER'], filename))
 
         # Get file size
-        file_size = os.path.getsize(filepath)
-
-        # Make prediction
-        start_time = datetime.datetime.now()
-        result, confidence, all_predictions = predict_tumor(filepath)
-        end_time = datetime.datetime.now()
-        processing_time = (end_time - start_time).total_seconds()
-
-        # Get tumor information
-        confidence_percentage = float(confidence * 100)
-        tumor_info = get_tumor_information(result, confidence_percentage)
+        file_size = len(image_bytes)
+        start_time = observe_stage('upload', stage_start)
 
-        # Prepare prediction data for database
-        prediction_data = {
-            'predictionType': 'single',
-            'filename': filename,
-            'fileSize': file_size,
-            'prediction': result,
-            'tumorType': tumor_info['tumorType'],
-            'confidence': float(confidence),
-            'confidencePercentage': confidence_percentage,
-            'confidenceLevel': tumor_info['confidenceLevel'],
-            'severity': tumor_info['severity'],
-            'medicalDescription': tumor_info['description'],
-            'recommendations': tumor_info['recommendations'],
-            'processingTime': f"{processing_time:.3f}s",
-            'modelVersion': 'brain_tumor_model_v1',
-            'analysisDate': datetime.datetime.utcnow(),
-            'probabilities': {
-                class_labels[i]: float(all_predictions[i]) 
-                for i in range(len(class_labels))
-            }
-        }
-
-        # Save to database
-        prediction_id = save_prediction_to_db(request.current_user, prediction_data)
-
-        # Add to prediction history (backwards compatibility)
-        prediction_history.append({
-            'prediction': result,
-            'confidence': float(confidence),
-            'result': result,
-            'method': 'api',
-            'timestamp': datetime.datetime.now().isoformat(),
-            'filename': filename
-        })
+        # Make prediction ('fast' mode tries the distilled student first)
+        mode = request.form.get('mode', request.args.get('mode', 'standard'))
+        if mode == 'fast':
+            result, confidence, all_predictions, model_version = predict_tumor_fast(image_bytes)
+        else:
+            result, confidence, all_predictions, model_version = predict_tumor(image_bytes)
+        processing_time = time.perf_counter() - start_time
 
-        # Prepare response
-        response_data = {
-            'prediction': result,
-            'confidence': float(confidence),
-            'confidence_percentage': round(confidence_percentage, 2),
-            'tumorInfo': tumor_info,
-            'all_predictions': {
-                class_labels[i]: float(all_predictions[i]) 
-                for i in range(len(class_labels))
-            },
-            'filename': filename,
-            'timestamp': datetime.datetime.now().isoformat(),
-            'processing_time': f"{processing_time:.3f}s",
-            'predictionId': prediction_id
-        }
+        prediction_data, response_data = build_single_prediction(
+            filename, file_size, result, confidence, all_predictions, processing_time, mode, model_version
+        )
+        stage_start = time.perf_counter()
+        response_data = record_single_prediction(request.current_user, prediction_data, response_data)
+        stage_start = observe_stage('db_write', stage_start)
 
-        return jsonify(response_data)
+        response = jsonify(response_data)
+        observe_stage('serialization', stage_start)
+        return response
 
+    except ModelNotReady as e:
+        return model_not_ready(str(e))
     except Exception as e:
         print(f"ERROR in predict endpoint: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -468,21 +910,13 @@ def predict():
 @app.route('/api/health', methods=['GET'])
 def api_health():
     """Health check with database status"""
-    db_status = "connected"
-    try:
-        db = get_database()
-        db.command('ping')
-    except:
-        db_status = "disconnected"
-    
-    return jsonify({
-        "status": "healthy",
-        "model_loaded": model is not None,
-        "database": db_status,
-        "timestamp": datetime.datetime.now().isoformat(),
-        "upload_folder": UPLOAD_FOLDER,
-        "upload_folder_exists": os.path.exists(UPLOAD_FOLDER)
-    })
+    return jsonify(get_health_status())
+
+@app.route('/api/health/ready', methods=['GET'])
+def api_health_ready():
+    """Readiness probe: 200 once the model is loaded and warmed up, else 503"""
+    body = {"ready": model_registry.status == 'ready', "model_status": model_registry.status}
+    return jsonify(body), 200 if body["ready"] else 503
 
 @app.route('/api/classes', methods=['GET'])
 def api_classes():
@@ -499,16 +933,196 @@ def api_classes():
 
 @app.route('/api/model/info', methods=['GET'])
 def api_model_info():
+    active = model_registry.current()
     return jsonify({
         "model_type": "Brain Tumor Classification CNN (VGG16 Transfer Learning)",
         "input_size": [128, 128, 3],
         "classes": class_labels,
-        "total_parameters": model.count_params() if model and hasattr(model, 'count_params') else "Unknown",
-        "model_format": "Keras H5",
+        "total_parameters": active.count_params() if active else "Unknown",
+        "model_format": "TFLite (quantized)" if MODEL_VARIANT == 'quantized' else "Keras H5",
+        "model_variant": MODEL_VARIANT,
+        "model_version": active.version if active else None,
         "preprocessing": "Normalization (0-1 range)",
         "framework": "TensorFlow/Keras"
     })
 
+@app.route('/api/inference/stats', methods=['GET'])
+def api_inference_stats():
+    """Inference engine statistics for tuning batch size and wait window"""
+    active = model_registry.current()
+    if active is None:
+        return model_not_ready(f"Model not loaded ({model_registry.status})")
+    return jsonify({"modelVersion": active.version, **active.engine.get_stats()})
+
+@app.route('/api/inference/workers', methods=['GET'])
+def api_inference_workers():
+    """Inference worker pool health"""
+    active = model_registry.current()
+    if active is None or not isinstance(active.predictor, InferenceWorkerPool):
+        return jsonify({"enabled": False, "workers": 0})
+    return jsonify({"enabled": True, **active.predictor.get_stats()})
+
+@app.route('/api/model/registry', methods=['GET'])
+def api_model_registry():
+    """Active model version, in-progress load, retiring versions and recent load attempts"""
+    return jsonify(model_registry.get_stats())
+
+@app.route('/api/model/reload', methods=['POST'])
+@admin_required
+def api_model_reload():
+    """Load a model file in the background and swap it in once warmed up - ADMIN"""
+    data = request.get_json(silent=True) or {}
+    path = os.path.abspath(data.get('path') or ACTIVE_MODEL_PATH)
+    # Only files next to the configured model can be loaded
+    model_dir = os.path.dirname(os.path.abspath(ACTIVE_MODEL_PATH))
+    if os.path.dirname(os.path.realpath(path)) != os.path.realpath(model_dir):
+        return jsonify({"error": f"Model files must be in {model_dir}"}), 400
+    if not os.path.isfile(path):
+        return jsonify({"error": f"Model file not found: {path}"}), 404
+    
+    version = data.get('version') or None
+    if data.get('wait'):
+        try:
+            entry = model_registry.load(path, version)
+        except ModelReloadInProgress as e:
+            return jsonify({"error": str(e)}), 409
+        except Exception as e:
+            return jsonify({"error": f"Model load failed, previous version still active: {e}"}), 500
+        return jsonify({"status": "activated", "model": entry.to_dict()})
+    
+    if not model_registry.load_async(path, version):
+        return jsonify({"error": "A model load is already in progress"}), 409
+    return jsonify({"status": "loading", "path": path}), 202
+
+@app.route('/api/persistence/stats', methods=['GET'])
+def api_persistence_stats():
+    """Write-behind queue depth, flush and spill counters"""
+    return jsonify(write_behind.get_stats())
+
+def collect_runtime_metrics():
+    """Cache, queue, history and model gauges, read from existing stats at scrape time"""
+    caches = {}
+    prediction_stats = prediction_cache.get_stats()
+    caches['prediction'] = (prediction_stats['hits'], prediction_stats['misses'], prediction_stats['size'])
+    chart_stats = chart_cache.get_stats()
+    caches['chart'] = (chart_stats['hits'] + chart_stats['staleHits'], chart_stats['misses'], chart_stats['entries'])
+    token_stats = token_cache.get_stats()
+    caches['jwt'] = (token_stats['hits'], token_stats['misses'] + token_stats['expired'], token_stats['entries'])
+    
+    yield ('cache_requests_total', 'counter', 'Cache lookups by cache and result', [
+        sample for name, (hits, misses, _) in caches.items()
+        for sample in (({'cache': name, 'result': 'hit'}, hits), ({'cache': name, 'result': 'miss'}, misses))
+    ])
+    yield ('cache_hit_ratio', 'gauge', 'Hits over lookups since start', [
+        ({'cache': name}, hits / (hits + misses) if hits + misses else 0.0)
+        for name, (hits, misses, _) in caches.items()
+    ])
+    yield ('cache_entries', 'gauge', 'Entries currently cached', [
+        ({'cache': name}, entries) for name, (_, _, entries) in caches.items()
+    ])
+    
+    yield ('prediction_history_entries', 'gauge', 'Predictions held in the in-memory history',
+           [({}, len(prediction_history))])
+    yield ('prediction_history_capacity', 'gauge', 'Size of the in-memory history ring buffer',
+           [({}, prediction_history.capacity)])
+    yield ('prediction_history_bytes', 'gauge', 'Memory held by the in-memory history columns',
+           [({}, prediction_history.nbytes())])
+    
+    engines = [('student', student_engine)]
+    active = model_registry.current()
+    if active is not None:
+        engines.append(('main', active.engine))
+    yield ('inference_queue_depth', 'gauge', 'Images waiting for a micro-batch',
+           [({'engine': name}, engine.get_stats()['queueDepth']) for name, engine in engines])
+    
+    persistence_stats = write_behind.get_stats()
+    yield ('write_behind_queue_depth', 'gauge', 'Documents waiting for the next bulk write',
+           [({}, persistence_stats['queueDepth'])])
+    yield ('write_behind_documents_total', 'counter', 'Write-behind documents by outcome', [
+        ({'outcome': outcome}, persistence_stats[outcome])
+        for outcome in ('enqueued', 'written', 'spilled', 'replayed', 'errors')
+    ])
+    
+    yield ('model_ready', 'gauge', '1 once a model version is active', [({}, int(active is not None))])
+    if active is not None:
+        yield ('model_info', 'gauge', 'Active model version', [
+            ({'version': active.version, 'variant': MODEL_VARIANT}, 1)
+        ])
+
+metrics.add_collector(collect_runtime_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format)"""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=false)"}), 404
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/admin/profiling', methods=['GET', 'POST'])
+@admin_required
+def api_admin_profiling():
+    """Show or change request profiling (enabled, sampleRate, mode, routes) - ADMIN"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            request_profiler.configure(
+                enabled=data.get('enabled'),
+                sample_rate=data.get('sampleRate'),
+                mode=data.get('mode'),
+                routes=data.get('routes')
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": str(e)}), 400
+    return jsonify(request_profiler.get_config())
+
+@app.route('/api/admin/profiles', methods=['GET'])
+@admin_required
+def api_admin_profiles():
+    """Stored profiles, newest first - ADMIN"""
+    profiles = request_profiler.list_profiles()
+    return jsonify({"profiles": profiles, "count": len(profiles)})
+
+@app.route('/api/admin/profiles/<profile_id>', methods=['GET'])
+@admin_required
+def api_admin_profile_download(profile_id):
+    """Download a profile: pstats file (cprofile) or collapsed stacks (sampling) - ADMIN"""
+    try:
+        _, path = request_profiler.get_profile(profile_id)
+    except KeyError:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_from_directory(os.path.abspath(os.path.dirname(path)), os.path.basename(path), as_attachment=True)
+
+@app.route('/api/admin/profiles/<profile_id>/flamegraph', methods=['GET'])
+@admin_required
+def api_admin_profile_flamegraph(profile_id):
+    """Collapsed stacks for flamegraph.pl / speedscope - ADMIN"""
+    try:
+        collapsed = request_profiler.collapsed_stacks(profile_id)
+    except KeyError:
+        return jsonify({"error": "Profile not found"}), 404
+    return Response(collapsed, content_type='text/plain; charset=utf-8',
+                    headers={'Content-Disposition': f'attachment; filename={profile_id}.folded'})
+
+@app.route('/api/admin/profiles/<profile_id>/top', methods=['GET'])
+@admin_required
+def api_admin_profile_top(profile_id):
+    """Functions by cumulative time for a cprofile capture - ADMIN"""
+    try:
+        limit = min(max(1, int(request.args.get('limit', 30))), 500)
+        top = request_profiler.top_functions(profile_id, limit)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    except KeyError:
+        return jsonify({"error": "Profile not found"}), 404
+    if top is None:
+        return jsonify({"error": "Only available for cprofile captures; use /flamegraph for sampling"}), 400
+    return jsonify({"id": profile_id, "functions": top})
+
+@app.route('/api/cache/stats', methods=['GET'])
+def api_cache_stats():
+    """Prediction cache hit/miss counters"""
+    return jsonify(prediction_cache.get_stats())
+
 @app.route('/api/debug/prediction', methods=['POST'])
 @optional_token  # NEW: Optional authentication
 def api_debug_prediction():
@@ -519,11 +1133,11 @@ def api_debug_prediction():
         
         file = request.files['image']
         filename = secure_filename(file.filename)
-        file_location = os.path.join(app.config['UPLOAD_FOLDER'], f"debug_{filename}")
-        file.save(file_location)
+        image_bytes = file.read()
+        save_upload_async(image_bytes, os.path.join(app.config['UPLOAD_FOLDER'], f"debug_{filename}"))
         
         # Get detailed prediction info
-        result, confidence, all_predictions = predict_tumor(file_location)
+        result, confidence, all_predictions, model_version = predict_tumor(image_bytes)
         
         user_info = None
         if hasattr(request, 'current_user'):
@@ -541,6 +1155,7 @@ def api_debug_prediction():
                 } for i in range(len(class_labels))
             },
             "predicted_class_index": int(np.argmax(all_predictions)),
+            "model_version": model_version,
             "debug_info": {
                 "max_probability": float(np.max(all_predictions)),
                 "min_probability": float(np.min(all_predictions)),
@@ -566,113 +1181,139 @@ def api_debug_class_order():
 def api_analytics_summary():
     """Get user's analytics summary - PROTECTED"""
     try:
-        db = get_database()
-        user_id = ObjectId(request.current_user['user_id'])
-        
-        # Total predictions from database
-        total_predictions = db.predictions.count_documents({'userId': user_id})
-        
-        # Tumor type distribution
-        pipeline = [
-            {'$match': {'userId': user_id, 'tumorType': {'$exists': True}}},
-            {'$group': {'_id': '$tumorType', 'count': {'$sum': 1}}}
-        ]
-        tumor_distribution = list(db.predictions.aggregate(pipeline))
-        
-        # Recent activity
-        recent = list(db.predictions.find(
-            {'userId': user_id}
-        ).sort('createdAt', -1).limit(5))
-        
-        for item in recent:
-            item['_id'] = str(item['_id'])
-            item['userId'] = str(item['userId'])
-        
-        return jsonify({
-            'totalPredictions': total_predictions,
-            'tumorDistribution': {item['_id']: item['count'] for item in tumor_distribution},
-            'recentActivity': recent
-        })
-        
+        return jsonify(get_analytics_summary(ObjectId(request.current_user['user_id'])))
     except Exception as e:
         # Fallback to in-memory data if database fails
-        if not prediction_history:
-            return jsonify({
-                "total_predictions": 0,
-                "message": "No predictions made yet"
-            })
-        
-        total = len(prediction_history)
-        tumor_count = sum(1 for p in prediction_history if "No Tumor" not in p["result"])
-        no_tumor_count = total - tumor_count
-        
-        recent_predictions = prediction_history[-5:] if len(prediction_history) >= 5 else prediction_history
-        cleaned_predictions = []
-        
-        for pred in recent_predictions:
-            cleaned_pred = {
-                "timestamp": pred["timestamp"],
-                "filename": pred["filename"],
-                "result": pred["result"],
-                "confidence": float(pred["confidence"]),
-                "method": pred["method"]
-            }
-            cleaned_predictions.append(cleaned_pred)
-        
-        return jsonify(clean_for_json({
-            "total_predictions": total,
-            "tumor_detected": tumor_count,
-            "no_tumor_detected": no_tumor_count,
-            "tumor_detection_rate": f"{(tumor_count/total)*100:.1f}%" if total > 0 else "0%",
-            "recent_predictions": cleaned_predictions
-        }))
+        return jsonify(get_analytics_summary_fallback())
+
+def analytics_filters():
+    """(user_id, start, end) from ?scope=me|all&start=&end=; raises ValueError, PermissionError (scope=all for non-admins)"""
+    scope = request.args.get('scope', 'me')
+    if scope not in ('me', 'all'):
+        raise ValueError("scope must be 'me' or 'all'")
+    if scope == 'all' and not is_admin_user(request.current_user, request.headers):
+        raise PermissionError("scope=all requires an admin account")
+    user_id = ObjectId(request.current_user['user_id']) if scope == 'me' else None
+    start, end = parse_time_range(request.args)
+    return user_id, start, end
+
+@app.route('/api/analytics/statistics', methods=['GET'])
+@token_required
+def api_analytics_statistics():
+    """Confidence/class statistics aggregated in MongoDB over predictions and batch results - PROTECTED"""
+    try:
+        user_id, start, end = analytics_filters()
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        stats = analytics.get_statistics(get_database(), user_id, start, end)
+        if stats is None:
+            return jsonify({"error": "No prediction data available"}), 404
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/analytics/class-distribution', methods=['GET'])
+@token_required
+def api_analytics_class_distribution():
+    """Per-class counts aggregated in MongoDB - PROTECTED"""
+    try:
+        user_id, start, end = analytics_filters()
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify({"distribution": analytics.get_class_distribution(get_database(), user_id, start, end)})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/analytics/timeline', methods=['GET'])
+@token_required
+def api_analytics_timeline():
+    """Predictions per hour or day, paged (?bucket=hour|day&page=&per_page=) - PROTECTED"""
+    try:
+        user_id, start, end = analytics_filters()
+        bucket = request.args.get('bucket', 'hour')
+        if bucket not in analytics.TIMELINE_BUCKETS:
+            raise ValueError(f"bucket must be one of {list(analytics.TIMELINE_BUCKETS)}")
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(max(1, int(request.args.get('per_page', 168))), analytics.MAX_TIMELINE_PAGE_SIZE)
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(analytics.get_timeline(get_database(), user_id, start, end, bucket, page, per_page))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/analytics/confidence-histogram', methods=['GET'])
+@token_required
+def api_analytics_confidence_histogram():
+    """Confidence histogram aggregated in MongoDB (?bins=) - PROTECTED"""
+    try:
+        user_id, start, end = analytics_filters()
+        bins = min(max(1, int(request.args.get('bins', 20))), 100)
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(analytics.get_confidence_histogram(get_database(), user_id, start, end, bins))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def export_response(collection):
+    """Stream ``collection`` as NDJSON or CSV with ?format=&scope=&start=&end=&tumor_type=&batch_id="""
+    try:
+        user_id, start, end = analytics_filters()
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"format must be one of {list(EXPORT_FORMATS)}")
+        batch_id = ObjectId(request.args['batch_id']) if request.args.get('batch_id') else None
+    except PermissionError as e:
+        return jsonify({"error": str(e)}), 403
+    except (ValueError, InvalidId) as e:
+        return jsonify({"error": str(e)}), 400
+    
+    query = export_query(user_id, start, end, request.args.get('tumor_type'), batch_id)
+    include_identity = is_admin_user(request.current_user, request.headers)
+    filename = f"{collection}_{datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{fmt}"
+    return Response(
+        stream_with_context(stream_export(get_database(), collection, query, fmt, include_identity)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/api/export/predictions', methods=['GET'])
+@token_required
+def api_export_predictions():
+    """Stream predictions as NDJSON or CSV - PROTECTED"""
+    return export_response('predictions')
+
+@app.route('/api/export/batch-results', methods=['GET'])
+@token_required
+def api_export_batch_results():
+    """Stream per-image batch results as NDJSON or CSV - PROTECTED"""
+    return export_response('batch_results')
 
 @app.route('/api/predictions/history', methods=['GET'])
 @token_required  # NEW: Authentication required
 def api_predictions_history():
-    """Get user's prediction history - PROTECTED"""
+    """Get user's prediction history, keyset-paginated (?cursor=&limit=&fields=&tumor_type=&start=&end=) - PROTECTED"""
     try:
-        db = get_database()
-        limit = int(request.args.get('limit', 20))
-        
-        predictions = list(db.predictions.find(
-            {'userId': ObjectId(request.current_user['user_id'])},
-            {'password': 0}
-        ).sort('createdAt', -1).limit(limit))
-        
-        # Convert ObjectId to string
-        for pred in predictions:
-            pred['_id'] = str(pred['_id'])
-            pred['userId'] = str(pred['userId'])
-            if 'batchId' in pred:
-                pred['batchId'] = str(pred['batchId'])
-        
-        return jsonify({
-            'total': len(predictions),
-            'predictions': predictions
-        })
-        
+        history_args = parse_history_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(get_predictions_history(ObjectId(request.current_user['user_id']), **history_args))
     except Exception as e:
         # Fallback to in-memory data
         limit = request.args.get('limit', 10, type=int)
-        recent_predictions = prediction_history[-limit:] if prediction_history else []
-        cleaned_predictions = []
-        
-        for pred in recent_predictions:
-            cleaned_pred = {
-                "timestamp": pred["timestamp"],
-                "filename": pred["filename"],
-                "result": pred["result"],
-                "confidence": float(pred["confidence"]),
-                "method": pred["method"]
-            }
-            cleaned_predictions.append(cleaned_pred)
-        
-        return jsonify(clean_for_json({
-            "total_predictions": len(prediction_history),
-            "recent_predictions": cleaned_predictions,
-            "limit": limit
-        }))
+        return jsonify(get_predictions_history_fallback(limit))
 
 # Batch prediction - PROTECTED
 @app.route('/api/predict/batch', methods=['POST'])
@@ -685,89 +1326,63 @@ def api_predict_batch():
         if not files or len(files) == 0:
             return jsonify({"error": "No images provided"}), 400
         
-        results = []
-        tumor_types = []
         batch_id = ObjectId()  # Generate batch ID
+        stage_times = {}
+        batch_start = time.perf_counter()
         
+        # Stage 1: receive uploads
+        stage_start = time.perf_counter()
+        filenames = []
+        image_buffers = []
+        file_sizes = []
         for file in files:
             if file.filename == '':
                 continue
             
             filename = secure_filename(file.filename)
-            file_location = os.path.join(app.config['UPLOAD_FOLDER'], f"batch_{filename}")
-            file.save(file_location)
-            
-            file_size = os.path.getsize(file_location)
-            
-            # Predict
-            start_time = datetime.datetime.now()
-            result, confidence, all_predictions = predict_tumor(file_location)
-            end_time = datetime.datetime.now()
-            processing_time = (end_time - start_time).total_seconds()
-            
-            confidence_percentage = float(confidence * 100)
-            tumor_info = get_tumor_information(result, confidence_percentage)
-            
-            # Track tumor types
-            if tumor_info['tumorType'] != 'notumor':
-                tumor_types.append(tumor_info['tumorType'])
-            
-            # Save individual result to batch_results collection
-            try:
-                db = get_database()
-                db.batch_results.insert_one({
-                    'batchId': batch_id,
-                    'userId': ObjectId(request.current_user['user_id']),
-                    'username': request.current_user['username'],
-                    'filename': filename,
-                    'fileSize': file_size,
-                    'prediction': result,
-                    'tumorType': tumor_info['tumorType'],
-                    'confidence': float(confidence),
-                    'confidencePercentage': confidence_percentage,
-                    'severity': tumor_info['severity'],
-                    'processingTime': f"{processing_time:.3f}s",
-                    'createdAt': datetime.datetime.utcnow()
-                })
-            except Exception as db_error:
-                print(f"Error saving batch result: {db_error}")
-            
-            # Add to in-memory history
-            prediction_history.append({
-                "timestamp": datetime.datetime.now().isoformat(),
-                "filename": filename,
-                "result": result,
-                "confidence": float(confidence),
-                "method": "batch_api"
-            })
+            image_bytes = file.read()
+            save_upload_async(image_bytes, os.path.join(app.config['UPLOAD_FOLDER'], f"batch_{filename}"))
             
-            results.append({
-                "filename": filename,
-                "prediction": result,
-                "confidence": f"{confidence*100:.2f}%",
-                "confidence_percentage": confidence_percentage,
-                "confidence_score": float(confidence),
-                "processing_time": f"{processing_time:.3f}s",
-                "probabilities": {
-                    class_labels[i]: float(all_predictions[i]) 
-                    for i in range(len(class_labels))
-                }
-            })
+            filenames.append(filename)
+            image_buffers.append(image_bytes)
+            file_sizes.append(len(image_bytes))
+        stage_times['upload'] = time.perf_counter() - stage_start
         
-        # Calculate batch summary
-        tumor_detected = sum(1 for r in results if "No Tumor" not in r["prediction"])
-        tumor_type_counts = {}
-        for tumor_type in tumor_types:
-            tumor_type_counts[tumor_type] = tumor_type_counts.get(tumor_type, 0) + 1
+        if not filenames:
+            return jsonify({"error": "No images provided"}), 400
         
-        avg_confidence = sum(r["confidence_score"] for r in results) / len(results) if results else 0
+        # Stage 2: decode and resize into one preallocated array
+        stage_start = time.perf_counter()
+        batch_array = preprocess_batch(image_buffers)
+        stage_times['decode'] = time.perf_counter() - stage_start
         
-        batch_summary = {
-            "tumor_detected": tumor_detected,
-            "no_tumor": sum(1 for r in results if "No Tumor" in r["prediction"]),
-            "average_confidence": f"{avg_confidence*100:.2f}%",
-            "by_tumor_type": tumor_type_counts
-        }
+        # Stage 3: single chunked forward pass
+        stage_start = time.perf_counter()
+        all_batch_predictions, model_version = predict_tumor_batch(batch_array)
+        stage_times['inference'] = time.perf_counter() - stage_start
+        
+        # Stage 4: build per-image results
+        stage_start = time.perf_counter()
+        per_image_time = (time.perf_counter() - batch_start) / len(filenames)
+        results, batch_documents = build_batch_entries(
+            batch_id, request.current_user, filenames, file_sizes, all_batch_predictions, per_image_time,
+            model_version
+        )
+        stage_times['postprocess'] = time.perf_counter() - stage_start
+        
+        # Stage 5: queue all per-image results for one bulk write
+        stage_start = time.perf_counter()
+        write_behind.enqueue_many('batch_results', batch_documents)
+        stage_times['db_write'] = time.perf_counter() - stage_start
+        
+        # Add to in-memory history
+        record_batch_history(results)
+        
+        batch_summary = summarize_batch(
+            [r['prediction'] for r in results],
+            [d['tumorType'] for d in batch_documents],
+            [r['confidence_score'] for r in results]
+        )
         
         # Save batch summary to predictions collection
         try:
@@ -776,20 +1391,196 @@ def api_predict_batch():
                 'batchId': batch_id,
                 'totalImages': len(results),
                 'batchSummary': batch_summary,
-                'processingTime': sum(float(r['processing_time'].replace('s', '')) for r in results),
-                'modelVersion': 'brain_tumor_model_v1',
+                'processingTime': time.perf_counter() - batch_start,
+                'modelVersion': model_version,
+                'modelVariant': MODEL_VARIANT,
                 'analysisDate': datetime.datetime.utcnow()
             }
             save_prediction_to_db(request.current_user, batch_data)
         except Exception as db_error:
             print(f"Error saving batch summary: {db_error}")
         
-        return jsonify({
+        stage_start = time.perf_counter()
+        response = jsonify({
             "total_images": len(results),
             "results": results,
             "batch_summary": batch_summary,
-            "batchId": str(batch_id)
+            "batchId": str(batch_id),
+            "timing": {
+                "total": f"{time.perf_counter() - batch_start:.3f}s",
+                "per_image": f"{per_image_time:.3f}s",
+                "stages": {stage: f"{seconds:.3f}s" for stage, seconds in stage_times.items()}
+            }
         })
+        stage_times['serialization'] = time.perf_counter() - stage_start
+        observe_stages(stage_times)
+        return response
+        
+    except ModelNotReady as e:
+        return model_not_ready(str(e))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Asynchronous batch jobs - PROTECTED
+@app.route('/api/predict/batch/jobs', methods=['POST'])
+@token_required
+def api_submit_batch_job():
+    """Submit a batch job; returns a job id immediately"""
+    try:
+        files = request.files.getlist('images')
+        items = []
+        for file in files:
+            if file.filename == '':
+                continue
+            filename = secure_filename(file.filename)
+            image_bytes = file.read()
+            save_upload_async(image_bytes, os.path.join(app.config['UPLOAD_FOLDER'], f"batch_{filename}"))
+            items.append((filename, image_bytes))
+        
+        if not items:
+            return jsonify({"error": "No images provided"}), 400
+        
+        user_info = dict(request.current_user)
+        client_info = get_client_info()
+        
+        def process_chunk(job_id, start_index, chunk):
+            """Decode, predict and persist one chunk; returns the number of failed images"""
+            def failed_document(image_index, filename, error):
+                return {
+                    'batchId': job_id,
+                    'imageIndex': image_index,
+                    'userId': ObjectId(user_info['user_id']),
+                    'username': user_info['username'],
+                    'filename': filename,
+                    'status': 'failed',
+                    'error': str(error),
+                    'createdAt': datetime.datetime.utcnow()
+                }
+            
+            chunk_start = time.perf_counter()
+            batch_array = np.empty((len(chunk), *IMAGE_SHAPE), dtype=np.float32)
+            valid = []
+            failed_documents = []
+            for offset, (filename, image_bytes) in enumerate(chunk):
+                try:
+                    preprocess_image(image_bytes, out=batch_array[len(valid)])
+                    valid.append((start_index + offset, filename, len(image_bytes)))
+                except Exception as e:
+                    failed_documents.append(failed_document(start_index + offset, filename, e))
+            
+            batch_documents = []
+            if valid:
+                try:
+                    all_batch_predictions, model_version = predict_tumor_batch(batch_array[:len(valid)])
+                    per_image_time = (time.perf_counter() - chunk_start) / len(valid)
+                    results, batch_documents = build_batch_entries(
+                        job_id, user_info,
+                        [filename for _, filename, _ in valid],
+                        [file_size for _, _, file_size in valid],
+                        all_batch_predictions, per_image_time, model_version,
+                        image_indexes=[index for index, _, _ in valid]
+                    )
+                    for document in batch_documents:
+                        document['status'] = 'completed'
+                    record_batch_history(results)
+                except Exception as e:
+                    # The whole chunk failed: every image still gets a result document
+                    print(f"Error predicting batch job {job_id} chunk at {start_index}: {e}")
+                    batch_documents = []
+                    failed_documents.extend(failed_document(index, filename, e) for index, filename, _ in valid)
+            
+            # Results become visible to status polling as each chunk finishes
+            documents = batch_documents + failed_documents
+            try:
+                db = get_database()
+                db.batch_results.insert_many(documents, ordered=False)
+            except Exception as e:
+                # A write failure is not a prediction failure: the write-behind writer retries (and spills) them
+                write_behind.enqueue_many('batch_results', documents)
+                raise ResultsNotPersisted(len(failed_documents), e)
+            apply_rollups(db, 'batch_results', batch_documents)
+            return len(failed_documents)
+        
+        def on_complete(job_id):
+            """Save the batch summary once every chunk is done"""
+            documents = list(get_database().batch_results.find(
+                {'batchId': job_id, 'status': 'completed'},
+                {'prediction': 1, 'tumorType': 1, 'confidence': 1, 'imageIndex': 1, 'modelVersion': 1}
+            ))
+            # A hot reload mid-job is possible; the summary records the version of the last image
+            last = max(documents, key=lambda d: d['imageIndex'], default={})
+            batch_summary = summarize_batch(
+                [d['prediction'] for d in documents],
+                [d['tumorType'] for d in documents],
+                [d['confidence'] for d in documents]
+            )
+            save_prediction_to_db(user_info, {
+                'predictionType': 'batch',
+                'batchId': job_id,
+                'totalImages': len(documents),
+                'batchSummary': batch_summary,
+                'modelVersion': last.get('modelVersion', model_registry.version),
+                'modelVariant': MODEL_VARIANT,
+                'analysisDate': datetime.datetime.utcnow()
+            }, client_info)
+        
+        job_id = batch_job_manager.submit(user_info, items, process_chunk, client_info, on_complete)
+        
+        return jsonify({
+            "jobId": str(job_id),
+            "batchId": str(job_id),
+            "status": "queued",
+            "totalImages": len(items),
+            "statusUrl": f"/api/predict/batch/jobs/{job_id}"
+        }), 202
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/predict/batch/jobs/<job_id>', methods=['GET'])
+@token_required
+def api_batch_job_status(job_id):
+    """Batch job progress plus a page of the results completed so far"""
+    try:
+        if not ObjectId.is_valid(job_id):
+            return jsonify({"error": "Invalid job id"}), 400
+        
+        job = batch_job_manager.get_job(ObjectId(job_id), ObjectId(request.current_user['user_id']))
+        if job is None:
+            return jsonify({"error": "Job not found"}), 404
+        
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = min(max(1, request.args.get('per_page', 50, type=int)), MAX_JOB_RESULTS_PAGE_SIZE)
+        
+        results = []
+        try:
+            results = list(get_database().batch_results.find(
+                {'batchId': job['_id']},
+                {'_id': 0, 'batchId': 0, 'userId': 0, 'username': 0}
+            ).sort('imageIndex', 1).skip((page - 1) * per_page).limit(per_page))
+        except Exception as db_error:
+            print(f"Error reading batch job results: {db_error}")
+        
+        processed = job['completedImages'] + job['failedImages']
+        return jsonify(clean_for_json({
+            "jobId": job_id,
+            "status": job['status'],
+            "totalImages": job['totalImages'],
+            "completedImages": job['completedImages'],
+            "failedImages": job['failedImages'],
+            "progress": round(processed / job['totalImages'] * 100, 1) if job['totalImages'] else 100.0,
+            "error": job.get('error'),
+            "unsavedChunks": job.get('unsavedChunks', 0),
+            "createdAt": job['createdAt'].isoformat() if job.get('createdAt') else None,
+            "finishedAt": job['finishedAt'].isoformat() if job.get('finishedAt') else None,
+            "page": page,
+            "per_page": per_page,
+            "hasMore": page * per_page < processed,
+            "results": [
+                {**r, 'createdAt': r['createdAt'].isoformat() if r.get('createdAt') else None}
+                for r in results
+            ]
+        }))
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -800,187 +1591,60 @@ def api_predict_batch():
 
 @app.route('/api/results/charts', methods=['GET'])
 def api_results_charts():
-    """Generate various charts and return as base64 encoded images"""
+    """Return cached charts as base64 encoded images (?chart=, ?dpi=, ?format=png|svg)"""
     try:
         if not prediction_history:
             return jsonify({"error": "No prediction data available"}), 404
         
-        charts = {}
-        
-        # 1. Class Distribution Chart
-        charts['class_distribution'] = generate_class_distribution_chart()
-        
-        # 2. Confidence Distribution
-        charts['confidence_distribution'] = generate_confidence_distribution_chart()
-        
-        # 3. Predictions Timeline
-        charts['predictions_timeline'] = generate_timeline_chart()
+        chart = request.args.get('chart', 'all')
+        fmt = request.args.get('format', 'png').lower()
+        try:
+            dpi = min(max(int(request.args.get('dpi', CHART_DEFAULT_DPI)), CHART_MIN_DPI), CHART_MAX_DPI)
+        except ValueError:
+            return jsonify({"error": "dpi must be an integer"}), 400
+        if fmt not in CHART_FORMATS:
+            return jsonify({"error": f"format must be one of {list(CHART_FORMATS)}"}), 400
+        if chart != 'all' and chart not in CHART_NAMES:
+            return jsonify({"error": f"Unknown chart '{chart}'", "available": list(CHART_NAMES)}), 400
         
-        # 4. Method Usage Statistics
-        charts['method_usage'] = generate_method_usage_chart()
+        names = list(CHART_NAMES) if chart == 'all' else [chart]
+        entries = chart_cache.get_many(names, dpi, fmt)
         
-        # 5. Confidence vs Time Scatter
-        charts['confidence_trend'] = generate_confidence_trend_chart()
+        etag = make_etag([(name, dpi, fmt, tag) for name, (_, _, _, tag) in entries.items()])
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
         
-        return jsonify({
-            "charts": charts,
+        response = jsonify({
+            "charts": {name: payload for name, (_, payload, _, _) in entries.items()},
             "metadata": {
                 "total_predictions": len(prediction_history),
-                "generated_at": datetime.datetime.now().isoformat(),
-                "chart_count": len(charts)
+                "generated_at": min(rendered_at for _, _, rendered_at, _ in entries.values()).isoformat(),
+                "chart_count": len(entries),
+                "format": fmt,
+                "dpi": dpi
             }
         })
+        response.set_etag(etag)
+        return response
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def generate_class_distribution_chart():
-    """Generate class distribution bar chart"""
-    results = [pred['result'] for pred in prediction_history]
-    result_counts = Counter(results)
-    
-    plt.figure(figsize=(10, 6))
-    classes = list(result_counts.keys())
-    counts = list(result_counts.values())
-    
-    colors = ['#ff6b6b', '#4ecdc4', '#45b7d1', '#96ceb4']
-    bars = plt.bar(classes, counts, color=colors[:len(classes)])
-    
-    plt.title('Brain Tumor Prediction Distribution', fontsize=16, fontweight='bold')
-    plt.xlabel('Prediction Classes', fontsize=12)
-    plt.ylabel('Number of Predictions', fontsize=12)
-    plt.xticks(rotation=45, ha='right')
-    
-    for bar, count in zip(bars, counts):
-        plt.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
-                str(count), ha='center', va='bottom', fontweight='bold')
-    
-    plt.tight_layout()
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    chart_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return chart_base64
-
-def generate_confidence_distribution_chart():
-    """Generate confidence score distribution histogram"""
-    confidences = [pred['confidence'] for pred in prediction_history]
-    
-    plt.figure(figsize=(10, 6))
-    plt.hist(confidences, bins=20, color='#45b7d1', alpha=0.7, edgecolor='black')
-    plt.axvline(np.mean(confidences), color='red', linestyle='--', 
-               label=f'Mean: {np.mean(confidences):.3f}')
-    
-    plt.title('Prediction Confidence Distribution', fontsize=16, fontweight='bold')
-    plt.xlabel('Confidence Score', fontsize=12)
-    plt.ylabel('Frequency', fontsize=12)
-    plt.legend()
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    chart_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return chart_base64
-
-def generate_timeline_chart():
-    """Generate predictions over time line chart"""
-    timestamps = [datetime.datetime.fromisoformat(pred['timestamp']) for pred in prediction_history]
-    hourly_counts = Counter([ts.strftime('%Y-%m-%d %H:00') for ts in timestamps])
-    sorted_hours = sorted(hourly_counts.keys())
-    counts = [hourly_counts[hour] for hour in sorted_hours]
-    
-    plt.figure(figsize=(12, 6))
-    plt.plot(range(len(sorted_hours)), counts, marker='o', linewidth=2, markersize=6, color='#4ecdc4')
-    plt.fill_between(range(len(sorted_hours)), counts, alpha=0.3, color='#4ecdc4')
-    
-    plt.title('Predictions Over Time', fontsize=16, fontweight='bold')
-    plt.xlabel('Time Period', fontsize=12)
-    plt.ylabel('Number of Predictions', fontsize=12)
-    plt.xticks(range(0, len(sorted_hours), max(1, len(sorted_hours)//10)), 
-              [sorted_hours[i] for i in range(0, len(sorted_hours), max(1, len(sorted_hours)//10))], 
-              rotation=45, ha='right')
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    chart_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return chart_base64
+@app.route('/api/results/charts/cache', methods=['GET'])
+def chart_cache_stats():
+    """Chart cache hit/render counters"""
+    return jsonify(chart_cache.get_stats())
 
-def generate_method_usage_chart():
-    """Generate method usage pie chart"""
-    methods = [pred['method'] for pred in prediction_history]
-    method_counts = Counter(methods)
-    
-    plt.figure(figsize=(8, 8))
-    colors = ['#ff6b6b', '#4ecdc4', '#45b7d1', '#96ceb4']
-    
-    wedges, texts, autotexts = plt.pie(method_counts.values(), 
-                                      labels=method_counts.keys(), 
-                                      autopct='%1.1f%%',
-                                      colors=colors,
-                                      startangle=90,
-                                      explode=[0.05] * len(method_counts))
-    
-    plt.title('API Usage Methods', fontsize=16, fontweight='bold')
-    
-    for autotext in autotexts:
-        autotext.set_color('white')
-        autotext.set_fontweight('bold')
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    chart_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return chart_base64
+def render_charts(names, dpi=CHART_DEFAULT_DPI, fmt='png'):
+    """Render charts from a history snapshot in the chart process pool"""
+    inputs = prepare_chart_inputs(prediction_history.snapshot(), names, local_utc_offset())
+    return chart_renderer.render(inputs, dpi, fmt)
 
-def generate_confidence_trend_chart():
-    """Generate confidence trend over time"""
-    timestamps = [datetime.datetime.fromisoformat(pred['timestamp']) for pred in prediction_history]
-    confidences = [pred['confidence'] for pred in prediction_history]
-    results = [pred['result'] for pred in prediction_history]
-    
-    plt.figure(figsize=(12, 6))
-    
-    unique_results = list(set(results))
-    colors = ['#ff6b6b', '#4ecdc4', '#45b7d1', '#96ceb4']
-    
-    for i, result in enumerate(unique_results):
-        result_indices = [j for j, r in enumerate(results) if r == result]
-        result_timestamps = [timestamps[j] for j in result_indices]
-        result_confidences = [confidences[j] for j in result_indices]
-        
-        plt.scatter(result_timestamps, result_confidences, 
-                   label=result, alpha=0.7, s=50, 
-                   color=colors[i % len(colors)])
-    
-    plt.title('Prediction Confidence Over Time', fontsize=16, fontweight='bold')
-    plt.xlabel('Time', fontsize=12)
-    plt.ylabel('Confidence Score', fontsize=12)
-    plt.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.xticks(rotation=45)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-    buffer.seek(0)
-    chart_base64 = base64.b64encode(buffer.getvalue()).decode()
-    plt.close()
-    
-    return chart_base64
+# Parallel renderer (CHART_RENDER_WORKERS processes); the cache re-renders in the background when the history changes
+chart_renderer = ChartRenderer()
+chart_cache = ChartCache(render_charts, lambda: prediction_history.version)
 
 @app.route('/api/results/statistics', methods=['GET'])
 def api_results_statistics():
@@ -989,37 +1653,8 @@ def api_results_statistics():
         if not prediction_history:
             return jsonify({"error": "No prediction data available"}), 404
         
-        confidences = [pred['confidence'] for pred in prediction_history]
-        results = [pred['result'] for pred in prediction_history]
-        methods = [pred['method'] for pred in prediction_history]
-        
-        stats = {
-            "overall_statistics": {
-                "total_predictions": len(prediction_history),
-                "average_confidence": np.mean(confidences),
-                "confidence_std": np.std(confidences),
-                "min_confidence": np.min(confidences),
-                "max_confidence": np.max(confidences),
-                "median_confidence": np.median(confidences)
-            },
-            "class_statistics": dict(Counter(results)),
-            "method_statistics": dict(Counter(methods)),
-            "confidence_by_class": {},
-            "performance_metrics": {
-                "high_confidence_predictions": len([c for c in confidences if c > 0.8]),
-                "low_confidence_predictions": len([c for c in confidences if c < 0.5]),
-                "tumor_detection_rate": len([r for r in results if 'Tumor' in r and 'No Tumor' not in r]) / len(results)
-            }
-        }
-        
-        for result in set(results):
-            class_confidences = [pred['confidence'] for pred in prediction_history if pred['result'] == result]
-            if class_confidences:
-                stats["confidence_by_class"][result] = {
-                    "mean": np.mean(class_confidences),
-                    "std": np.std(class_confidences),
-                    "count": len(class_confidences)
-                }
+        # Streaming aggregates: constant time regardless of history size
+        stats = prediction_history.statistics.summary()
         
         return jsonify(stats)
         
@@ -0,0 +1,372 @@
+"""ASGI entry point for the Brain Tumor Detection API.
+
+Hot endpoints (prediction, batch, health, analytics, history) are served
+natively on the event loop: uploads are read asynchronously, decoding runs in
+a CPU executor, inference is awaited on the micro-batching engine's future and
+MongoDB calls run in a dedicated DB executor. Every other route (auth, charts,
+statistics, debug, batch jobs, /test) is served by the Flask app mounted
+underneath, in Starlette's thread pool.
+
+Run with:
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+import os
+import time
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.wsgi import WSGIMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from werkzeug.utils import secure_filename
+
+import app as backend
+from utils.auth import decode_token
+from utils.model_registry import ModelNotReady
+from utils.preprocessing import preprocess_image, preprocess_batch
+from utils.upload_storage import save_upload_async, shutdown_upload_writer
+from utils.persistence import write_behind
+from utils.pagination import parse_history_args
+from utils.metrics import METRICS_ENABLED, http_requests, http_request_seconds, observe_stage, observe_stages
+
+ASGI_DB_THREADS = int(os.getenv('ASGI_DB_THREADS', 16))
+ASGI_CPU_THREADS = int(os.getenv('ASGI_CPU_THREADS', os.cpu_count() or 4))
+# Same cap as the Flask routes (MAX_CONTENT_LENGTH), which werkzeug enforces for the mounted app
+MAX_UPLOAD_BYTES = backend.app.config['MAX_CONTENT_LENGTH']
+
+# Dedicated executors so slow Mongo calls never starve decoding and vice versa
+db_executor = ThreadPoolExecutor(max_workers=ASGI_DB_THREADS, thread_name_prefix='asgi-db')
+cpu_executor = ThreadPoolExecutor(max_workers=ASGI_CPU_THREADS, thread_name_prefix='asgi-cpu')
+
+app = FastAPI(title="Brain Tumor Detection API", version="2.0.0")
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=backend.allowed_origins,
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["Content-Type", "Authorization"],
+    allow_credentials=True
+)
+
+
+if METRICS_ENABLED:
+    route_templates = {}
+
+    @app.middleware('http')
+    async def record_request_metrics(request: Request, call_next):
+        """Request counts and latency for native routes; mounted Flask routes record their own"""
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            if not route_templates:
+                route_templates.update(
+                    (route.endpoint, route.path) for route in app.routes if isinstance(route, APIRoute))
+            route = route_templates.get(request.scope.get('endpoint'))
+            if route is not None:
+                http_requests.labels(request.method, route, str(status)).inc()
+                http_request_seconds.labels(request.method, route).observe(time.perf_counter() - start)
+
+
+async def run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(db_executor, fn, *args)
+
+
+async def run_cpu(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(cpu_executor, fn, *args)
+
+
+def error_response(message, status_code):
+    return JSONResponse({'error': message}, status_code=status_code)
+
+
+def model_not_ready(message):
+    """503 with Retry-After while no model version is active, as the Flask routes answer"""
+    return JSONResponse(
+        {'error': message, 'model_status': backend.model_registry.status},
+        status_code=503,
+        headers={'Retry-After': str(backend.MODEL_NOT_READY_RETRY_AFTER)}
+    )
+
+
+class UploadTooLarge(Exception):
+    """Request body over MAX_UPLOAD_BYTES"""
+
+
+async def read_form(request):
+    """Parse a multipart form, rejecting bodies over MAX_UPLOAD_BYTES by header and while streaming"""
+    content_length = request.headers.get('content-length', '')
+    if content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise UploadTooLarge(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    received = 0
+
+    async def receive():
+        # Chunked or mislabelled bodies are counted as they arrive
+        nonlocal received
+        message = await request.receive()
+        received += len(message.get('body', b''))
+        if received > MAX_UPLOAD_BYTES:
+            raise UploadTooLarge(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+        return message
+
+    return await Request(request.scope, receive).form()
+
+
+def authenticate(request):
+    """Return (payload, None) for a valid Bearer token, else (None, error response)"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        return None, error_response('Authentication token is missing', 401)
+
+    parts = auth_header.split(" ")
+    if len(parts) < 2 or not parts[1]:
+        return None, error_response('Invalid token format', 401)
+
+    payload = decode_token(parts[1])
+    if not payload:
+        return None, error_response('Invalid or expired token', 401)
+    return payload, None
+
+
+def client_info_for(request):
+    return {
+        'ipAddress': request.client.host if request.client else None,
+        'userAgent': request.headers.get('User-Agent')
+    }
+
+
+async def predict_bytes(image_bytes):
+    """Cache lookup, decode and inference without blocking the event loop"""
+    # The version is pinned for the whole request, so a hot reload cannot swap it midway
+    with backend.model_registry.acquire() as entry:
+        stage_start = time.perf_counter()
+        # Hashing a large upload would stall the event loop
+        cache_key = await run_cpu(backend.prediction_cache.make_key, image_bytes, backend.cache_version(entry))
+        predictions = await run_db(backend.prediction_cache.get, cache_key)
+        stage_start = observe_stage('cache_lookup', stage_start)
+
+        if predictions is None:
+            img_array = await run_cpu(preprocess_image, image_bytes)
+            stage_start = observe_stage('decode', stage_start)
+            predictions = await asyncio.wrap_future(entry.engine.submit(img_array))
+            observe_stage('inference', stage_start)
+            db_executor.submit(backend.prediction_cache.put, cache_key, predictions,
+                               f"{entry.version}-{backend.MODEL_VARIANT}")
+
+        result, confidence = backend.interpret_prediction(predictions)
+        return result, confidence, predictions, entry.version
+
+
+@app.post('/api/predict')
+async def predict(request: Request):
+    """Single image prediction - PROTECTED"""
+    user_info, error = authenticate(request)
+    if error:
+        return error
+
+    try:
+        stage_start = time.perf_counter()
+        form = await read_form(request)
+        file = form.get('image')
+        if file is None or not hasattr(file, 'read'):
+            return error_response('No image file provided', 400)
+        if file.filename == '':
+            return error_response('No file selected', 400)
+
+        filename = secure_filename(file.filename)
+        image_bytes = await file.read()
+        save_upload_async(image_bytes, os.path.join(backend.UPLOAD_FOLDER, filename))
+
+        mode = form.get('mode') or request.query_params.get('mode', 'standard')
+        start_time = observe_stage('upload', stage_start)
+        if mode == 'fast':
+            result, confidence, all_predictions, model_version = await run_cpu(
+                backend.predict_tumor_fast, image_bytes)
+        else:
+            result, confidence, all_predictions, model_version = await predict_bytes(image_bytes)
+        processing_time = time.perf_counter() - start_time
+
+        prediction_data, response_data = backend.build_single_prediction(
+            filename, len(image_bytes), result, confidence, all_predictions, processing_time, mode, model_version
+        )
+        stage_start = time.perf_counter()
+        response_data = await run_db(
+            backend.record_single_prediction, user_info, prediction_data, response_data, client_info_for(request)
+        )
+        stage_start = observe_stage('db_write', stage_start)
+
+        response = JSONResponse(jsonable_encoder(response_data))
+        observe_stage('serialization', stage_start)
+        return response
+
+    except UploadTooLarge as e:
+        return error_response(str(e), 413)
+    except ModelNotReady as e:
+        return model_not_ready(str(e))
+    except Exception as e:
+        print(f"ERROR in predict endpoint: {str(e)}")
+        return error_response(str(e), 500)
+
+
+@app.post('/api/predict/batch')
+async def predict_batch(request: Request):
+    """Batch prediction - PROTECTED"""
+    user_info, error = authenticate(request)
+    if error:
+        return error
+
+    try:
+        batch_id = ObjectId()
+        stage_times = {}
+        batch_start = time.perf_counter()
+
+        # Stage 1: receive uploads (async, no thread held by slow clients)
+        stage_start = time.perf_counter()
+        form = await read_form(request)
+        filenames = []
+        image_buffers = []
+        for file in form.getlist('images'):
+            if not hasattr(file, 'read') or file.filename == '':
+                continue
+            filename = secure_filename(file.filename)
+            image_bytes = await file.read()
+            save_upload_async(image_bytes, os.path.join(backend.UPLOAD_FOLDER, f"batch_{filename}"))
+            filenames.append(filename)
+            image_buffers.append(image_bytes)
+        stage_times['upload'] = time.perf_counter() - stage_start
+
+        if not filenames:
+            return error_response('No images provided', 400)
+
+        # Stage 2: decode into one preallocated array
+        stage_start = time.perf_counter()
+        batch_array = await run_cpu(preprocess_batch, image_buffers)
+        stage_times['decode'] = time.perf_counter() - stage_start
+
+        # Stage 3: chunked forward pass
+        stage_start = time.perf_counter()
+        all_batch_predictions, model_version = await run_cpu(backend.predict_tumor_batch, batch_array)
+        stage_times['inference'] = time.perf_counter() - stage_start
+
+        # Stage 4: per-image results
+        stage_start = time.perf_counter()
+        per_image_time = (time.perf_counter() - batch_start) / len(filenames)
+        results, batch_documents = backend.build_batch_entries(
+            batch_id, user_info, filenames, [len(b) for b in image_buffers], all_batch_predictions, per_image_time,
+            model_version
+        )
+        batch_summary = backend.summarize_batch(
+            [r['prediction'] for r in results],
+            [d['tumorType'] for d in batch_documents],
+            [r['confidence_score'] for r in results]
+        )
+        stage_times['postprocess'] = time.perf_counter() - stage_start
+
+        # Stage 5: bulk write plus batch summary
+        stage_start = time.perf_counter()
+        client_info = client_info_for(request)
+
+        def persist():
+            write_behind.enqueue_many('batch_results', batch_documents)
+            backend.record_batch_history(results)
+            backend.save_prediction_to_db(user_info, {
+                'predictionType': 'batch',
+                'batchId': batch_id,
+                'totalImages': len(results),
+                'batchSummary': batch_summary,
+                'processingTime': time.perf_counter() - batch_start,
+                'modelVersion': model_version,
+                'modelVariant': backend.MODEL_VARIANT,
+                'analysisDate': datetime.datetime.utcnow()
+            }, client_info)
+
+        await run_db(persist)
+        stage_times['db_write'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        response = JSONResponse(jsonable_encoder({
+            "total_images": len(results),
+            "results": results,
+            "batch_summary": batch_summary,
+            "batchId": str(batch_id),
+            "timing": {
+                "total": f"{time.perf_counter() - batch_start:.3f}s",
+                "per_image": f"{per_image_time:.3f}s",
+                "stages": {stage: f"{seconds:.3f}s" for stage, seconds in stage_times.items()}
+            }
+        }))
+        stage_times['serialization'] = time.perf_counter() - stage_start
+        observe_stages(stage_times)
+        return response
+
+    except UploadTooLarge as e:
+        return error_response(str(e), 413)
+    except ModelNotReady as e:
+        return model_not_ready(str(e))
+    except Exception as e:
+        return error_response(str(e), 500)
+
+
+@app.get('/api/health')
+async def health():
+    """Health check with database status"""
+    return JSONResponse(jsonable_encoder(await run_db(backend.get_health_status)))
+
+
+@app.get('/api/analytics/summary')
+async def analytics_summary(request: Request):
+    """Get user's analytics summary - PROTECTED"""
+    user_info, error = authenticate(request)
+    if error:
+        return error
+
+    try:
+        summary = await run_db(backend.get_analytics_summary, ObjectId(user_info['user_id']))
+    except Exception:
+        summary = backend.get_analytics_summary_fallback()
+    return JSONResponse(jsonable_encoder(summary))
+
+
+@app.get('/api/predictions/history')
+async def predictions_history(request: Request):
+    """Get user's prediction history - PROTECTED"""
+    user_info, error = authenticate(request)
+    if error:
+        return error
+
+    try:
+        history_args = parse_history_args(request.query_params)
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    try:
+        history = await run_db(
+            lambda: backend.get_predictions_history(ObjectId(user_info['user_id']), **history_args))
+    except Exception:
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            limit = 10
+        history = backend.get_predictions_history_fallback(limit)
+    return JSONResponse(jsonable_encoder(history))
+
+
+@app.on_event('shutdown')
+def shutdown_executors():
+    db_executor.shutdown(wait=True)
+    cpu_executor.shutdown(wait=True)
+    write_behind.close()
+    shutdown_upload_writer()
+    backend.chart_renderer.shutdown()
+
+
+# Everything else (auth, charts, statistics, debug, jobs, /test) is served by Flask
+app.mount('/', WSGIMiddleware(backend.app))
@@ -1,15 +1,22 @@
 import os
+import threading
 from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+from pymongo.errors import ConnectionFailure, OperationFailure
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Indexes are built by `python scripts/migrate_indexes.py`; set true to also build them on connect
+DB_CREATE_INDEXES_ON_CONNECT = os.getenv('DB_CREATE_INDEXES_ON_CONNECT', 'false').lower() == 'true'
+# Server error code for an existing index with the same keys but other options
+INDEX_OPTIONS_CONFLICT = 85
+
 class Database:
     _instance = None
     _client = None
     _db = None
+    _connect_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
@@ -17,12 +24,15 @@ class Database:
         return cls._instance
     
     def __init__(self):
-        if self._client is None:
-            self.connect()
+        # Connection is opened on first get_db(), not at import time
+        pass
     
     def connect(self):
         """Connect to MongoDB Atlas"""
         try:
+            # Imported here: utils imports this module, so a top-level import would be circular
+            from utils.metrics import METRICS_ENABLED, mongo_command_metrics
+            
             mongodb_uri = os.getenv('MONGODB_URI')
             if not mongodb_uri:
                 raise ValueError("MONGODB_URI not found in environment variables")
@@ -31,7 +41,9 @@ class Database:
                 mongodb_uri,
                 serverSelectionTimeoutMS=5000,
                 connectTimeoutMS=10000,
-                socketTimeoutMS=10000
+                socketTimeoutMS=10000,
+                # Per-command latency for /metrics
+                event_listeners=[mongo_command_metrics] if METRICS_ENABLED else []
             )
             
             # Test connection
@@ -42,8 +54,8 @@ class Database:
             
             print(f"✅ Successfully connected to MongoDB Atlas: {db_name}")
             
-            # Create indexes
-            self.create_indexes()
+            if DB_CREATE_INDEXES_ON_CONNECT:
+                self.create_indexes()
             
             return self._db
             
@@ -54,36 +66,89 @@ class Database:
             print(f"❌ Database connection error: {e}")
             raise
     
-    def create_indexes(self):
-        """Create database indexes for better performance"""
+    def _ensure_index(self, collection, keys, **options):
+        """Create one index; an existing TTL index gets its new expiry via collMod"""
         try:
+            self._db[collection].create_index(keys, **options)
+            return True
+        except OperationFailure as e:
+            if e.code == INDEX_OPTIONS_CONFLICT and 'expireAfterSeconds' in options:
+                try:
+                    key_pattern = dict([(keys, 1)] if isinstance(keys, str) else keys)
+                    self._db.command('collMod', collection, index={
+                        'keyPattern': key_pattern,
+                        'expireAfterSeconds': options['expireAfterSeconds']
+                    })
+                    print(f"✅ Updated TTL of {collection} index {key_pattern} to {options['expireAfterSeconds']}s")
+                    return True
+                except Exception as mod_error:
+                    print(f"⚠️ Error updating TTL of {collection} index {keys}: {mod_error}")
+                    return False
+            print(f"⚠️ Error creating {collection} index {keys}: {e}")
+            return False
+        except Exception as e:
+            print(f"⚠️ Error creating {collection} index {keys}: {e}")
+            return False
+    
+    def create_indexes(self):
+        """Create database indexes for better performance; False if any of them failed"""
+        indexes = [
             # Users collection indexes
-            self._db.users.create_index("username", unique=True)
-            self._db.users.create_index("email", unique=True)
+            ('users', "username", {'unique': True}),
+            ('users', "email", {'unique': True}),
             
             # Predictions collection indexes
-            self._db.predictions.create_index("userId")
-            self._db.predictions.create_index("username")
-            self._db.predictions.create_index("createdAt")
-            self._db.predictions.create_index([("userId", 1), ("createdAt", -1)])
+            ('predictions', "userId", {}),
+            ('predictions', "username", {}),
+            ('predictions', "createdAt", {}),
+            ('predictions', [("userId", 1), ("createdAt", -1)], {}),
+            # Keyset pagination of history: (createdAt, _id) tie-break, optionally per tumor type
+            ('predictions', [("userId", 1), ("createdAt", -1), ("_id", -1)], {}),
+            ('predictions', [("userId", 1), ("tumorType", 1), ("createdAt", -1), ("_id", -1)], {}),
+            # Time-range analytics without a user filter
+            ('predictions', [("createdAt", -1), ("prediction", 1), ("confidence", 1)], {}),
             
             # Batch results indexes
-            self._db.batch_results.create_index("batchId")
-            self._db.batch_results.create_index("userId")
+            ('batch_results', "batchId", {}),
+            ('batch_results', "userId", {}),
+            ('batch_results', [("batchId", 1), ("imageIndex", 1)], {}),
+            # Exports filtered by batch_id stream in createdAt order
+            ('batch_results', [("batchId", 1), ("createdAt", 1)], {}),
+            # Analytics pipelines filter batch results by user and time range
+            ('batch_results', [("userId", 1), ("createdAt", -1)], {}),
+            ('batch_results', [("createdAt", -1), ("prediction", 1), ("confidence", 1)], {}),
+            
+            # Batch jobs indexes
+            ('batch_jobs', [("userId", 1), ("createdAt", -1)], {}),
             
             # Audit logs indexes
-            self._db.audit_logs.create_index("userId")
-            self._db.audit_logs.create_index("timestamp")
+            ('audit_logs', "userId", {}),
+            ('audit_logs', "timestamp", {}),
             
-            print("✅ Database indexes created successfully")
+            # Prediction cache (persistent tier) expires with the cache TTL
+            ('prediction_cache', "createdAt", {
+                'expireAfterSeconds': int(os.getenv('PREDICTION_CACHE_TTL_SECONDS', 3600))
+            }),
             
-        except Exception as e:
-            print(f"⚠️ Error creating indexes: {e}")
+            # Revoked JWT digests disappear once the token would have expired anyway
+            ('revoked_tokens', "expiresAt", {'expireAfterSeconds': 0}),
+            ('revoked_tokens', "revokedAt", {}),
+        ]
+        
+        # Each index on its own: one conflict must not skip the rest
+        failed = sum(not self._ensure_index(collection, keys, **options) for collection, keys, options in indexes)
+        if failed:
+            print(f"⚠️ {failed} of {len(indexes)} database indexes failed")
+            return False
+        print("✅ Database indexes created successfully")
+        return True
     
     def get_db(self):
         """Get database instance"""
         if self._db is None:
-            self.connect()
+            with self._connect_lock:
+                if self._db is None:
+                    self.connect()
         return self._db
     
     def close(self):
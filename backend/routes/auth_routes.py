@@ -3,10 +3,23 @@ from datetime import datetime
 from bson import ObjectId
 import re
 from config.database import get_database
-from utils.auth import hash_password, verify_password, generate_token
+from utils.auth import hash_password, verify_password, password_needs_rehash, generate_token
+from utils.password_hashing import PasswordHashingBusy, admit_login, password_hasher
+from utils.persistence import enqueue_audit_log
 
 auth_bp = Blueprint('auth', __name__)
 
+def too_many_attempts(retry_after):
+    response = jsonify({'error': 'Too many attempts. Please try again later.'})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+def hashing_busy():
+    # Rejected up front instead of holding a request thread in the bcrypt queue
+    response = jsonify({'error': 'Too many password operations in progress. Please try again shortly.'})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
 # Email validation regex
 EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 
@@ -14,6 +27,10 @@ EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
 def register():
     """Register a new user"""
     try:
+        retry_after = admit_login(request.remote_addr)
+        if retry_after:
+            return too_many_attempts(retry_after)
+        
         data = request.get_json()
         
         # Validate required fields
@@ -73,7 +90,7 @@ def register():
         user_id = result.inserted_id
         
         # Log registration
-        db.audit_logs.insert_one({
+        enqueue_audit_log({
             'userId': user_id,
             'username': username,
             'action': 'register',
@@ -89,6 +106,8 @@ def register():
             'email': email
         }), 201
         
+    except PasswordHashingBusy:
+        return hashing_busy()
     except Exception as e:
         print(f"Registration error: {e}")
         return jsonify({'error': 'Registration failed. Please try again.'}), 500
@@ -106,6 +125,11 @@ def login():
         username = data['username'].strip()
         password = data['password']
         
+        # Admission limits keep login storms from starving inference
+        retry_after = admit_login(request.remote_addr, username)
+        if retry_after:
+            return too_many_attempts(retry_after)
+        
         # Get database
         db = get_database()
         
@@ -123,17 +147,24 @@ def login():
         if not verify_password(password, user['password']):
             return jsonify({'error': 'Invalid username or password'}), 401
         
-        # Update last login
+        # Update last login, upgrading the hash if the work factor changed
+        update = {'lastLogin': datetime.utcnow()}
+        if password_needs_rehash(user['password']):
+            try:
+                update['password'] = hash_password(password)
+                password_hasher.count_rehash()
+            except PasswordHashingBusy:
+                pass  # The password was right: log in now, upgrade on a later login
         db.users.update_one(
             {'_id': user['_id']},
-            {'$set': {'lastLogin': datetime.utcnow()}}
+            {'$set': update}
         )
         
         # Generate JWT token
-        token = generate_token(user['_id'], user['username'], user['email'])
+        token = generate_token(user['_id'], user['username'], user['email'], user.get('role', 'user'))
         
         # Log login
-        db.audit_logs.insert_one({
+        enqueue_audit_log({
             'userId': user['_id'],
             'username': user['username'],
             'action': 'login',
@@ -155,6 +186,8 @@ def login():
             }
         }), 200
         
+    except PasswordHashingBusy:
+        return hashing_busy()
     except Exception as e:
         print(f"Login error: {e}")
         return jsonify({'error': 'Login failed. Please try again.'}), 500
@@ -195,8 +228,8 @@ def verify_token():
 
 @auth_bp.route('/logout', methods=['POST'])
 def logout():
-    """Logout user (client-side token removal)"""
-    from utils.auth import decode_token
+    """Logout user: the token is revoked server-side until it expires"""
+    from utils.auth import revoke_token
     
     try:
         # Get token if available
@@ -204,12 +237,11 @@ def logout():
         if auth_header:
             try:
                 token = auth_header.split(" ")[1]
-                payload = decode_token(token)
+                payload = revoke_token(token)
                 
                 if payload:
                     # Log logout
-                    db = get_database()
-                    db.audit_logs.insert_one({
+                    enqueue_audit_log({
                         'userId': ObjectId(payload['user_id']),
                         'username': payload['username'],
                         'action': 'logout',
@@ -224,4 +256,16 @@ def logout():
         return jsonify({'message': 'Logout successful'}), 200
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@auth_bp.route('/token-cache/stats', methods=['GET'])
+def token_cache_stats():
+    """Token cache hit rate, denylist size and average auth overhead"""
+    from utils.auth import token_cache
+    
+    return jsonify(token_cache.get_stats()), 200
+
+@auth_bp.route('/hashing/stats', methods=['GET'])
+def hashing_stats():
+    """Password hashing executor counters and work factor"""
+    return jsonify(password_hasher.get_stats()), 200
@@ -0,0 +1,83 @@
+"""Benchmark: wall time to render the full chart set as the prediction history grows.
+
+Fills a PredictionHistory with synthetic predictions for each size and times
+input preparation plus rendering of all five charts, in-process (sequential)
+and in the chart process pool.
+
+Usage (from backend/):
+    python scripts/benchmark_charts.py --sizes 1000,100000,1000000 --workers 5
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.prediction_history import PredictionHistory
+from utils.chart_rendering import ChartRenderer, prepare_chart_inputs, CHART_NAMES
+
+RESULTS = ['Tumor: glioma', 'Tumor: meningioma', 'No Tumor', 'Tumor: pituitary']
+METHODS = ['api', 'batch_api', 'web_interface']
+CHUNK = 10000
+
+
+def build_history(size, span_hours, seed=0):
+    """History of ``size`` predictions spread over the last ``span_hours``"""
+    rng = np.random.default_rng(seed)
+    history = PredictionHistory(capacity=size)
+    start = time.time() - span_hours * 3600
+    for offset in range(0, size, CHUNK):
+        count = min(CHUNK, size - offset)
+        results = [RESULTS[i] for i in rng.integers(0, len(RESULTS), count)]
+        confidences = rng.beta(8, 2, count)
+        method = METHODS[(offset // CHUNK) % len(METHODS)]
+        timestamp = start + span_hours * 3600 * offset / size
+        history.extend(results, confidences, method, timestamp=timestamp)
+    return history
+
+
+def time_render(renderer, history, dpi, fmt, repeats):
+    best_prepare = best_render = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        inputs = prepare_chart_inputs(history.snapshot(), CHART_NAMES)
+        prepared = time.perf_counter()
+        renderer.render(inputs, dpi, fmt)
+        best_prepare = min(best_prepare, prepared - start)
+        best_render = min(best_render, time.perf_counter() - prepared)
+    return best_prepare, best_render
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--workers', type=int, default=len(CHART_NAMES), help='Chart processes for the pooled run')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--format', choices=['png', 'svg'], default='png')
+    parser.add_argument('--span-hours', type=int, default=72, help='Time range covered by the synthetic history')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    sequential = ChartRenderer(processes=0)
+    pooled = ChartRenderer(processes=args.workers)
+    # Start the pool and import matplotlib in every worker before timing
+    warmup = prepare_chart_inputs(build_history(100, 1).snapshot(), CHART_NAMES)
+    pooled.render(warmup, 50, args.format)
+    sequential.render(warmup, 50, args.format)
+
+    print(f"{'entries':>10} {'prepare':>10} {'sequential':>12} {'pooled':>10} {'speedup':>8}")
+    try:
+        for size in [int(s) for s in args.sizes.split(',')]:
+            history = build_history(size, args.span_hours)
+            prepare, sequential_time = time_render(sequential, history, args.dpi, args.format, args.repeats)
+            _, pooled_time = time_render(pooled, history, args.dpi, args.format, args.repeats)
+            print(f"{size:>10} {prepare * 1000:>8.1f}ms {sequential_time:>11.3f}s {pooled_time:>9.3f}s "
+                  f"{sequential_time / pooled_time:>7.2f}x")
+    finally:
+        pooled.shutdown()
+
+
+if __name__ == '__main__':
+    main()
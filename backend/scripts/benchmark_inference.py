@@ -0,0 +1,63 @@
+"""Microbenchmark: per-call overhead of model.predict vs the compiled inference function.
+
+Usage (from backend/):
+    python scripts/benchmark_inference.py --model models/brain_tumor_model.h5 --iterations 200
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tensorflow.keras.models import load_model
+from utils.compiled_model import CompiledModel
+from utils.preprocessing import IMAGE_SHAPE
+
+
+def time_calls(fn, batch, iterations):
+    """Return per-call latencies in milliseconds"""
+    latencies = np.empty(iterations, dtype=np.float64)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(batch)
+        latencies[i] = (time.perf_counter() - start) * 1000
+    return latencies
+
+
+def summarize(name, latencies):
+    print(f"  {name:<16} mean {latencies.mean():8.2f} ms | p50 {np.percentile(latencies, 50):8.2f} ms"
+          f" | p95 {np.percentile(latencies, 95):8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', 'models/brain_tumor_model.h5'))
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--batch-sizes', default='1,4,16')
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    compiled = CompiledModel(model)
+
+    for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+        batch = np.random.rand(batch_size, *IMAGE_SHAPE).astype(np.float32)
+
+        # Warm both paths before measuring
+        model.predict(batch, verbose=0)
+        compiled(batch)
+
+        predict_latencies = time_calls(lambda b: model.predict(b, verbose=0), batch, args.iterations)
+        compiled_latencies = time_calls(compiled, batch, args.iterations)
+
+        print(f"📊 Batch size {batch_size} ({args.iterations} calls)")
+        summarize('model.predict', predict_latencies)
+        summarize('compiled', compiled_latencies)
+        overhead = predict_latencies.mean() - compiled_latencies.mean()
+        print(f"  Per-call overhead removed: {overhead:.2f} ms "
+              f"({predict_latencies.mean() / compiled_latencies.mean():.1f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark: cost of recording one metrics event, single-threaded and under contention.
+
+Times counter increments and histogram observations (with and without the
+label lookup) and a full /metrics render, so the per-event overhead can be
+checked against the budget of a few microseconds.
+
+Usage (from backend/):
+    python scripts/benchmark_metrics.py --events 1000000 --threads 1,4,8
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.metrics import MetricsRegistry
+
+
+def per_event_micros(fn, events, threads):
+    """Wall time per event with ``threads`` threads sharing ``events`` calls"""
+    per_thread = events // threads
+
+    def run():
+        for _ in range(per_thread):
+            fn()
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=1000000)
+    parser.add_argument('--threads', default='1,4,8', help='Comma-separated thread counts')
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    counter = registry.counter('bench_requests_total', 'Benchmark counter', ('method', 'route', 'status'))
+    histogram = registry.histogram('bench_duration_seconds', 'Benchmark histogram', ('stage',))
+    child = histogram.labels('inference')
+
+    cases = {
+        'counter.labels().inc()': lambda: counter.labels('POST', '/api/predict', '200').inc(),
+        'histogram.labels().observe()': lambda: histogram.labels('inference').observe(0.012),
+        'child.observe()': lambda: child.observe(0.012),
+    }
+
+    print(f"\n{'event':<32}" + ''.join(f"{f'{t} thread(s)':>14}" for t in args.threads.split(',')))
+    for name, fn in cases.items():
+        row = [per_event_micros(fn, args.events, int(t)) for t in args.threads.split(',')]
+        print(f"{name:<32}" + ''.join(f"{f'{us:.2f} µs':>14}" for us in row))
+
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"\n⏱️ render: {(time.perf_counter() - start) * 1000:.2f} ms for {len(text.splitlines())} lines")
+
+
+if __name__ == '__main__':
+    main()
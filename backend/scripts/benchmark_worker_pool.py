@@ -0,0 +1,68 @@
+"""Benchmark: inference throughput of the process pool as the worker count grows.
+
+Fires --requests single-image predictions from --concurrency client threads
+through the micro-batching engine for each worker count and prints images/s.
+
+Usage (from backend/):
+    python scripts/benchmark_worker_pool.py --workers 1,2,4,8 --requests 2000
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.inference import InferenceEngine
+from utils.preprocessing import IMAGE_SHAPE
+from utils.worker_pool import InferenceWorkerPool
+
+
+def run(pool, num_workers, num_requests, concurrency, max_batch_size, max_wait_ms):
+    engine = InferenceEngine(pool, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                             concurrency=num_workers)
+    sample = np.random.rand(*IMAGE_SHAPE).astype(np.float32)
+
+    # Warm the engine threads and each worker once
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(lambda _: engine.predict(sample), range(num_workers * 4)))
+
+        start = time.perf_counter()
+        list(clients.map(lambda _: engine.predict(sample), range(num_requests)))
+        elapsed = time.perf_counter() - start
+
+    stats = engine.get_stats()
+    engine.stop()
+    return num_requests / elapsed, stats['averageBatchSize']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', 'models/brain_tumor_model.h5'))
+    parser.add_argument('--variant', choices=['float', 'quantized'], default='float')
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=64, help='Concurrent client threads')
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    baseline = None
+    print(f"{'workers':>8} {'images/s':>10} {'avg batch':>10} {'scaling':>8}")
+    for num_workers in [int(w) for w in args.workers.split(',')]:
+        pool = InferenceWorkerPool(args.model, args.variant, num_workers=num_workers)
+        pool.start()
+        try:
+            throughput, avg_batch = run(pool, num_workers, args.requests, args.concurrency,
+                                        args.max_batch_size, args.max_wait_ms)
+        finally:
+            pool.stop()
+
+        baseline = baseline or throughput
+        print(f"{num_workers:>8} {throughput:>10.1f} {avg_batch:>10.2f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Shared helpers for offline model tools (quantization, distillation, benchmarks)."""
+import os
+import random
+import numpy as np
+
+from utils.preprocessing import preprocess_batch
+
+# Same order the backend uses to interpret model outputs
+CLASS_LABELS = ['glioma', 'meningioma', 'notumor', 'pituitary']
+
+
+def list_images(data_dir, limit_per_class=None, seed=42):
+    """Collect (path, class index) pairs from a <data_dir>/<class>/<image> layout"""
+    paths = []
+    labels = []
+    rng = random.Random(seed)
+
+    for class_index, label in enumerate(CLASS_LABELS):
+        class_dir = os.path.join(data_dir, label)
+        if not os.path.isdir(class_dir):
+            print(f"⚠️ Missing class directory: {class_dir}")
+            continue
+
+        images = sorted(os.listdir(class_dir))
+        rng.shuffle(images)
+        if limit_per_class:
+            images = images[:limit_per_class]
+
+        paths.extend(os.path.join(class_dir, image) for image in images)
+        labels.extend([class_index] * len(images))
+
+    return paths, np.array(labels, dtype=np.int64)
+
+
+def load_images(data_dir, limit_per_class=None, seed=42):
+    """Load a dataset directory into a (N, 128, 128, 3) float32 array plus labels"""
+    paths, labels = list_images(data_dir, limit_per_class, seed)
+    return preprocess_batch(paths), labels
+
+
+def per_class_accuracy(probabilities, labels):
+    """Overall and per-class accuracy for a probability matrix"""
+    predicted = np.argmax(probabilities, axis=1)
+    report = {'overall': float(np.mean(predicted == labels)) if len(labels) else 0.0}
+    for class_index, label in enumerate(CLASS_LABELS):
+        mask = labels == class_index
+        report[label] = float(np.mean(predicted[mask] == class_index)) if mask.any() else None
+    return report
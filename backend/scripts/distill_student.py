@@ -0,0 +1,128 @@
+"""Distill a lightweight student CNN from the VGG16 teacher for low-latency triage.
+
+The student learns from the teacher's temperature-softened predictions over the
+same four classes plus the hard labels. The saved student ends in a softmax,
+so the backend serves it exactly like the teacher (STUDENT_MODEL_PATH).
+
+Usage (from backend/):
+    python scripts/distill_student.py --train-dir data/Training --test-dir data/Testing --epochs 15
+"""
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensorflow as tf
+from tensorflow.keras import layers
+from tensorflow.keras.models import Sequential, load_model
+from utils.compiled_model import CompiledModel
+from utils.preprocessing import IMAGE_SHAPE
+from scripts.dataset_utils import CLASS_LABELS, load_images, per_class_accuracy
+
+
+def build_student(num_classes=len(CLASS_LABELS)):
+    """Small CNN producing logits (a few hundred thousand parameters vs ~15M for the teacher)"""
+    return Sequential([
+        layers.Input(shape=IMAGE_SHAPE),
+        layers.Conv2D(32, 3, strides=2, padding='same', activation='relu'),
+        layers.BatchNormalization(),
+        layers.SeparableConv2D(64, 3, padding='same', activation='relu'),
+        layers.MaxPooling2D(),
+        layers.BatchNormalization(),
+        layers.SeparableConv2D(128, 3, padding='same', activation='relu'),
+        layers.MaxPooling2D(),
+        layers.BatchNormalization(),
+        layers.SeparableConv2D(256, 3, padding='same', activation='relu'),
+        layers.GlobalAveragePooling2D(),
+        layers.Dropout(0.3),
+        layers.Dense(num_classes)
+    ], name='brain_tumor_student')
+
+
+def soften(probabilities, temperature):
+    """Re-temper teacher softmax outputs: softmax(log(p) / T)"""
+    logits = np.log(np.clip(probabilities, 1e-7, 1.0)) / temperature
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return (exp / exp.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def train(student, images, labels, soft_targets, epochs, batch_size, temperature, alpha, learning_rate):
+    """Distillation loop: alpha * CE(hard) + (1 - alpha) * T^2 * KL(teacher_T || student_T)"""
+    optimizer = tf.keras.optimizers.Adam(learning_rate)
+    hard_loss_fn = tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True)
+    kl_loss_fn = tf.keras.losses.KLDivergence()
+
+    @tf.function
+    def train_step(x, y, soft_y):
+        with tf.GradientTape() as tape:
+            logits = student(x, training=True)
+            hard_loss = hard_loss_fn(y, logits)
+            soft_loss = kl_loss_fn(soft_y, tf.nn.softmax(logits / temperature)) * temperature ** 2
+            loss = alpha * hard_loss + (1 - alpha) * soft_loss
+        gradients = tape.gradient(loss, student.trainable_variables)
+        optimizer.apply_gradients(zip(gradients, student.trainable_variables))
+        return loss
+
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels, soft_targets))
+    dataset = dataset.shuffle(len(images), reshuffle_each_iteration=True).batch(batch_size)
+
+    for epoch in range(epochs):
+        losses = [float(train_step(x, y, soft_y)) for x, y, soft_y in dataset]
+        print(f"  Epoch {epoch + 1}/{epochs} - loss {np.mean(losses):.4f}")
+
+
+def mean_latency_ms(fn, iterations=50):
+    sample = np.random.rand(1, *IMAGE_SHAPE).astype(np.float32)
+    fn(sample)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(sample)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--teacher', default=os.getenv('MODEL_PATH', 'models/brain_tumor_model.h5'))
+    parser.add_argument('--output', default=os.getenv('STUDENT_MODEL_PATH', 'models/brain_tumor_student.h5'))
+    parser.add_argument('--train-dir', required=True)
+    parser.add_argument('--test-dir', required=True)
+    parser.add_argument('--epochs', type=int, default=15)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--alpha', type=float, default=0.1, help='Weight of the hard-label loss')
+    parser.add_argument('--learning-rate', type=float, default=1e-3)
+    args = parser.parse_args()
+
+    print(f"📦 Loading teacher: {args.teacher}")
+    teacher = CompiledModel(load_model(args.teacher))
+
+    train_images, train_labels = load_images(args.train_dir)
+    print(f"🧠 Computing teacher soft targets for {len(train_images)} images")
+    soft_targets = soften(teacher.predict(train_images), args.temperature)
+
+    student = build_student()
+    student.summary()
+    train(student, train_images, train_labels, soft_targets, args.epochs, args.batch_size,
+          args.temperature, args.alpha, args.learning_rate)
+
+    # Serve probabilities, same as the teacher
+    serving_student = Sequential([student, layers.Softmax()], name='brain_tumor_student_serving')
+    serving_student.save(args.output)
+    print(f"✅ Student saved to {args.output}")
+
+    test_images, test_labels = load_images(args.test_dir)
+    compiled_student = CompiledModel(serving_student)
+    print("📊 Test accuracy")
+    print(f"  Teacher: {per_class_accuracy(teacher.predict(test_images), test_labels)}")
+    print(f"  Student: {per_class_accuracy(compiled_student.predict(test_images), test_labels)}")
+    print("⏱️ Single-image CPU latency")
+    print(f"  Teacher: {mean_latency_ms(teacher):.2f} ms")
+    print(f"  Student: {mean_latency_ms(compiled_student):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Load test: compare the Flask server and the ASGI server at equal concurrency.
+
+Start both servers first, e.g.
+    python app.py                                   # Flask on :5000
+    uvicorn asgi:app --host 0.0.0.0 --port 8000     # ASGI on :8000
+
+Then (from backend/):
+    python scripts/load_test.py --image scan.jpg --username user --password pass \\
+        --endpoint predict --concurrency 32 --requests 500
+"""
+import time
+import argparse
+import statistics
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+
+def login(base_url, username, password):
+    response = requests.post(f"{base_url}/api/auth/login", json={'username': username, 'password': password})
+    response.raise_for_status()
+    return response.json()['token']
+
+
+def make_request_fn(base_url, endpoint, token, image_bytes):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    session = requests.Session()
+
+    def call():
+        start = time.perf_counter()
+        if endpoint == 'predict':
+            response = session.post(f"{base_url}/api/predict", headers=headers,
+                                    files={'image': ('scan.jpg', image_bytes, 'image/jpeg')})
+        elif endpoint == 'history':
+            response = session.get(f"{base_url}/api/predictions/history", headers=headers)
+        elif endpoint == 'summary':
+            response = session.get(f"{base_url}/api/analytics/summary", headers=headers)
+        else:
+            response = session.get(f"{base_url}/api/health")
+        return time.perf_counter() - start, response.status_code
+
+    return call
+
+
+def run(name, base_url, args, token, image_bytes):
+    call = make_request_fn(base_url, args.endpoint, token, image_bytes)
+
+    # Warm-up
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda _: call(), range(min(args.concurrency, args.requests))))
+
+        start = time.perf_counter()
+        outcomes = list(pool.map(lambda _: call(), range(args.requests)))
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for latency, _ in outcomes)
+    errors = sum(1 for _, status in outcomes if status >= 400)
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(f"{name:<6} {args.requests / elapsed:>9.1f} req/s | p50 {quantiles[49]:8.1f} ms"
+          f" | p95 {quantiles[94]:8.1f} ms | p99 {quantiles[98]:8.1f} ms | errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flask-url', default='http://localhost:5000')
+    parser.add_argument('--asgi-url', default='http://localhost:8000')
+    parser.add_argument('--endpoint', choices=['predict', 'history', 'summary', 'health'], default='predict')
+    parser.add_argument('--image', help='Image file for the predict endpoint')
+    parser.add_argument('--token')
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    image_bytes = None
+    if args.image:
+        # Read once up front; every request reuses the same bytes
+        with open(args.image, 'rb') as f:
+            image_bytes = f.read()
+    if args.endpoint == 'predict' and image_bytes is None:
+        parser.error('--image is required for the predict endpoint')
+
+    token = args.token
+    if not token and args.username:
+        token = login(args.flask_url, args.username, args.password)
+
+    print(f"📊 {args.endpoint}: {args.requests} requests at concurrency {args.concurrency}")
+    run('flask', args.flask_url, args, token, image_bytes)
+    run('asgi', args.asgi_url, args, token, image_bytes)
+
+
+if __name__ == '__main__':
+    main()
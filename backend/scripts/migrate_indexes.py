@@ -0,0 +1,35 @@
+"""Create or update the MongoDB indexes the API relies on.
+
+Index builds no longer run on every app start (see DB_CREATE_INDEXES_ON_CONNECT);
+run this once per deploy, before starting the new version. A changed TTL
+(e.g. PREDICTION_CACHE_TTL_SECONDS) is applied to the existing index; the
+script exits non-zero if any index could not be created.
+
+Usage (from backend/):
+    python scripts/migrate_indexes.py
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.parse_args()
+
+    start = time.perf_counter()
+    db.get_db()
+    if not db.create_indexes():
+        db.close()
+        sys.exit(1)
+    print(f"✅ Indexes up to date in {time.perf_counter() - start:.2f}s")
+    db.close()
+
+
+if __name__ == '__main__':
+    main()
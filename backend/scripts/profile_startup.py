@@ -0,0 +1,80 @@
+"""Show where cold-start time goes: import costs and time until the model is ready.
+
+Runs ``python -X importtime -c "import app"`` in a fresh interpreter and prints
+the slowest modules by cumulative import time. With --ready it also starts the
+app in-process and polls /api/health/ready until the model has loaded.
+
+Usage (from backend/):
+    python scripts/profile_startup.py
+    python scripts/profile_startup.py --top 40 --ready
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def import_times(module):
+    """(module, self_us, cumulative_us) for every import made by ``import module``"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit(f"❌ import {module} failed")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def time_until_ready(timeout):
+    """Seconds from importing app until /api/health/ready returns 200"""
+    start = time.perf_counter()
+    import app as backend
+    imported = time.perf_counter() - start
+    client = backend.app.test_client()
+    while time.perf_counter() - start < timeout:
+        if client.get('/api/health/ready').status_code == 200:
+            return imported, time.perf_counter() - start
+        time.sleep(0.1)
+    return imported, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='app', help='Module to import (default: app)')
+    parser.add_argument('--top', type=int, default=25, help='Number of modules to list')
+    parser.add_argument('--ready', action='store_true', help='Also measure time until the model is ready')
+    parser.add_argument('--timeout', type=float, default=300, help='Seconds to wait for readiness')
+    args = parser.parse_args()
+
+    rows = import_times(args.module)
+    # Top-level entry of the requested module carries the total
+    total_us = max((cumulative for name, _, cumulative in rows if name.strip() == args.module), default=0)
+
+    print(f"\n{'cumulative ms':>14}  {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f}  {self_us / 1000:9.1f}  {name}")
+    print(f"\n⏱️ import {args.module}: {total_us / 1000:.1f} ms ({len(rows)} modules)")
+
+    if args.ready:
+        imported, ready = time_until_ready(args.timeout)
+        print(f"⏱️ app imported in {imported:.2f}s")
+        if ready is None:
+            print(f"❌ Model not ready after {args.timeout:.0f}s")
+        else:
+            print(f"✅ Model ready after {ready:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
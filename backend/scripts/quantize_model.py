@@ -0,0 +1,126 @@
+"""Build a post-training quantized CPU variant of the brain tumor model.
+
+Converts the float H5 model to TFLite (dynamic-range or int8 with a
+calibration subset of the training images), compares it with the float model
+on the test set and only promotes it to QUANTIZED_MODEL_PATH when the accuracy
+drop stays within --max-accuracy-drop.
+
+Usage (from backend/):
+    python scripts/quantize_model.py --train-dir data/Training --test-dir data/Testing --mode int8
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+from utils.compiled_model import CompiledModel
+from utils.quantized_model import QuantizedModel
+from scripts.dataset_utils import CLASS_LABELS, load_images, per_class_accuracy
+
+
+def convert(model, mode, calibration_images=None):
+    """Convert a Keras model to quantized TFLite bytes"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if mode == 'int8':
+        def representative_dataset():
+            for image in calibration_images:
+                yield [image[np.newaxis, ...]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Keep float32 input/output so the serving code stays unchanged
+
+    return converter.convert()
+
+
+def measure_latency(fn, input_shape, iterations):
+    """Mean single-image latency in milliseconds"""
+    sample = np.random.rand(1, *input_shape).astype(np.float32)
+    fn(sample)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(sample)
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.getenv('MODEL_PATH', 'models/brain_tumor_model.h5'))
+    parser.add_argument('--output', default=os.getenv('QUANTIZED_MODEL_PATH', 'models/brain_tumor_model_quant.tflite'))
+    parser.add_argument('--train-dir', required=True, help='Training directory used for calibration')
+    parser.add_argument('--test-dir', required=True, help='Testing directory used for evaluation')
+    parser.add_argument('--mode', choices=['dynamic', 'int8'], default='dynamic')
+    parser.add_argument('--calibration-per-class', type=int, default=50)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.01,
+                        help='Largest allowed drop in overall or per-class accuracy (fraction)')
+    parser.add_argument('--latency-iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"📦 Loading float model: {args.model}")
+    model = load_model(args.model)
+    float_model = CompiledModel(model)
+
+    calibration_images = None
+    if args.mode == 'int8':
+        calibration_images, _ = load_images(args.train_dir, limit_per_class=args.calibration_per_class)
+        print(f"🎯 Calibration subset: {len(calibration_images)} images")
+
+    print(f"⚙️ Converting ({args.mode})...")
+    candidate_path = f"{args.output}.candidate"
+    with open(candidate_path, 'wb') as f:
+        f.write(convert(model, args.mode, calibration_images))
+    quantized_model = QuantizedModel(candidate_path)
+
+    test_images, test_labels = load_images(args.test_dir)
+    print(f"🧪 Evaluating on {len(test_images)} test images")
+    float_accuracy = per_class_accuracy(float_model.predict(test_images), test_labels)
+    quantized_accuracy = per_class_accuracy(quantized_model.predict(test_images), test_labels)
+
+    accuracy_deltas = {
+        key: (quantized_accuracy[key] - float_accuracy[key]) if float_accuracy[key] is not None else None
+        for key in ['overall', *CLASS_LABELS]
+    }
+    worst_drop = -min(delta for delta in accuracy_deltas.values() if delta is not None)
+
+    report = {
+        'mode': args.mode,
+        'floatModel': args.model,
+        'quantizedModel': args.output,
+        'sizeMB': {
+            'float': os.path.getsize(args.model) / (1024 * 1024),
+            'quantized': os.path.getsize(candidate_path) / (1024 * 1024)
+        },
+        'latencyMs': {
+            'float': measure_latency(float_model, float_model.input_shape, args.latency_iterations),
+            'quantized': measure_latency(quantized_model, quantized_model.input_shape, args.latency_iterations)
+        },
+        'accuracy': {'float': float_accuracy, 'quantized': quantized_accuracy, 'delta': accuracy_deltas},
+        'maxAccuracyDrop': args.max_accuracy_drop,
+        'promoted': worst_drop <= args.max_accuracy_drop
+    }
+
+    print(json.dumps(report, indent=2))
+
+    if report['promoted']:
+        shutil.move(candidate_path, args.output)
+        with open(f"{args.output}.json", 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Promoted quantized model to {args.output}")
+        print("   Serve it with MODEL_VARIANT=quantized")
+    else:
+        os.remove(candidate_path)
+        print(f"❌ Refusing to promote: accuracy drop {worst_drop:.4f} exceeds {args.max_accuracy_drop:.4f}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+"""Rebuild the user_stats analytics rollups from predictions and batch_results.
+
+Rollups are normally kept current with $inc as documents are written; run
+this after a failed rollup update, a data migration or manual deletes. It is
+safe to run under live traffic: rollups updated during the recount are
+recounted rather than overwritten or counted twice.
+
+Usage (from backend/):
+    python scripts/rebuild_user_stats.py            # every user
+    python scripts/rebuild_user_stats.py --user <user id>
+"""
+import os
+import sys
+import time
+import argparse
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.database import get_database
+from utils.user_stats import rebuild_user_stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--user', help='Only rebuild this user id')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rebuilt = rebuild_user_stats(get_database(), ObjectId(args.user) if args.user else None)
+    print(f"✅ Rebuilt {rebuilt} user_stats rollups in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import datetime
+from utils.running_stats import QuantileSketch, HIGH_CONFIDENCE_THRESHOLD, LOW_CONFIDENCE_THRESHOLD
+
+# Sketch resolution for the server-side median (bins over [0, 1])
+MEDIAN_BINS = 1000
+TIMELINE_BUCKETS = {
+    'hour': '%Y-%m-%d %H:00',
+    'day': '%Y-%m-%d'
+}
+MAX_TIMELINE_PAGE_SIZE = 1000
+
+
+def _naive_utc(value):
+    """Offset-aware datetimes to naive UTC, the form createdAt is stored in"""
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_time_range(args):
+    """(start, end) naive UTC datetimes from ISO-8601 ``start``/``end`` query args; raises ValueError
+
+    Bounds without an offset are taken as UTC.
+    """
+    bounds = []
+    for name in ('start', 'end'):
+        value = args.get(name)
+        bounds.append(_naive_utc(datetime.datetime.fromisoformat(value)) if value else None)
+    if bounds[0] and bounds[1] and bounds[0] >= bounds[1]:
+        raise ValueError("start must be before end")
+    return tuple(bounds)
+
+
+def _match(user_id=None, start=None, end=None):
+    # Per-image documents only: batch summaries and failed images carry no confidence
+    match = {'confidence': {'$exists': True}}
+    if user_id is not None:
+        match['userId'] = user_id
+    if start is not None or end is not None:
+        match['createdAt'] = {}
+        if start is not None:
+            match['createdAt']['$gte'] = start
+        if end is not None:
+            match['createdAt']['$lt'] = end
+    return match
+
+
+def image_results_pipeline(user_id=None, start=None, end=None):
+    """Pipeline prefix yielding one slim document per analysed image
+
+    Single predictions come from ``predictions`` and batch images from
+    ``batch_results`` (via $unionWith); both $match stages lead with
+    userId/createdAt so they use the compound indexes.
+    """
+    match = _match(user_id, start, end)
+    fields = {'_id': 0, 'createdAt': 1, 'confidence': 1, 'prediction': 1, 'tumorType': 1}
+    return [
+        {'$match': match},
+        {'$project': {**fields, 'source': {'$literal': 'single'}}},
+        {'$unionWith': {
+            'coll': 'batch_results',
+            'pipeline': [
+                {'$match': match},
+                {'$project': {**fields, 'source': {'$literal': 'batch'}}}
+            ]
+        }}
+    ]
+
+
+def get_statistics(db, user_id=None, start=None, end=None):
+    """Same shape as /api/results/statistics, computed by MongoDB"""
+    pipeline = image_results_pipeline(user_id, start, end) + [
+        {'$facet': {
+            'overall': [{'$group': {
+                '_id': None,
+                'count': {'$sum': 1},
+                'mean': {'$avg': '$confidence'},
+                'std': {'$stdDevPop': '$confidence'},
+                'min': {'$min': '$confidence'},
+                'max': {'$max': '$confidence'},
+                'high': {'$sum': {'$cond': [{'$gt': ['$confidence', HIGH_CONFIDENCE_THRESHOLD]}, 1, 0]}},
+                'low': {'$sum': {'$cond': [{'$lt': ['$confidence', LOW_CONFIDENCE_THRESHOLD]}, 1, 0]}}
+            }}],
+            'byClass': [{'$group': {
+                '_id': '$prediction',
+                'count': {'$sum': 1},
+                'mean': {'$avg': '$confidence'},
+                'std': {'$stdDevPop': '$confidence'}
+            }}],
+            'bySource': [{'$group': {'_id': '$source', 'count': {'$sum': 1}}}],
+            # Binned counts feed the median; at most MEDIAN_BINS rows leave the server
+            'histogram': [{'$group': {
+                '_id': {'$min': [MEDIAN_BINS - 1, {'$floor': {'$multiply': ['$confidence', MEDIAN_BINS]}}]},
+                'count': {'$sum': 1}
+            }}]
+        }}
+    ]
+    facets = next(db.predictions.aggregate(pipeline, allowDiskUse=True))
+    if not facets['overall']:
+        return None
+
+    overall = facets['overall'][0]
+    sketch = QuantileSketch(MEDIAN_BINS)
+    for row in facets['histogram']:
+        sketch.counts[int(row['_id'])] = row['count']
+    tumor_count = sum(
+        row['count'] for row in facets['byClass']
+        if 'Tumor' in (row['_id'] or '') and 'No Tumor' not in row['_id']
+    )
+
+    return {
+        "overall_statistics": {
+            "total_predictions": overall['count'],
+            "average_confidence": overall['mean'],
+            "confidence_std": overall['std'],
+            "min_confidence": overall['min'],
+            "max_confidence": overall['max'],
+            "median_confidence": sketch.quantile(0.5)
+        },
+        "class_statistics": {row['_id']: row['count'] for row in facets['byClass']},
+        "method_statistics": {row['_id']: row['count'] for row in facets['bySource']},
+        "confidence_by_class": {
+            row['_id']: {"mean": row['mean'], "std": row['std'], "count": row['count']}
+            for row in facets['byClass']
+        },
+        "performance_metrics": {
+            "high_confidence_predictions": overall['high'],
+            "low_confidence_predictions": overall['low'],
+            "tumor_detection_rate": tumor_count / overall['count']
+        }
+    }
+
+
+def get_class_distribution(db, user_id=None, start=None, end=None):
+    """Counts and mean confidence per predicted class, largest first"""
+    pipeline = image_results_pipeline(user_id, start, end) + [
+        {'$group': {
+            '_id': '$prediction',
+            'tumorType': {'$first': '$tumorType'},
+            'count': {'$sum': 1},
+            'averageConfidence': {'$avg': '$confidence'}
+        }},
+        {'$sort': {'count': -1}}
+    ]
+    return [
+        {'prediction': row['_id'], 'tumorType': row['tumorType'], 'count': row['count'],
+         'averageConfidence': row['averageConfidence']}
+        for row in db.predictions.aggregate(pipeline, allowDiskUse=True)
+    ]
+
+
+def get_timeline(db, user_id=None, start=None, end=None, bucket='hour', page=1, per_page=168):
+    """Predictions per hour/day bucket (UTC), oldest first, paged"""
+    pipeline = image_results_pipeline(user_id, start, end) + [
+        {'$group': {
+            '_id': {'$dateToString': {'format': TIMELINE_BUCKETS[bucket], 'date': '$createdAt'}},
+            'count': {'$sum': 1},
+            'averageConfidence': {'$avg': '$confidence'}
+        }},
+        {'$sort': {'_id': 1}},
+        {'$facet': {
+            'total': [{'$count': 'buckets'}],
+            'page': [{'$skip': (page - 1) * per_page}, {'$limit': per_page}]
+        }}
+    ]
+    facets = next(db.predictions.aggregate(pipeline, allowDiskUse=True))
+    return {
+        'bucket': bucket,
+        'page': page,
+        'per_page': per_page,
+        'total_buckets': facets['total'][0]['buckets'] if facets['total'] else 0,
+        'timeline': [
+            {'period': row['_id'], 'count': row['count'], 'averageConfidence': row['averageConfidence']}
+            for row in facets['page']
+        ]
+    }
+
+
+def get_confidence_histogram(db, user_id=None, start=None, end=None, bins=20):
+    """Confidence counts in ``bins`` equal-width buckets over [0, 1]"""
+    # The last boundary is nudged past 1.0 so a confidence of exactly 1 lands in the top bucket
+    boundaries = [i / bins for i in range(bins)] + [1.0 + 1e-9]
+    pipeline = image_results_pipeline(user_id, start, end) + [
+        {'$bucket': {
+            'groupBy': '$confidence',
+            'boundaries': boundaries,
+            'default': 'out_of_range',
+            'output': {'count': {'$sum': 1}}
+        }}
+    ]
+    counts = {row['_id']: row['count'] for row in db.predictions.aggregate(pipeline, allowDiskUse=True)}
+    return {
+        'bins': bins,
+        'edges': [round(edge, 6) for edge in boundaries[:-1]] + [1.0],
+        'counts': [counts.get(boundary, 0) for boundary in boundaries[:-1]],
+        'out_of_range': counts.get('out_of_range', 0)
+    }
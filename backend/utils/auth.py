@@ -1,35 +1,44 @@
 import jwt
-import bcrypt
 import os
+import hmac
+import time
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify
 from dotenv import load_dotenv
+from config.database import get_database
+from utils.token_cache import TokenCache, token_digest
+from utils.password_hashing import password_hasher
 
 load_dotenv()
 
 JWT_SECRET = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 JWT_EXPIRATION_HOURS = int(os.getenv('JWT_EXPIRATION_HOURS', 24))
+# Shared secret for operational endpoints (X-Admin-Token header); unset disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+
+# Verified payloads by token digest, plus the logout denylist (revoked_tokens collection)
+token_cache = TokenCache(collection_getter=lambda: get_database().revoked_tokens)
 
 def hash_password(password):
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
+    """Hash a password using bcrypt (BCRYPT_ROUNDS) on the hashing executor"""
+    return password_hasher.hash(password)
 
 def verify_password(password, hashed_password):
-    """Verify a password against its hash"""
-    return bcrypt.checkpw(
-        password.encode('utf-8'), 
-        hashed_password.encode('utf-8')
-    )
+    """Verify a password against its hash on the hashing executor"""
+    return password_hasher.verify(password, hashed_password)
+
+def password_needs_rehash(hashed_password):
+    """True when the stored hash's cost differs from BCRYPT_ROUNDS"""
+    return password_hasher.needs_rehash(hashed_password)
 
-def generate_token(user_id, username, email):
+def generate_token(user_id, username, email, role='user'):
     """Generate JWT token"""
     payload = {
         'user_id': str(user_id),
         'username': username,
         'email': email,
+        'role': role,
         'exp': datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS),
         'iat': datetime.utcnow()
     }
@@ -37,16 +46,40 @@ def generate_token(user_id, username, email):
     token = jwt.encode(payload, JWT_SECRET, algorithm='HS256')
     return token
 
-def decode_token(token):
-    """Decode and verify JWT token"""
+def _verify_token(token):
+    """Full HS256 signature and exp check"""
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
-        return payload
+        return jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
 
+def decode_token(token):
+    """Decode and verify JWT token (cached by digest; revoked tokens are rejected)"""
+    start = time.perf_counter()
+    digest = token_digest(token)
+    payload = token_cache.get(digest)
+    
+    if payload is None and not token_cache.is_revoked(digest):
+        payload = _verify_token(token)
+        if payload:
+            token_cache.put(digest, payload)
+        else:
+            token_cache.count('invalid')
+    
+    token_cache.count('verifications')
+    token_cache.count('verifySeconds', time.perf_counter() - start)
+    # Callers may annotate the payload; keep the cached copy clean
+    return dict(payload) if payload else None
+
+def revoke_token(token):
+    """Deny a valid token until it expires (logout); returns its payload or None"""
+    payload = decode_token(token)
+    if payload:
+        token_cache.revoke(token_digest(token), payload['exp'])
+    return payload
+
 def token_required(f):
     """Decorator to protect routes with JWT authentication"""
     @wraps(f)
@@ -95,4 +128,29 @@ def optional_token(f):
         
         return f(*args, **kwargs)
     
-    return decorated
\ No newline at end of file
+    return decorated
+
+def is_admin(headers):
+    """True when the request carries the ADMIN_TOKEN secret in X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        return False
+    supplied = headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(supplied.encode(), ADMIN_TOKEN.encode())
+
+def is_admin_user(user, headers):
+    """True for a token with role 'admin' (tokens issued before roles count as users) or the admin token"""
+    return (user or {}).get('role') == 'admin' or is_admin(headers)
+
+def admin_required(f):
+    """Decorator for operational routes: requires the ADMIN_TOKEN secret in X-Admin-Token"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Admin endpoints are disabled (ADMIN_TOKEN not set)'}), 403
+        
+        if not is_admin(request.headers):
+            return jsonify({'error': 'Invalid admin token'}), 403
+        
+        return f(*args, **kwargs)
+    
+    return decorated
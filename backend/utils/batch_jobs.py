@@ -0,0 +1,246 @@
+import os
+import time
+import shutil
+import threading
+import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from bson import ObjectId
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BATCH_JOB_WORKERS = int(os.getenv('BATCH_JOB_WORKERS', 2))
+# Images decoded, predicted and written per step of a job
+BATCH_JOB_CHUNK_SIZE = int(os.getenv('BATCH_JOB_CHUNK_SIZE', 8))
+# Uploads wait here (one directory per job) instead of in memory until their chunk runs
+BATCH_JOB_SPOOL_DIR = os.getenv('BATCH_JOB_SPOOL_DIR', 'data/batch_jobs')
+# Unfinished jobs refresh heartbeatAt this often; silent for STALE_HEARTBEATS intervals means their process died
+BATCH_JOB_HEARTBEAT_SECONDS = float(os.getenv('BATCH_JOB_HEARTBEAT_SECONDS', 30))
+STALE_HEARTBEATS = 4
+# Job states remembered in-process (Mongo batch_jobs is the source of truth)
+MAX_TRACKED_JOBS = 1000
+
+
+class ResultsNotPersisted(Exception):
+    """Raised by process_chunk when predictions succeeded but writing them failed (and was deferred)"""
+
+    def __init__(self, failed, cause):
+        super().__init__(str(cause))
+        self.failed = failed
+
+
+class BatchJobManager:
+    """Runs batch prediction jobs in a background executor.
+
+    Job state lives in the ``batch_jobs`` collection (keyed by the batch id)
+    with an in-process mirror, so status polling works on any web worker and
+    still answers if Mongo is briefly unavailable. The caller supplies the
+    chunk-processing function; the manager handles scheduling and progress.
+    Uploads are spooled to disk and read back one chunk at a time. Unfinished
+    jobs carry a heartbeat, so jobs orphaned by a dead process are marked
+    failed by whichever process starts next.
+    """
+
+    def __init__(self, db_getter, max_workers=BATCH_JOB_WORKERS, chunk_size=BATCH_JOB_CHUNK_SIZE,
+                 spool_dir=BATCH_JOB_SPOOL_DIR, heartbeat_interval=BATCH_JOB_HEARTBEAT_SECONDS):
+        self.db_getter = db_getter
+        self.chunk_size = max(1, int(chunk_size))
+        self.spool_dir = spool_dir
+        self.heartbeat_interval = max(1.0, float(heartbeat_interval))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-job')
+        self._jobs = OrderedDict()
+        self._active = set()
+        self._lock = threading.Lock()
+        self._monitor = None
+
+    def start(self):
+        """Start the heartbeat thread; its first pass fails jobs left running by a dead process"""
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._monitor = threading.Thread(target=self._monitor_loop, name='batch-job-monitor', daemon=True)
+            self._monitor.start()
+
+    def _monitor_loop(self):
+        while True:
+            self._heartbeat()
+            self.fail_stale_jobs()
+            time.sleep(self.heartbeat_interval)
+
+    def _heartbeat(self):
+        with self._lock:
+            active = list(self._active)
+        if not active:
+            return
+        try:
+            self.db_getter().batch_jobs.update_many(
+                {'_id': {'$in': active}}, {'$set': {'heartbeatAt': datetime.datetime.utcnow()}})
+        except Exception as e:
+            print(f"Error updating batch job heartbeats: {e}")
+
+    def fail_stale_jobs(self):
+        """Mark queued/running jobs whose heartbeat stopped as failed; returns how many"""
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.heartbeat_interval * STALE_HEARTBEATS)
+        stale = {
+            'status': {'$in': ['queued', 'running']},
+            '$or': [
+                {'heartbeatAt': {'$lt': cutoff}},
+                {'heartbeatAt': {'$exists': False}, 'createdAt': {'$lt': cutoff}}
+            ]
+        }
+        try:
+            collection = self.db_getter().batch_jobs
+            job_ids = [job['_id'] for job in collection.find(stale, {'_id': 1})]
+            if not job_ids:
+                return 0
+            collection.update_many({**stale, '_id': {'$in': job_ids}}, {'$set': {
+                'status': 'failed',
+                'error': 'Interrupted: the server running this job stopped before it finished',
+                'finishedAt': datetime.datetime.utcnow()
+            }})
+        except Exception as e:
+            print(f"Error failing stale batch jobs: {e}")
+            return 0
+
+        for job_id in job_ids:
+            shutil.rmtree(self._spool_path(job_id), ignore_errors=True)
+        print(f"⚠️ Marked {len(job_ids)} interrupted batch jobs as failed")
+        return len(job_ids)
+
+    def _spool_path(self, job_id):
+        return os.path.join(self.spool_dir, str(job_id))
+
+    def _spool(self, job_id, items):
+        """Write (filename, bytes) items to the job's spool directory; returns (filename, path) items"""
+        directory = self._spool_path(job_id)
+        os.makedirs(directory, exist_ok=True)
+        spooled = []
+        for index, (filename, data) in enumerate(items):
+            path = os.path.join(directory, str(index))
+            with open(path, 'wb') as f:
+                f.write(data)
+            spooled.append((filename, path))
+        return spooled
+
+    @staticmethod
+    def _read_chunk(chunk):
+        loaded = []
+        for filename, path in chunk:
+            with open(path, 'rb') as f:
+                loaded.append((filename, f.read()))
+        return loaded
+
+    def _update(self, job_id, fields=None, inc=None):
+        """Apply a $set / $inc to the in-memory mirror and the Mongo job document"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields or {})
+                for key, value in (inc or {}).items():
+                    job[key] = job.get(key, 0) + value
+
+        update = {}
+        if fields:
+            update['$set'] = fields
+        if inc:
+            update['$inc'] = inc
+        try:
+            self.db_getter().batch_jobs.update_one({'_id': job_id}, update)
+        except Exception as e:
+            print(f"Error updating batch job {job_id}: {e}")
+
+    def submit(self, user_info, items, process_chunk, client_info=None, on_complete=None):
+        """Queue a job over ``items`` and return its id immediately
+
+        ``process_chunk(job_id, start_index, chunk_items)`` must persist the
+        chunk's results and return the number of images that failed, or raise
+        ResultsNotPersisted if only the write failed; ``on_complete(job_id)``
+        runs once after the last chunk. ``items`` are (filename, bytes) pairs;
+        they are on disk when this returns, so the caller can drop them.
+        """
+        self.start()
+        job_id = ObjectId()
+        try:
+            spooled = self._spool(job_id, items)
+        except Exception:
+            shutil.rmtree(self._spool_path(job_id), ignore_errors=True)
+            raise
+        now = datetime.datetime.utcnow()
+        job = {
+            '_id': job_id,
+            'userId': ObjectId(user_info['user_id']),
+            'username': user_info['username'],
+            'status': 'queued',
+            'totalImages': len(items),
+            'completedImages': 0,
+            'failedImages': 0,
+            'unsavedChunks': 0,
+            'error': None,
+            'clientInfo': client_info or {},
+            'createdAt': now,
+            'heartbeatAt': now,
+            'startedAt': None,
+            'finishedAt': None
+        }
+
+        with self._lock:
+            self._jobs[job_id] = dict(job)
+            self._active.add(job_id)
+            while len(self._jobs) > MAX_TRACKED_JOBS:
+                self._jobs.popitem(last=False)
+
+        try:
+            self.db_getter().batch_jobs.insert_one(job)
+        except Exception as e:
+            print(f"Error saving batch job {job_id}: {e}")
+
+        self._executor.submit(self._run, job_id, spooled, process_chunk, on_complete)
+        return job_id
+
+    def _run(self, job_id, items, process_chunk, on_complete):
+        self._update(job_id, {'status': 'running', 'startedAt': datetime.datetime.utcnow()})
+        try:
+            for start in range(0, len(items), self.chunk_size):
+                chunk = items[start:start + self.chunk_size]
+                try:
+                    failed = process_chunk(job_id, start, self._read_chunk(chunk))
+                except ResultsNotPersisted as e:
+                    # Predictions are fine; only their write is late
+                    print(f"Batch job {job_id} chunk at {start}: results not saved yet: {e}")
+                    failed = e.failed
+                    self._update(job_id, {'error': f"Some results are not saved yet: {e}"}, inc={'unsavedChunks': 1})
+                except Exception as e:
+                    # One bad chunk must not lose the rest of the study
+                    print(f"Error processing batch job {job_id} chunk at {start}: {e}")
+                    failed = len(chunk)
+                    self._update(job_id, {'error': str(e)})
+                self._update(job_id, inc={'completedImages': len(chunk) - failed, 'failedImages': failed})
+
+            if on_complete is not None:
+                on_complete(job_id)
+            self._update(job_id, {'status': 'completed', 'finishedAt': datetime.datetime.utcnow()})
+        except Exception as e:
+            self._update(job_id, {'status': 'failed', 'error': str(e), 'finishedAt': datetime.datetime.utcnow()})
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+            shutil.rmtree(self._spool_path(job_id), ignore_errors=True)
+
+    def get_job(self, job_id, user_id):
+        """Return the job document for this user, or None"""
+        try:
+            job = self.db_getter().batch_jobs.find_one({'_id': job_id, 'userId': user_id})
+            if job is not None:
+                return job
+        except Exception as e:
+            print(f"Error reading batch job {job_id}: {e}")
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job['userId'] == user_id:
+                return dict(job)
+        return None
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,161 @@
+import os
+import time
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHART_CACHE_MAX_ENTRIES = int(os.getenv('CHART_CACHE_MAX_ENTRIES', 64))
+# How often the background renderer checks for new predictions
+CHART_REFRESH_INTERVAL = float(os.getenv('CHART_REFRESH_INTERVAL', 5))
+# Only charts requested within this window are re-rendered in the background;
+# older ones are re-rendered on their next request
+CHART_REFRESH_ACTIVE_SECONDS = float(os.getenv('CHART_REFRESH_ACTIVE_SECONDS', 300))
+CHART_DEFAULT_DPI = int(os.getenv('CHART_DEFAULT_DPI', 300))
+CHART_MIN_DPI = 50
+CHART_MAX_DPI = 300
+CHART_FORMATS = ('png', 'svg')
+
+
+class ChartCache:
+    """Rendered charts keyed by (chart, dpi, format), tagged with the history version.
+
+    A request for up-to-date entries is a dictionary lookup. When the history
+    version moves on, requests keep getting the previous render while a
+    background thread re-renders the entries requested within
+    ``active_seconds``; a never-seen parameter set, or a stale one nobody
+    asked for lately, is rendered on the request path. ``render_fn(names,
+    dpi, fmt)`` renders a set of charts at once (in parallel) and returns
+    {name: payload}.
+    """
+
+    def __init__(self, render_fn, version_getter, max_entries=CHART_CACHE_MAX_ENTRIES,
+                 refresh_interval=CHART_REFRESH_INTERVAL, active_seconds=CHART_REFRESH_ACTIVE_SECONDS):
+        self.render_fn = render_fn
+        self.version_getter = version_getter
+        self.max_entries = max(1, int(max_entries))
+        self.refresh_interval = refresh_interval
+        self.active_seconds = active_seconds
+        self._entries = OrderedDict()
+        self._requested_at = {}
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._stats = {'hits': 0, 'staleHits': 0, 'misses': 0, 'renders': 0, 'backgroundRenders': 0, 'errors': 0}
+        self._refresher = None
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def get_many(self, names, dpi=CHART_DEFAULT_DPI, fmt='png'):
+        """Return {name: (version, base64 payload, rendered_at, etag)} for the requested charts"""
+        version = self.version_getter()
+        now = time.monotonic()
+        entries = {}
+        missing = []
+        with self._lock:
+            for name in names:
+                key = (name, dpi, fmt)
+                entry = self._entries.get(key)
+                idle = now - self._requested_at.get(key, now) > self.active_seconds
+                self._requested_at[key] = now
+                if entry is None or (idle and entry[0] != version):
+                    missing.append(name)
+                    continue
+                self._entries.move_to_end(key)
+                entries[name] = entry
+                # Stale entries are served while the refresher brings them up to date
+                self._stats['hits' if entry[0] == version else 'staleHits'] += 1
+
+        self._ensure_refresher()
+        if missing:
+            self._count('misses', len(missing))
+            entries.update(self._render(missing, dpi, fmt))
+        return {name: entries[name] for name in names}
+
+    def get(self, chart, dpi=CHART_DEFAULT_DPI, fmt='png'):
+        return self.get_many([chart], dpi, fmt)[chart]
+
+    def _render(self, names, dpi, fmt, background=False):
+        with self._render_lock:
+            version = self.version_getter()
+            entries = {}
+            with self._lock:
+                for name in names:
+                    entry = self._entries.get((name, dpi, fmt))
+                    if entry is not None and entry[0] == version:
+                        entries[name] = entry
+            to_render = [name for name in names if name not in entries]
+            if not to_render:
+                return entries
+
+            # Tagged with the version read before rendering, so a prediction
+            # arriving mid-render triggers another refresh
+            payloads = self.render_fn(to_render, dpi, fmt)
+            rendered_at = datetime.datetime.now()
+            with self._lock:
+                for name, payload in payloads.items():
+                    entry = entries[name] = (version, payload, rendered_at, payload_etag(payload))
+                    self._entries[(name, dpi, fmt)] = entry
+                    self._entries.move_to_end((name, dpi, fmt))
+                while len(self._entries) > self.max_entries:
+                    key, _ = self._entries.popitem(last=False)
+                    self._requested_at.pop(key, None)
+                self._stats['backgroundRenders' if background else 'renders'] += len(payloads)
+            return entries
+
+    def _ensure_refresher(self):
+        if self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name='chart-refresher', daemon=True)
+                self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            version = self.version_getter()
+            active_since = time.monotonic() - self.active_seconds
+            stale = {}
+            with self._lock:
+                for key, entry in self._entries.items():
+                    if entry[0] != version and self._requested_at.get(key, 0) >= active_since:
+                        name, dpi, fmt = key
+                        stale.setdefault((dpi, fmt), []).append(name)
+            # One parallel render per (dpi, format) group
+            for (dpi, fmt), names in stale.items():
+                try:
+                    self._render(names, dpi, fmt, background=True)
+                except Exception as e:
+                    self._count('errors')
+                    print(f"⚠️ Background chart render failed for {names} at {dpi} dpi/{fmt}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._requested_at.clear()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'refreshInterval': self.refresh_interval,
+                'activeSeconds': self.active_seconds
+            }
+
+
+def payload_etag(payload):
+    """Digest of one rendered chart, computed once per render"""
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def make_etag(parts):
+    """Strong ETag from (chart, dpi, format, payload etag) tuples; same bytes give the same tag in every process"""
+    digest = hashlib.sha1(repr(sorted(parts)).encode()).hexdigest()
+    return digest[:32]
@@ -0,0 +1,299 @@
+import os
+import base64
+import itertools
+import threading
+import multiprocessing as mp
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CHART_NAMES = (
+    'class_distribution',
+    'confidence_distribution',
+    'predictions_timeline',
+    'method_usage',
+    'confidence_trend'
+)
+# Chart processes; 0 renders in the calling thread
+CHART_RENDER_WORKERS = int(os.getenv('CHART_RENDER_WORKERS', min(len(CHART_NAMES), os.cpu_count() or 1)))
+# The confidence trend scatter is downsampled to at most this many points
+CHART_MAX_SCATTER_POINTS = int(os.getenv('CHART_MAX_SCATTER_POINTS', 5000))
+CHART_WORKER_PREFIX = 'chart-worker-'
+
+COLORS = ['#ff6b6b', '#4ecdc4', '#45b7d1', '#96ceb4']
+
+
+# ============================================================================
+# INPUT PREPARATION (parent process, vectorized)
+# ============================================================================
+
+def prepare_chart_inputs(snapshot, names=CHART_NAMES, utc_offset=0.0, max_scatter_points=CHART_MAX_SCATTER_POINTS):
+    """Reduce a PredictionHistory snapshot to the small arrays each chart needs"""
+    confidences = snapshot['confidence']
+    class_codes = snapshot['class_code']
+    class_labels = snapshot['class_labels']
+    inputs = {}
+
+    if 'class_distribution' in names:
+        counts = np.bincount(class_codes, minlength=len(class_labels))
+        present = np.nonzero(counts)[0]
+        inputs['class_distribution'] = {'labels': [class_labels[i] for i in present], 'counts': counts[present]}
+
+    if 'confidence_distribution' in names:
+        counts, edges = np.histogram(confidences, bins=20)
+        inputs['confidence_distribution'] = {'counts': counts, 'edges': edges, 'mean': float(confidences.mean())}
+
+    if 'predictions_timeline' in names or 'confidence_trend' in names:
+        local_times = ((snapshot['timestamp'] + utc_offset) * 1e6).astype('datetime64[us]')
+
+    if 'predictions_timeline' in names:
+        hours, counts = np.unique(local_times.astype('datetime64[h]'), return_counts=True)
+        inputs['predictions_timeline'] = {
+            'hours': [str(hour).replace('T', ' ') + ':00' for hour in hours],
+            'counts': counts
+        }
+
+    if 'method_usage' in names:
+        method_labels = snapshot['method_labels']
+        counts = np.bincount(snapshot['method_code'], minlength=len(method_labels))
+        present = np.nonzero(counts)[0]
+        inputs['method_usage'] = {'labels': [method_labels[i] for i in present], 'counts': counts[present]}
+
+    if 'confidence_trend' in names:
+        # Evenly spaced sample keeps the whole time range at a bounded point count
+        if len(confidences) > max_scatter_points:
+            sample = np.linspace(0, len(confidences) - 1, max_scatter_points).astype(np.int64)
+        else:
+            sample = slice(None)
+        inputs['confidence_trend'] = {
+            'timestamps': local_times[sample],
+            'confidences': confidences[sample],
+            'class_codes': class_codes[sample],
+            'class_labels': list(class_labels)
+        }
+
+    return inputs
+
+
+# ============================================================================
+# RENDERERS (worker processes, object-oriented Figure API)
+# ============================================================================
+
+# Per-process figure templates, cleared and reused between renders
+_figures = {}
+
+
+def _figure(name, figsize):
+    from matplotlib.figure import Figure
+
+    fig = _figures.get(name)
+    if fig is None:
+        fig = _figures[name] = Figure(figsize=figsize)
+    else:
+        fig.clear()
+        fig.set_size_inches(*figsize)
+    return fig
+
+
+def _encode(fig, dpi, fmt):
+    import matplotlib
+
+    buffer = BytesIO()
+    # No timestamp or random SVG ids: the same data renders to the same bytes (and ETag) in every process
+    with matplotlib.rc_context({'svg.hashsalt': 'charts'}):
+        fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches='tight',
+                    metadata={'Date': None} if fmt == 'svg' else None)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _rotate_xticks(ax, rotation=45, ha='right'):
+    for label in ax.get_xticklabels():
+        label.set_rotation(rotation)
+        label.set_ha(ha)
+
+
+def render_class_distribution(inputs, dpi, fmt):
+    """Class distribution bar chart"""
+    fig = _figure('class_distribution', (10, 6))
+    ax = fig.add_subplot()
+    labels, counts = inputs['labels'], inputs['counts']
+
+    bars = ax.bar(labels, counts, color=COLORS[:len(labels)])
+    ax.set_title('Brain Tumor Prediction Distribution', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Prediction Classes', fontsize=12)
+    ax.set_ylabel('Number of Predictions', fontsize=12)
+    _rotate_xticks(ax)
+
+    for bar, count in zip(bars, counts):
+        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + 0.1,
+                str(count), ha='center', va='bottom', fontweight='bold')
+
+    fig.tight_layout()
+    return _encode(fig, dpi, fmt)
+
+
+def render_confidence_distribution(inputs, dpi, fmt):
+    """Confidence score histogram from pre-binned counts"""
+    fig = _figure('confidence_distribution', (10, 6))
+    ax = fig.add_subplot()
+    edges = inputs['edges']
+
+    ax.hist(edges[:-1], bins=edges, weights=inputs['counts'], color='#45b7d1', alpha=0.7, edgecolor='black')
+    ax.axvline(inputs['mean'], color='red', linestyle='--', label=f"Mean: {inputs['mean']:.3f}")
+    ax.set_title('Prediction Confidence Distribution', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Confidence Score', fontsize=12)
+    ax.set_ylabel('Frequency', fontsize=12)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    return _encode(fig, dpi, fmt)
+
+
+def render_predictions_timeline(inputs, dpi, fmt):
+    """Predictions per hour line chart"""
+    fig = _figure('predictions_timeline', (12, 6))
+    ax = fig.add_subplot()
+    hours, counts = inputs['hours'], inputs['counts']
+    positions = range(len(hours))
+
+    ax.plot(positions, counts, marker='o', linewidth=2, markersize=6, color='#4ecdc4')
+    ax.fill_between(positions, counts, alpha=0.3, color='#4ecdc4')
+    ax.set_title('Predictions Over Time', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Time Period', fontsize=12)
+    ax.set_ylabel('Number of Predictions', fontsize=12)
+
+    step = max(1, len(hours)//10)
+    ax.set_xticks(range(0, len(hours), step))
+    ax.set_xticklabels([hours[i] for i in range(0, len(hours), step)])
+    _rotate_xticks(ax)
+    ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    return _encode(fig, dpi, fmt)
+
+
+def render_method_usage(inputs, dpi, fmt):
+    """Method usage pie chart"""
+    fig = _figure('method_usage', (8, 8))
+    ax = fig.add_subplot()
+    labels, counts = inputs['labels'], inputs['counts']
+
+    wedges, texts, autotexts = ax.pie(counts,
+                                      labels=labels,
+                                      autopct='%1.1f%%',
+                                      colors=COLORS,
+                                      startangle=90,
+                                      explode=[0.05] * len(counts))
+    ax.set_title('API Usage Methods', fontsize=16, fontweight='bold')
+
+    for autotext in autotexts:
+        autotext.set_color('white')
+        autotext.set_fontweight('bold')
+
+    return _encode(fig, dpi, fmt)
+
+
+def render_confidence_trend(inputs, dpi, fmt):
+    """Confidence over time scatter, one colour per predicted class"""
+    fig = _figure('confidence_trend', (12, 6))
+    ax = fig.add_subplot()
+    timestamps, confidences, class_codes = inputs['timestamps'], inputs['confidences'], inputs['class_codes']
+
+    for i, code in enumerate(np.unique(class_codes)):
+        mask = class_codes == code
+        ax.scatter(timestamps[mask], confidences[mask],
+                   label=inputs['class_labels'][code], alpha=0.7, s=50,
+                   color=COLORS[i % len(COLORS)])
+
+    ax.set_title('Prediction Confidence Over Time', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Time', fontsize=12)
+    ax.set_ylabel('Confidence Score', fontsize=12)
+    ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left')
+    _rotate_xticks(ax, ha='center')
+    ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    return _encode(fig, dpi, fmt)
+
+
+RENDERERS = {
+    'class_distribution': render_class_distribution,
+    'confidence_distribution': render_confidence_distribution,
+    'predictions_timeline': render_predictions_timeline,
+    'method_usage': render_method_usage,
+    'confidence_trend': render_confidence_trend
+}
+
+
+def render_chart(name, inputs, dpi, fmt):
+    """Render one chart to a base64 string (picklable entry point for workers)"""
+    return RENDERERS[name](inputs, dpi, fmt)
+
+
+# ============================================================================
+# PROCESS POOL
+# ============================================================================
+
+class _NamedSpawnContext:
+    """Spawn context whose processes carry CHART_WORKER_PREFIX names.
+
+    Spawned children re-import the main module; the name lets app.py skip
+    model loading there (see utils.worker_pool.is_worker_process).
+    """
+
+    def __init__(self):
+        self._ctx = mp.get_context('spawn')
+        self._ids = itertools.count()
+
+    def __getattr__(self, name):
+        return getattr(self._ctx, name)
+
+    def Process(self, *args, **kwargs):
+        kwargs['name'] = f'{CHART_WORKER_PREFIX}{next(self._ids)}'
+        return self._ctx.Process(*args, **kwargs)
+
+
+class ChartRenderer:
+    """Renders chart sets in parallel, one chart per worker process"""
+
+    def __init__(self, processes=CHART_RENDER_WORKERS):
+        self.processes = max(0, int(processes))
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=_NamedSpawnContext())
+            return self._executor
+
+    def render(self, inputs, dpi, fmt):
+        """Render every chart in ``inputs``; returns {name: base64 payload}"""
+        if self.processes == 0:
+            return {name: render_chart(name, chart_inputs, dpi, fmt) for name, chart_inputs in inputs.items()}
+
+        executor = self._get_executor()
+        futures = {
+            name: executor.submit(render_chart, name, chart_inputs, dpi, fmt)
+            for name, chart_inputs in inputs.items()
+        }
+        try:
+            return {name: future.result() for name, future in futures.items()}
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next render
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
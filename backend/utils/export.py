@@ -0,0 +1,125 @@
+import os
+import csv
+import json
+import datetime
+from io import StringIO
+from bson import ObjectId
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Documents per Mongo cursor batch and per response chunk: bounds export memory
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 500))
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+EXPORT_FIELDS = {
+    'predictions': (
+        '_id', 'userId', 'username', 'predictionType', 'filename', 'prediction', 'tumorType', 'confidence',
+        'severity', 'predictionMode', 'modelVersion', 'modelVariant', 'batchId', 'totalImages',
+        'processingTime', 'createdAt'
+    ),
+    'batch_results': (
+        '_id', 'batchId', 'imageIndex', 'userId', 'username', 'filename', 'status', 'prediction',
+        'tumorType', 'confidence', 'severity', 'probabilities', 'processingTime', 'modelVersion', 'error',
+        'createdAt'
+    )
+}
+# Who made each prediction: exported only to admins
+IDENTITY_FIELDS = ('userId', 'username')
+
+
+def export_query(user_id=None, start=None, end=None, tumor_type=None, batch_id=None):
+    """Filter for an export; leads with userId/createdAt to use the compound indexes"""
+    query = {}
+    if user_id is not None:
+        query['userId'] = user_id
+    if start is not None or end is not None:
+        query['createdAt'] = {}
+        if start is not None:
+            query['createdAt']['$gte'] = start
+        if end is not None:
+            query['createdAt']['$lt'] = end
+    if tumor_type:
+        query['tumorType'] = tumor_type
+    if batch_id is not None:
+        query['batchId'] = batch_id
+    return query
+
+
+def export_fields(collection, include_identity=False):
+    """Exported columns of ``collection``; userId/username only with ``include_identity``"""
+    fields = EXPORT_FIELDS[collection]
+    if include_identity:
+        return fields
+    return tuple(field for field in fields if field not in IDENTITY_FIELDS)
+
+
+def open_export_cursor(db, collection, query, fields):
+    """Cursor over ``collection`` that holds at most EXPORT_BATCH_SIZE documents at a time"""
+    projection = {field: 1 for field in fields}
+    if '_id' not in fields:
+        projection['_id'] = 0
+    return db[collection].find(query, projection).sort('createdAt', 1).batch_size(EXPORT_BATCH_SIZE)
+
+
+def _json_default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    if isinstance(value, (ObjectId, datetime.datetime)):
+        return _json_default(value)
+    return value
+
+
+def iter_ndjson(cursor):
+    """One JSON object per line, yielded in EXPORT_BATCH_SIZE-row chunks"""
+    lines = []
+    for document in cursor:
+        lines.append(json.dumps(document, default=_json_default))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_csv(cursor, fields):
+    """Header plus rows, yielded in EXPORT_BATCH_SIZE-row chunks"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    for document in cursor:
+        writer.writerow([_csv_value(document.get(field)) for field in fields])
+        rows += 1
+        if rows >= EXPORT_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+
+def stream_export(db, collection, query, fmt, include_identity=False):
+    """Generator of response chunks; the cursor is closed even if the client disconnects"""
+    fields = export_fields(collection, include_identity)
+    cursor = open_export_cursor(db, collection, query, fields)
+    try:
+        if fmt == 'csv':
+            yield from iter_csv(cursor, fields)
+        else:
+            yield from iter_ndjson(cursor)
+    finally:
+        cursor.close()
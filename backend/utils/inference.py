@@ -0,0 +1,167 @@
+import os
+import threading
+import queue
+import time
+from concurrent.futures import Future
+import numpy as np
+from dotenv import load_dotenv
+from utils.metrics import METRICS_ENABLED, inference_batch_size, inference_batch_seconds
+
+load_dotenv()
+
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv('INFERENCE_MAX_BATCH_SIZE', 16))
+INFERENCE_MAX_WAIT_MS = float(os.getenv('INFERENCE_MAX_WAIT_MS', 5))
+
+
+class EngineStopped(RuntimeError):
+    """Raised when a request is submitted to an engine that has been stopped"""
+
+
+class InferenceEngine:
+    """Dynamic micro-batching engine in front of a batched predict function.
+
+    Callers submit one preprocessed tensor at a time; a worker thread
+    collects whatever arrives within ``max_wait_ms`` (up to ``max_batch_size``
+    tensors), runs one forward pass and hands each caller its own row.
+    With ``concurrency`` > 1 several batches can be in flight at once (e.g.
+    one per process-pool worker).
+    """
+
+    def __init__(self, predict_fn, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS, concurrency=1, name='main'):
+        self.predict_fn = predict_fn
+        self.name = name
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.concurrency = max(1, int(concurrency))
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_histogram = {}
+        self._total_requests = 0
+        self._total_batches = 0
+        self._workers = []
+        self._running = False
+        self._stopped = False
+
+    def start(self):
+        """Start the batching worker threads (idempotent); a stopped engine cannot be restarted"""
+        with self._lock:
+            if self._stopped:
+                raise EngineStopped(f"Inference engine '{self.name}' has been stopped")
+            if self._running:
+                return
+            self._running = True
+            self._workers = [
+                threading.Thread(target=self._run, name=f'inference-engine-{i}', daemon=True)
+                for i in range(self.concurrency)
+            ]
+            for worker in self._workers:
+                worker.start()
+
+    def stop(self):
+        """Stop the workers after draining queued requests"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._stopped = True
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+    def submit(self, img_array):
+        """Queue one (H, W, C) or (1, H, W, C) tensor and return a Future of its probability row"""
+        if not self._running:
+            self.start()
+
+        if img_array.ndim == 4:
+            img_array = img_array[0]
+
+        future = Future()
+        # Under the lock so nothing is queued behind stop()'s sentinels
+        with self._lock:
+            if not self._running:
+                raise EngineStopped(f"Inference engine '{self.name}' has been stopped")
+            self._queue.put((img_array, future))
+        return future
+
+    def predict(self, img_array, timeout=None):
+        """Blocking convenience wrapper around submit()"""
+        return self.submit(img_array).result(timeout=timeout)
+
+    def _collect_batch(self, first_item):
+        """Gather up to max_batch_size items, waiting at most max_wait_ms after the first"""
+        batch = [first_item]
+        deadline = time.perf_counter() + self.max_wait_ms / 1000.0
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            if item is None:
+                # Shutdown sentinel: put it back so the run loop sees it
+                self._queue.put(None)
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                if not self._running:
+                    return
+                continue
+
+            batch = self._collect_batch(item)
+            futures = [future for _, future in batch]
+
+            start = time.perf_counter()
+            try:
+                inputs = np.stack([tensor for tensor, _ in batch]).astype(np.float32, copy=False)
+                outputs = np.asarray(self.predict_fn(inputs))
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            finally:
+                self._record_batch(len(batch), time.perf_counter() - start)
+
+            for row, future in zip(outputs, futures):
+                future.set_result(row)
+
+    def _record_batch(self, batch_size, seconds):
+        if METRICS_ENABLED:
+            inference_batch_size.labels(self.name).observe(batch_size)
+            inference_batch_seconds.labels(self.name).observe(seconds)
+        with self._lock:
+            self._batch_histogram[batch_size] = self._batch_histogram.get(batch_size, 0) + 1
+            self._total_requests += batch_size
+            self._total_batches += 1
+
+    def get_stats(self):
+        """Return queue depth and batch-size histogram for tuning"""
+        with self._lock:
+            histogram = dict(sorted(self._batch_histogram.items()))
+            total_requests = self._total_requests
+            total_batches = self._total_batches
+
+        return {
+            'running': self._running,
+            'maxBatchSize': self.max_batch_size,
+            'maxWaitMs': self.max_wait_ms,
+            'concurrency': self.concurrency,
+            'queueDepth': self._queue.qsize(),
+            'totalRequests': total_requests,
+            'totalBatches': total_batches,
+            'averageBatchSize': round(total_requests / total_batches, 3) if total_batches else 0,
+            'batchSizeHistogram': {str(size): count for size, count in histogram.items()}
+        }
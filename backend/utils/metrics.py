@@ -0,0 +1,257 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from pymongo import monitoring
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Recording is a dict lookup, a bisect and a lock (about 1 µs per event, see
+# scripts/benchmark_metrics.py), so metrics stay on in production
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Seconds; from a cached prediction (~1 ms) up to a large synchronous batch
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child for one label combination (created on first use)"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _items(self):
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    """Monotonic count, optionally per label combination"""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        for values, child in self._items():
+            yield self.name, tuple(zip(self.labelnames, values)), child.value
+
+
+class Histogram(_Metric):
+    """Fixed-bucket distribution, exposed as cumulative Prometheus buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def time(self, *values):
+        return self.labels(*values).time()
+
+    def samples(self):
+        for values, child in self._items():
+            labels = tuple(zip(self.labelnames, values))
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', labels + (('le', _format_value(float(bound))),), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, cumulative
+
+
+class MetricsRegistry:
+    """Metrics plus scrape-time collectors, rendered in the Prometheus text format.
+
+    Collectors are callables returning ``(name, kind, documentation, samples)``
+    tuples, where samples are ``(labels dict, value)`` pairs; they read
+    existing stats (caches, queues, history) only when /metrics is scraped.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(tuple(labels.items()))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    'http_requests_total', 'HTTP requests by method, route template and status', ('method', 'route', 'status'))
+http_request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by method and route template', ('method', 'route'))
+stage_seconds = metrics.histogram(
+    'prediction_stage_duration_seconds',
+    'Prediction stages (upload, cache_lookup, decode, inference, postprocess, db_write, serialization) '
+    'per single image or per batch request',
+    ('pipeline', 'stage'))
+inference_batch_size = metrics.histogram(
+    'inference_batch_size', 'Images per micro-batched forward pass', ('engine',), BATCH_SIZE_BUCKETS)
+inference_batch_seconds = metrics.histogram(
+    'inference_batch_duration_seconds', 'Forward pass time per micro-batch', ('engine',))
+mongo_seconds = metrics.histogram(
+    'mongo_operation_duration_seconds', 'MongoDB command latency', ('command', 'collection'))
+mongo_errors = metrics.counter(
+    'mongo_operation_errors_total', 'Failed MongoDB commands', ('command', 'collection'))
+
+
+def observe_stage(stage, start, pipeline='single'):
+    """Record the time since ``start`` for a pipeline stage; returns now so stages chain"""
+    now = time.perf_counter()
+    if METRICS_ENABLED:
+        stage_seconds.labels(pipeline, stage).observe(now - start)
+    return now
+
+
+def observe_stages(stage_times, pipeline='batch'):
+    """Record a {stage: seconds} dict, as built by the batch endpoints"""
+    if not METRICS_ENABLED:
+        return
+    for stage, seconds in stage_times.items():
+        stage_seconds.labels(pipeline, stage).observe(seconds)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command from the driver's own monitoring events"""
+
+    def __init__(self):
+        self._pending = {}
+
+    @staticmethod
+    def _collection(event):
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            return target
+        # getMore names the cursor id; the collection is a separate field
+        return event.command.get('collection', '')
+
+    def started(self, event):
+        self._pending[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def succeeded(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), '')
+        mongo_seconds.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._pending.pop((event.connection_id, event.request_id), '')
+        mongo_seconds.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+        mongo_errors.labels(event.command_name, collection).inc()
+
+
+mongo_command_metrics = MongoCommandMetrics()
@@ -0,0 +1,296 @@
+import os
+import time
+import hashlib
+import datetime
+import threading
+from contextlib import contextmanager
+import numpy as np
+from dotenv import load_dotenv
+from utils.inference import InferenceEngine
+from utils.preprocessing import IMAGE_SHAPE
+
+load_dotenv()
+
+# Poll the model file and hot-reload it when it changes (0 = reload only via POST /api/model/reload)
+MODEL_RELOAD_POLL_SECONDS = float(os.getenv('MODEL_RELOAD_POLL_SECONDS', 0))
+# A replaced model still serving requests after this long is reported (it is closed only once they finish)
+MODEL_RETIRE_TIMEOUT = float(os.getenv('MODEL_RETIRE_TIMEOUT', 120))
+# Load attempts kept for /api/model/registry
+MODEL_HISTORY_SIZE = 10
+
+
+class ModelNotReady(Exception):
+    """Raised when a prediction is requested before any model version is active"""
+
+
+class ModelReloadInProgress(Exception):
+    """Raised when a load is requested while another one is still running"""
+
+
+def file_fingerprint(path):
+    """(mtime, size) of a model file; changes when the file is replaced"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Short SHA-256 of a model file, used to name versions loaded without an explicit name"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+class ModelVersion:
+    """One loaded model file and the micro-batching engine in front of it"""
+
+    def __init__(self, version, path, fingerprint, predictor, keras_model=None, concurrency=1):
+        self.version = version
+        self.path = path
+        self.fingerprint = fingerprint
+        self.predictor = predictor
+        self.keras_model = keras_model
+        # Concurrent requests share one batched forward pass on this version
+        self.engine = InferenceEngine(predictor, concurrency=concurrency)
+        self.activated_at = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.warmup_timings = {}
+        self.in_flight = 0
+        self.requests = 0
+
+    def count_params(self):
+        if self.keras_model is not None:
+            return self.keras_model.count_params()
+        if hasattr(self.predictor, 'count_params'):
+            return self.predictor.count_params()
+        return "Unknown"
+
+    def close(self):
+        """Stop the engine after draining its queue, then release the predictor"""
+        self.engine.stop()
+        if hasattr(self.predictor, 'stop'):
+            self.predictor.stop()
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'path': self.path,
+            'activatedAt': self.activated_at.isoformat() if self.activated_at else None,
+            'loadSeconds': self.load_seconds,
+            'warmupSeconds': self.warmup_seconds,
+            'warmupBatchSizes': sorted(self.warmup_timings),
+            'inFlight': self.in_flight,
+            'requests': self.requests
+        }
+
+
+class ModelRegistry:
+    """The active model version, with background loading, warmup and atomic swaps.
+
+    A new version is loaded and warmed up across the configured batch sizes
+    while the current one keeps serving; only then does it replace the active
+    reference. Requests hold the version they started with through
+    ``acquire()``, so a swap never fails or changes the model under an
+    in-flight request, and the replaced version is closed only once its last
+    request has returned. A failed load leaves the active version untouched.
+    """
+
+    def __init__(self, loader, concurrency=1, on_activate=None, retire_timeout=MODEL_RETIRE_TIMEOUT):
+        # loader(path) -> (callable predictor with .predict/.warmup, keras model or None)
+        self.loader = loader
+        self.concurrency = concurrency
+        self.on_activate = on_activate
+        self.retire_timeout = retire_timeout
+        self._active = None
+        self._loading = None
+        self._retiring = []
+        self._last_error = None
+        self._failed_fingerprint = None
+        self._history = []
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        """Active ModelVersion, or None before the first successful load"""
+        return self._active
+
+    @property
+    def version(self):
+        active = self._active
+        return active.version if active is not None else None
+
+    @property
+    def status(self):
+        """'ready' once a version is active, 'failed' if the last load failed with none active, else 'loading'"""
+        if self._active is not None:
+            return 'ready'
+        if self._last_error is not None and self._loading is None:
+            return 'failed'
+        return 'loading'
+
+    @contextmanager
+    def acquire(self):
+        """Pin the active version for the duration of one request"""
+        with self._lock:
+            entry = self._active
+            if entry is None:
+                raise ModelNotReady(f"Model not loaded ({self.status})")
+            entry.in_flight += 1
+            entry.requests += 1
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.in_flight -= 1
+
+    def _claim(self, path):
+        with self._lock:
+            if self._loading is not None:
+                return False
+            self._loading = path
+            return True
+
+    def load(self, path, version=None, warmup_batch_sizes=None):
+        """Load, warm up and activate a model file; raises if it cannot be served"""
+        if not self._claim(path):
+            raise ModelReloadInProgress(f"Already loading {self._loading}")
+        return self._load(path, version, warmup_batch_sizes)
+
+    def load_async(self, path, version=None, warmup_batch_sizes=None):
+        """Start a load on a background thread; False if one is already running"""
+        if not self._claim(path):
+            return False
+
+        def run():
+            try:
+                self._load(path, version, warmup_batch_sizes)
+            except Exception:
+                pass  # recorded in the load history
+
+        threading.Thread(target=run, name='model-loader', daemon=True).start()
+        return True
+
+    def _load(self, path, version, warmup_batch_sizes):
+        start = time.perf_counter()
+        entry = None
+        fingerprint = None
+        try:
+            print(f"🔄 Loading model from {path}...")
+            fingerprint = file_fingerprint(path)
+            version = version or f"{os.path.splitext(os.path.basename(path))[0]}-{file_digest(path)}"
+            predictor, keras_model = self.loader(path)
+            entry = ModelVersion(version, path, fingerprint, predictor, keras_model, self.concurrency)
+            entry.load_seconds = time.perf_counter() - start
+
+            # Trace graphs and allocate buffers for every batch size before taking traffic
+            warmup_start = time.perf_counter()
+            entry.warmup_timings = predictor.warmup(warmup_batch_sizes) or {}
+            # One request through the engine as well: starts its threads and checks the output
+            entry.engine.start()
+            output = entry.engine.predict(np.zeros(IMAGE_SHAPE, dtype=np.float32), timeout=self.retire_timeout)
+            if not np.all(np.isfinite(output)):
+                raise ValueError("warmup produced non-finite probabilities")
+            entry.warmup_seconds = time.perf_counter() - warmup_start
+        except Exception as e:
+            if entry is not None:
+                entry.close()
+            with self._lock:
+                self._loading = None
+                self._last_error = f"{path}: {e}"
+                self._failed_fingerprint = fingerprint
+            self._record(path, version, 'failed', time.perf_counter() - start, str(e))
+            print(f"❌ Error loading model {path}: {e}")
+            raise
+
+        self._activate(entry)
+        self._record(path, version, 'activated', time.perf_counter() - start)
+        return entry
+
+    def _activate(self, entry):
+        entry.activated_at = datetime.datetime.utcnow()
+        with self._lock:
+            previous, self._active = self._active, entry
+            self._loading = None
+            self._last_error = None
+            self._failed_fingerprint = None
+            if previous is not None:
+                self._retiring.append(previous)
+
+        print(f"✅ Model {entry.version} active (loaded in {entry.load_seconds:.1f}s, "
+              f"warmed up in {entry.warmup_seconds:.1f}s)")
+        if self.on_activate is not None:
+            try:
+                self.on_activate(entry)
+            except Exception as e:
+                print(f"⚠️ Model activation hook failed: {e}")
+        if previous is not None:
+            threading.Thread(target=self._retire, args=(previous,), name='model-retire', daemon=True).start()
+
+    def _retire(self, entry):
+        """Close a replaced version once the requests pinned to it have finished"""
+        deadline = time.monotonic() + self.retire_timeout
+        warned = False
+        # Closing stops the engine, so never close under a pinned request
+        while entry.in_flight > 0:
+            if not warned and time.monotonic() >= deadline:
+                print(f"⚠️ Model {entry.version} still has {entry.in_flight} requests running "
+                      f"after {self.retire_timeout:.0f}s; waiting for them before closing")
+                warned = True
+            time.sleep(0.05)
+        try:
+            entry.close()
+        except Exception as e:
+            print(f"⚠️ Error closing model {entry.version}: {e}")
+        with self._lock:
+            self._retiring.remove(entry)
+        print(f"♻️ Model {entry.version} retired after {entry.requests} requests")
+
+    def _record(self, path, version, outcome, seconds, error=None):
+        with self._lock:
+            self._history.append({
+                'path': path,
+                'version': version,
+                'outcome': outcome,
+                'seconds': round(seconds, 3),
+                'error': error,
+                'at': datetime.datetime.utcnow().isoformat()
+            })
+            del self._history[:-MODEL_HISTORY_SIZE]
+
+    def watch(self, path, interval=MODEL_RELOAD_POLL_SECONDS):
+        """Reload ``path`` in the background whenever the file is replaced"""
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(path, interval), name='model-watcher', daemon=True
+        )
+        self._watcher.start()
+
+    def _watch_loop(self, path, interval):
+        last_seen = None
+        while True:
+            time.sleep(interval)
+            try:
+                fingerprint = file_fingerprint(path)
+            except OSError:
+                continue
+            active = self._active
+            changed = (active is None or fingerprint != active.fingerprint) and fingerprint != self._failed_fingerprint
+            # Only reload once the file has stopped changing for a full interval (copy finished)
+            if changed and fingerprint == last_seen:
+                self.load_async(path)
+            last_seen = fingerprint
+
+    def get_stats(self):
+        with self._lock:
+            active = self._active
+            return {
+                'status': self.status,
+                'active': active.to_dict() if active is not None else None,
+                'loading': self._loading,
+                'retiring': [entry.to_dict() for entry in self._retiring],
+                'lastError': self._last_error,
+                'history': list(self._history)
+            }
@@ -0,0 +1,84 @@
+import os
+import base64
+import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+from utils.analytics import parse_time_range
+
+MAX_HISTORY_PAGE_SIZE = int(os.getenv('MAX_HISTORY_PAGE_SIZE', 100))
+DEFAULT_HISTORY_PAGE_SIZE = 20
+
+# Returned when no ?fields= is given: enough for a history list, without
+# recommendations, medicalDescription or probabilities
+DEFAULT_HISTORY_FIELDS = (
+    'predictionType', 'filename', 'prediction', 'tumorType', 'confidence', 'confidencePercentage',
+    'severity', 'predictionMode', 'modelVersion', 'batchId', 'totalImages', 'createdAt'
+)
+ALLOWED_HISTORY_FIELDS = set(DEFAULT_HISTORY_FIELDS) | {
+    'fileSize', 'confidenceLevel', 'medicalDescription', 'recommendations', 'processingTime',
+    'modelVariant', 'analysisDate', 'probabilities', 'batchSummary'
+}
+
+
+def encode_cursor(created_at, document_id):
+    """Opaque keyset cursor for the last document of a page"""
+    raw = f"{created_at.isoformat()}|{document_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """(createdAt, _id) from a cursor; raises ValueError"""
+    try:
+        created_at, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(created_at), ObjectId(document_id)
+    except (ValueError, InvalidId, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def parse_fields(fields):
+    """Projection for a comma-separated ?fields= value (default: lean projection)"""
+    names = [name.strip() for name in fields.split(',') if name.strip()] if fields else DEFAULT_HISTORY_FIELDS
+    unknown = [name for name in names if name not in ALLOWED_HISTORY_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # createdAt and _id are always returned: the next cursor is built from them
+    return {'_id': 1, 'createdAt': 1, **{name: 1 for name in names}}
+
+
+def parse_history_args(args):
+    """Keyword arguments for get_predictions_history from query args; raises ValueError"""
+    limit = int(args.get('limit', DEFAULT_HISTORY_PAGE_SIZE))
+    start, end = parse_time_range(args)
+    cursor = args.get('cursor')
+    return {
+        'limit': min(max(1, limit), MAX_HISTORY_PAGE_SIZE),
+        'cursor': decode_cursor(cursor) if cursor else None,
+        'projection': parse_fields(args.get('fields')),
+        'tumor_type': args.get('tumor_type') or None,
+        'start': start,
+        'end': end
+    }
+
+
+def history_query(user_id, cursor=None, tumor_type=None, start=None, end=None):
+    """Filter for one page, newest first; served by the (userId, [tumorType,] createdAt, _id) indexes"""
+    query = {'userId': user_id}
+    if tumor_type:
+        query['tumorType'] = tumor_type
+
+    created_at = {}
+    if start is not None:
+        created_at['$gte'] = start
+    if end is not None:
+        created_at['$lt'] = end
+    if created_at:
+        query['createdAt'] = created_at
+
+    if cursor is not None:
+        last_created_at, last_id = cursor
+        # Seek past the last row instead of skipping: cost is independent of page depth
+        query['$or'] = [
+            {'createdAt': {'$lt': last_created_at}},
+            {'createdAt': last_created_at, '_id': {'$lt': last_id}}
+        ]
+    return query
@@ -0,0 +1,131 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# bcrypt work factor for new hashes; stored hashes with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+# bcrypt releases the GIL, so threads give real parallelism; keep this below the core count
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+# Hashes allowed to wait for a worker before new ones are rejected; under Flask each
+# waiting hash holds its request thread, so keep the queue short
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 4))
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+
+LOGIN_LIMIT_WINDOW_SECONDS = int(os.getenv('LOGIN_LIMIT_WINDOW_SECONDS', 60))
+LOGIN_LIMIT_PER_IP = int(os.getenv('LOGIN_LIMIT_PER_IP', 30))
+LOGIN_LIMIT_PER_USERNAME = int(os.getenv('LOGIN_LIMIT_PER_USERNAME', 10))
+# Distinct IPs/usernames tracked per window before the oldest are forgotten
+LOGIN_LIMIT_MAX_KEYS = 100000
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing executor already has its maximum pending work"""
+
+
+class PasswordHasher:
+    """bcrypt on a small dedicated executor so login bursts cannot take every CPU
+
+    The caller still waits for its own hash (up to ``timeout``); only the
+    queue in front of the workers is bounded, and work beyond it is
+    rejected with PasswordHashingBusy instead of waiting.
+    """
+
+    def __init__(self, rounds=BCRYPT_ROUNDS, workers=PASSWORD_HASH_WORKERS,
+                 max_pending=PASSWORD_HASH_MAX_PENDING, timeout=PASSWORD_HASH_TIMEOUT):
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._stats_lock = threading.Lock()
+        self._stats = {'hashes': 0, 'verifications': 0, 'rehashes': 0, 'rejected': 0, 'seconds': 0.0}
+
+    def _run(self, kind, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._stats['rejected'] += 1
+            raise PasswordHashingBusy("Too many concurrent password operations")
+
+        start = time.perf_counter()
+        future = self._executor.submit(fn, *args)
+        # The slot is held until the work finishes, even if the caller times out
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        finally:
+            with self._stats_lock:
+                self._stats[kind] += 1
+                self._stats['seconds'] += time.perf_counter() - start
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(rounds=self.rounds)
+        return self._run('hashes', bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password, hashed_password):
+        return self._run('verifications', bcrypt.checkpw, password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+    def needs_rehash(self, hashed_password):
+        """True when a stored $2b$<cost>$ hash was made with a different work factor"""
+        try:
+            return int(hashed_password.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return False
+
+    def count_rehash(self):
+        with self._stats_lock:
+            self._stats['rehashes'] += 1
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        operations = stats['hashes'] + stats['verifications']
+        return {
+            **stats,
+            'rounds': self.rounds,
+            'averageMillis': stats['seconds'] / operations * 1000 if operations else 0.0
+        }
+
+
+class AdmissionLimiter:
+    """Fixed-window attempt counters per key (IP address or username)"""
+
+    def __init__(self, limit, window_seconds=LOGIN_LIMIT_WINDOW_SECONDS, max_keys=LOGIN_LIMIT_MAX_KEYS):
+        self.limit = limit
+        self.window = window_seconds
+        self.max_keys = max_keys
+        self._window_start = time.monotonic()
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def admit(self, key):
+        """Count an attempt; returns seconds until the next window if over the limit, else None"""
+        if self.limit <= 0 or not key:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._counts = {}
+            if key not in self._counts and len(self._counts) >= self.max_keys:
+                self._counts.pop(next(iter(self._counts)))
+            self._counts[key] = self._counts.get(key, 0) + 1
+            if self._counts[key] > self.limit:
+                return max(1, int(self.window - (now - self._window_start)))
+        return None
+
+
+password_hasher = PasswordHasher()
+ip_limiter = AdmissionLimiter(LOGIN_LIMIT_PER_IP)
+username_limiter = AdmissionLimiter(LOGIN_LIMIT_PER_USERNAME)
+
+
+def admit_login(ip_address, username=None):
+    """Seconds to wait before retrying, or None when the attempt is admitted"""
+    retry_after = ip_limiter.admit(ip_address)
+    if retry_after is None and username:
+        retry_after = username_limiter.admit(username.lower())
+    return retry_after
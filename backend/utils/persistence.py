@@ -0,0 +1,290 @@
+import os
+import glob
+import uuid
+import atexit
+import queue
+import threading
+import time
+from bson import ObjectId, json_util
+from pymongo.errors import BulkWriteError
+from dotenv import load_dotenv
+from config.database import get_database
+from utils.user_stats import apply_rollups
+
+load_dotenv()
+
+PERSIST_MAX_QUEUE = int(os.getenv('PERSIST_MAX_QUEUE', 10000))
+PERSIST_BATCH_SIZE = int(os.getenv('PERSIST_BATCH_SIZE', 500))
+PERSIST_FLUSH_INTERVAL_MS = float(os.getenv('PERSIST_FLUSH_INTERVAL_MS', 500))
+# Documents land here when MongoDB is unreachable or the queue is full; replayed later
+PERSIST_SPILL_FILE = os.getenv('PERSIST_SPILL_FILE', 'data/persistence_spill.jsonl')
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class WriteBehindWriter:
+    """Buffers documents in a bounded queue and flushes them with unordered insert_many.
+
+    A flush happens when ``batch_size`` documents are waiting or
+    ``flush_interval_ms`` has passed. Documents that cannot be written (MongoDB
+    down, queue full) are appended to a local spill file and replayed after the
+    next successful flush. Documents get their ``_id`` up front, so replays are
+    idempotent and callers can return ids without waiting for the write.
+    ``on_written(collection, documents)`` runs after each successful insert
+    with the documents actually inserted, never with duplicate-key ones, so a
+    replay cannot count a document twice. Once closed the writer stays
+    closed: later documents go straight to the spill file.
+    """
+
+    def __init__(self, db_getter, max_queue=PERSIST_MAX_QUEUE, batch_size=PERSIST_BATCH_SIZE,
+                 flush_interval_ms=PERSIST_FLUSH_INTERVAL_MS, spill_path=PERSIST_SPILL_FILE, on_written=None):
+        self.db_getter = db_getter
+        self.on_written = on_written
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval_ms)) / 1000.0
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'written': 0, 'flushes': 0, 'spilled': 0, 'replayed': 0, 'errors': 0}
+        self._thread = None
+        self._running = False
+        self._closed = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._running or self._closed:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def enqueue(self, collection, document):
+        """Queue one document for ``collection``; returns its _id"""
+        document.setdefault('_id', ObjectId())
+        if self._closed:
+            # Shutting down (e.g. atexit): the next process replays it
+            self._spill([(collection, document)])
+            return document['_id']
+        if not self._running:
+            self.start()
+
+        try:
+            self._queue.put_nowait((collection, document))
+            self._count('enqueued')
+        except queue.Full:
+            # Never block the request path: spill straight to disk
+            self._spill([(collection, document)])
+        return document['_id']
+
+    def enqueue_many(self, collection, documents):
+        return [self.enqueue(collection, document) for document in documents]
+
+    def _count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _run(self):
+        self._recover_orphans()
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+                if item is None:
+                    self._flush(pending)
+                    return
+                pending.append(item)
+            except queue.Empty:
+                pass
+
+            if len(pending) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(pending)
+                pending = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, items):
+        if not items:
+            return
+
+        by_collection = {}
+        for collection, document in items:
+            by_collection.setdefault(collection, []).append(document)
+
+        succeeded = True
+        for collection, documents in by_collection.items():
+            if not self._insert(collection, documents):
+                succeeded = False
+                self._spill([(collection, document) for document in documents])
+
+        self._count('flushes')
+        if succeeded:
+            self._replay_spill()
+
+    def _insert(self, collection, documents):
+        """insert_many(ordered=False); duplicate keys (replays) count as success"""
+        try:
+            self.db_getter()[collection].insert_many(documents, ordered=False)
+            self._count('written', len(documents))
+            self._notify(collection, documents)
+            return True
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            if all(error.get('code') == DUPLICATE_KEY_ERROR for error in write_errors):
+                self._count('written', len(documents) - len(write_errors))
+                duplicates = {error.get('index') for error in write_errors}
+                self._notify(collection, [d for i, d in enumerate(documents) if i not in duplicates])
+                return True
+            print(f"⚠️ Write-behind bulk write error on {collection}: {len(write_errors)} errors")
+            self._count('errors')
+            return False
+        except Exception as e:
+            print(f"⚠️ Write-behind flush to {collection} failed: {e}")
+            self._count('errors')
+            return False
+
+    def _notify(self, collection, documents):
+        if self.on_written is None or not documents:
+            return
+        try:
+            self.on_written(collection, documents)
+        except Exception as e:
+            print(f"⚠️ Write-behind on_written hook failed for {collection}: {e}")
+
+    def _spill(self, items):
+        with self._spill_lock:
+            try:
+                os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+                with open(self.spill_path, 'a', encoding='utf-8') as f:
+                    for collection, document in items:
+                        f.write(json_util.dumps({'collection': collection, 'document': document}) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._count('spilled', len(items))
+            except Exception as e:
+                print(f"❌ Could not spill {len(items)} documents to {self.spill_path}: {e}")
+
+    def _replay_path(self):
+        # Unique per replay: several processes can share one spill file
+        return f"{self.spill_path}.replaying.{os.getpid()}.{uuid.uuid4().hex}"
+
+    def _replay_spill(self):
+        """Re-insert spilled documents once MongoDB is reachable again"""
+        if not os.path.exists(self.spill_path):
+            return
+
+        replay_path = self._replay_path()
+        with self._spill_lock:
+            try:
+                os.replace(self.spill_path, replay_path)
+            except FileNotFoundError:
+                return  # Another process claimed it
+        self._replay_file(replay_path)
+
+    def _recover_orphans(self):
+        """Replay files left behind by a process that died mid-replay"""
+        for path in glob.glob(f"{glob.escape(self.spill_path)}.replaying*"):
+            owner = path.split('.replaying.', 1)[-1].split('.', 1)[0]
+            if owner.isdigit() and self._process_alive(int(owner)):
+                continue
+            claimed = self._replay_path()
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            print(f"🔄 Replaying orphaned spill file {path}")
+            self._replay_file(claimed)
+
+    @staticmethod
+    def _process_alive(pid):
+        if pid == os.getpid():
+            return False  # Left over from a previous process that had our pid
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            pass  # Exists but belongs to another user
+        return True
+
+    def _replay_file(self, replay_path):
+        by_collection = {}
+        try:
+            with open(replay_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json_util.loads(line)
+                        by_collection.setdefault(entry['collection'], []).append(entry['document'])
+        except Exception as e:
+            print(f"❌ Could not read spill file {replay_path}: {e}")
+            return
+
+        for collection, documents in by_collection.items():
+            for start in range(0, len(documents), self.batch_size):
+                chunk = documents[start:start + self.batch_size]
+                if self._insert(collection, chunk):
+                    self._count('replayed', len(chunk))
+                else:
+                    self._spill([(collection, document) for document in chunk])
+        os.remove(replay_path)
+
+    def _drain(self):
+        items = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return items
+            if item is not None:
+                items.append(item)
+
+    def close(self, timeout=30):
+        """Flush everything still queued (call on shutdown); the writer does not restart"""
+        with self._start_lock:
+            self._closed = True
+            if not self._running:
+                return
+            self._running = False
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            # The writer is stuck on MongoDB: keep what is still queued on disk instead
+            print("⚠️ Write-behind queue did not drain on shutdown, spilling it")
+            self._spill(self._drain())
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+        self._thread.join(timeout=timeout)
+        # Anything enqueued while closing was never flushed
+        leftover = self._drain()
+        if leftover:
+            self._spill(leftover)
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        return {
+            **stats,
+            'queueDepth': self._queue.qsize(),
+            'spillFileExists': os.path.exists(self.spill_path)
+        }
+
+
+# Shared writer for predictions, batch results and audit logs; keeps user_stats rollups current
+write_behind = WriteBehindWriter(
+    get_database,
+    on_written=lambda collection, documents: apply_rollups(get_database(), collection, documents)
+)
+atexit.register(write_behind.close)
+
+
+def enqueue_prediction(document):
+    return write_behind.enqueue('predictions', document)
+
+
+def enqueue_audit_log(document):
+    return write_behind.enqueue('audit_logs', document)
@@ -0,0 +1,186 @@
+import os
+import hashlib
+import threading
+import time
+import datetime
+from collections import OrderedDict
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PREDICTION_CACHE_MAX_ENTRIES = int(os.getenv('PREDICTION_CACHE_MAX_ENTRIES', 1024))
+PREDICTION_CACHE_TTL_SECONDS = int(os.getenv('PREDICTION_CACHE_TTL_SECONDS', 3600))
+PREDICTION_CACHE_PERSISTENT = os.getenv('PREDICTION_CACHE_PERSISTENT', 'false').lower() in ('1', 'true', 'yes')
+
+# How often (seconds) the model file is re-checked for changes
+MODEL_CHECK_INTERVAL = 1.0
+
+
+def hash_image_bytes(data):
+    """Content hash of the raw upload bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class PredictionCache:
+    """Content-addressed cache of probability rows keyed by image hash and model version.
+
+    Tier 1 is an in-process LRU with size and TTL limits; tier 2 is an optional
+    Mongo collection shared between processes. Keys embed a fingerprint of the
+    model file (version, mtime, size), so replacing the model invalidates both
+    tiers automatically.
+    """
+
+    def __init__(self, model_path, model_version, max_entries=PREDICTION_CACHE_MAX_ENTRIES,
+                 ttl_seconds=PREDICTION_CACHE_TTL_SECONDS, collection_getter=None):
+        self.model_path = model_path
+        self.model_version = model_version
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self.collection_getter = collection_getter
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint = self._compute_fingerprint()
+        self._last_model_check = time.monotonic()
+        self._stats = {
+            'memoryHits': 0,
+            'persistentHits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0
+        }
+
+    def _compute_fingerprint(self):
+        try:
+            stat = os.stat(self.model_path)
+            return f"{self.model_version}:{stat.st_mtime_ns}:{stat.st_size}"
+        except OSError:
+            return f"{self.model_version}:missing"
+
+    def _check_model(self):
+        """Drop the memory tier when the model file or version has changed"""
+        now = time.monotonic()
+        if now - self._last_model_check < MODEL_CHECK_INTERVAL:
+            return
+        self._last_model_check = now
+
+        fingerprint = self._compute_fingerprint()
+        if fingerprint != self._fingerprint:
+            with self._lock:
+                self._fingerprint = fingerprint
+                self._entries.clear()
+                self._stats['invalidations'] += 1
+
+    def set_model_version(self, model_version, model_path=None):
+        """Switch model version (and file); cached entries of the old version stop matching"""
+        self.model_version = model_version
+        if model_path is not None:
+            self.model_path = model_path
+        self._last_model_check = 0
+        self._check_model()
+
+    def make_key(self, image_bytes, model_version=None):
+        """Key for an image; pass the version that will serve the request rather than relying on the current one"""
+        if model_version is not None:
+            return f"{model_version}:{hash_image_bytes(image_bytes)}"
+        self._check_model()
+        return f"{self._fingerprint}:{hash_image_bytes(image_bytes)}"
+
+    def _get_collection(self):
+        if self.collection_getter is None:
+            return None
+        try:
+            return self.collection_getter()
+        except Exception as e:
+            print(f"⚠️ Prediction cache persistent tier unavailable: {e}")
+            return None
+
+    def get(self, key):
+        """Return the cached probability row for key, or None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                probabilities, expires_at = entry
+                if expires_at >= now:
+                    self._entries.move_to_end(key)
+                    self._stats['memoryHits'] += 1
+                    return probabilities
+                del self._entries[key]
+                self._stats['expirations'] += 1
+
+        collection = self._get_collection()
+        if collection is not None:
+            try:
+                doc = collection.find_one({'_id': key}, {'probabilities': 1, 'createdAt': 1})
+                if doc is not None and not self._is_expired(doc.get('createdAt')):
+                    probabilities = np.asarray(doc['probabilities'], dtype=np.float32)
+                    self._put_memory(key, probabilities)
+                    with self._lock:
+                        self._stats['persistentHits'] += 1
+                    return probabilities
+            except Exception as e:
+                print(f"⚠️ Prediction cache lookup failed: {e}")
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key, probabilities, model_version=None):
+        """Store a probability row in both tiers"""
+        probabilities = np.asarray(probabilities, dtype=np.float32)
+        self._put_memory(key, probabilities)
+
+        collection = self._get_collection()
+        if collection is not None:
+            try:
+                collection.replace_one(
+                    {'_id': key},
+                    {
+                        '_id': key,
+                        'modelVersion': model_version or self.model_version,
+                        'probabilities': [float(p) for p in probabilities],
+                        'createdAt': datetime.datetime.utcnow()
+                    },
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"⚠️ Prediction cache write failed: {e}")
+
+    def _put_memory(self, key, probabilities):
+        with self._lock:
+            self._entries[key] = (probabilities, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def _is_expired(self, created_at):
+        if created_at is None:
+            return True
+        age = (datetime.datetime.utcnow() - created_at).total_seconds()
+        return age > self.ttl_seconds
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            size = len(self._entries)
+
+        hits = stats['memoryHits'] + stats['persistentHits']
+        lookups = hits + stats['misses']
+        return {
+            **stats,
+            'hits': hits,
+            'hitRatio': round(hits / lookups, 4) if lookups else 0,
+            'size': size,
+            'maxEntries': self.max_entries,
+            'ttlSeconds': self.ttl_seconds,
+            'persistent': self.collection_getter is not None,
+            'modelVersion': self.model_version
+        }
@@ -0,0 +1,201 @@
+import os
+import time
+import datetime
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from utils.running_stats import PredictionStatistics
+
+load_dotenv()
+
+PREDICTION_HISTORY_CAPACITY = int(os.getenv('PREDICTION_HISTORY_CAPACITY', 100000))
+
+
+def local_utc_offset():
+    """Seconds to add to an epoch timestamp to get local wall-clock time"""
+    return datetime.datetime.now().astimezone().utcoffset().total_seconds()
+
+
+class PredictionHistory:
+    """Fixed-capacity ring buffer of recent predictions with columnar storage.
+
+    Confidence, timestamp (epoch seconds), result class code and method code
+    live in preallocated numpy arrays, so memory stays flat under sustained
+    traffic and analytics run as vectorized array operations. Result and
+    method strings are interned into small code tables. ``statistics`` holds
+    streaming aggregates over every prediction since startup, including ones
+    already evicted from the ring.
+    """
+
+    def __init__(self, capacity=PREDICTION_HISTORY_CAPACITY):
+        self.capacity = max(1, int(capacity))
+        self._confidence = np.zeros(self.capacity, dtype=np.float32)
+        self._timestamp = np.zeros(self.capacity, dtype=np.float64)
+        self._class_code = np.zeros(self.capacity, dtype=np.int16)
+        self._method_code = np.zeros(self.capacity, dtype=np.int16)
+        self._filename = np.empty(self.capacity, dtype=object)
+        self._class_labels = []
+        self._class_index = {}
+        self._method_labels = []
+        self._method_index = {}
+        self._next = 0
+        self._size = 0
+        self._total_appended = 0
+        self._version = 0
+        self._lock = threading.Lock()
+        self.statistics = PredictionStatistics()
+
+    def _code(self, value, labels, index):
+        code = index.get(value)
+        if code is None:
+            code = len(labels)
+            labels.append(value)
+            index[value] = code
+        return code
+
+    def append(self, result, confidence, method, filename=None, timestamp=None):
+        """Record one prediction"""
+        with self._lock:
+            i = self._next
+            self._confidence[i] = confidence
+            self._timestamp[i] = time.time() if timestamp is None else timestamp
+            self._class_code[i] = self._code(result, self._class_labels, self._class_index)
+            self._method_code[i] = self._code(method, self._method_labels, self._method_index)
+            self._filename[i] = filename
+            self._advance(1)
+        self.statistics.update(result, float(confidence), method)
+
+    def extend(self, results, confidences, method, filenames=None, timestamp=None):
+        """Record a batch of predictions sharing one method and timestamp"""
+        count = len(results)
+        if count == 0:
+            return
+        timestamp = time.time() if timestamp is None else timestamp
+        filenames = filenames if filenames is not None else [None] * count
+
+        with self._lock:
+            class_codes = [self._code(result, self._class_labels, self._class_index) for result in results]
+            method_code = self._code(method, self._method_labels, self._method_index)
+
+            # Only the newest `capacity` entries can survive
+            start = max(0, count - self.capacity)
+            positions = (self._next + np.arange(count - start)) % self.capacity
+            self._confidence[positions] = np.asarray(confidences[start:], dtype=np.float32)
+            self._timestamp[positions] = timestamp
+            self._class_code[positions] = class_codes[start:]
+            self._method_code[positions] = method_code
+            self._filename[positions] = list(filenames[start:])
+            self._advance(count - start)
+            self._total_appended += start
+        self.statistics.update_many(results, confidences, method)
+
+    def _advance(self, count):
+        self._next = (self._next + count) % self.capacity
+        self._size = min(self.capacity, self._size + count)
+        self._total_appended += count
+        self._version += 1
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    @property
+    def version(self):
+        """Bumped on every append/extend; lets caches detect new data"""
+        return self._version
+
+    @property
+    def total_appended(self):
+        """Predictions recorded since startup, including ones evicted from the ring"""
+        return self._total_appended
+
+    def _ordered(self, array):
+        """Oldest-to-newest copy of a column"""
+        if self._size < self.capacity:
+            return array[:self._size].copy()
+        return np.concatenate((array[self._next:], array[:self._next]))
+
+    def snapshot(self):
+        """Consistent chronological copy of every column plus the code tables"""
+        with self._lock:
+            return {
+                'confidence': self._ordered(self._confidence),
+                'timestamp': self._ordered(self._timestamp),
+                'class_code': self._ordered(self._class_code),
+                'method_code': self._ordered(self._method_code),
+                'class_labels': list(self._class_labels),
+                'method_labels': list(self._method_labels)
+            }
+
+    def confidences(self):
+        with self._lock:
+            return self._ordered(self._confidence)
+
+    def timestamps(self):
+        """Epoch seconds, oldest first"""
+        with self._lock:
+            return self._ordered(self._timestamp)
+
+    def local_datetimes(self):
+        """Timestamps as naive local datetime64 values, oldest first"""
+        return ((self.timestamps() + local_utc_offset()) * 1e6).astype('datetime64[us]')
+
+    def class_codes(self):
+        with self._lock:
+            return self._ordered(self._class_code)
+
+    def method_codes(self):
+        with self._lock:
+            return self._ordered(self._method_code)
+
+    @property
+    def class_labels(self):
+        with self._lock:
+            return list(self._class_labels)
+
+    @property
+    def method_labels(self):
+        with self._lock:
+            return list(self._method_labels)
+
+    def class_counts(self):
+        """{result label: count} over the buffer"""
+        with self._lock:
+            codes = self._class_code[:self._size]
+            counts = np.bincount(codes, minlength=len(self._class_labels))
+            return {label: int(counts[i]) for i, label in enumerate(self._class_labels) if counts[i]}
+
+    def method_counts(self):
+        """{method: count} over the buffer"""
+        with self._lock:
+            codes = self._method_code[:self._size]
+            counts = np.bincount(codes, minlength=len(self._method_labels))
+            return {label: int(counts[i]) for i, label in enumerate(self._method_labels) if counts[i]}
+
+    def tumor_count(self):
+        """Number of predictions whose result is a tumor"""
+        return sum(count for label, count in self.class_counts().items() if "No Tumor" not in label)
+
+    def recent(self, limit):
+        """Newest `limit` predictions as dicts (oldest first), like the old list entries"""
+        with self._lock:
+            count = min(max(0, int(limit)), self._size)
+            positions = (self._next - count + np.arange(count)) % self.capacity
+            offset = local_utc_offset()
+            return [
+                {
+                    "timestamp": datetime.datetime.utcfromtimestamp(self._timestamp[i] + offset).isoformat(),
+                    "filename": self._filename[i],
+                    "result": self._class_labels[self._class_code[i]],
+                    "confidence": float(self._confidence[i]),
+                    "method": self._method_labels[self._method_code[i]]
+                }
+                for i in positions
+            ]
+
+    def nbytes(self):
+        """Memory held by the numeric columns (constant for a given capacity)"""
+        return (self._confidence.nbytes + self._timestamp.nbytes + self._class_code.nbytes
+                + self._method_code.nbytes + self._filename.nbytes)
@@ -0,0 +1,42 @@
+from io import BytesIO
+import numpy as np
+
+# Model input size (128x128 RGB, normalized to 0-1)
+IMAGE_SIZE = 128
+IMAGE_SHAPE = (IMAGE_SIZE, IMAGE_SIZE, 3)
+
+
+def preprocess_image(source, out=None):
+    """Load, resize and normalize one image into a (128, 128, 3) float32 array
+
+    ``source`` may be a file path, a file-like object or raw image bytes, so
+    uploads can be decoded straight from memory without touching disk.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = BytesIO(source)
+
+    # Deferred: importing Keras pulls in TensorFlow, which the web tier loads in the background
+    from keras.preprocessing.image import load_img
+    img = load_img(source, target_size=(IMAGE_SIZE, IMAGE_SIZE))
+
+    if out is None:
+        out = np.empty(IMAGE_SHAPE, dtype=np.float32)
+    out[...] = np.asarray(img, dtype=np.float32)
+    out *= 1.0 / 255.0
+    return out
+
+
+def preprocess_batch(sources):
+    """Decode a list of images into one preallocated (N, 128, 128, 3) float32 array"""
+    batch = np.empty((len(sources), *IMAGE_SHAPE), dtype=np.float32)
+    for i, source in enumerate(sources):
+        preprocess_image(source, out=batch[i])
+    return batch
+
+
+def warmup_preprocessing():
+    """Decode one in-memory PNG so the first upload doesn't pay for importing Keras and PIL"""
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new('RGB', (IMAGE_SIZE, IMAGE_SIZE)).save(buffer, format='PNG')
+    preprocess_image(buffer.getvalue())
@@ -0,0 +1,328 @@
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import marshal
+import cProfile
+import pstats
+import datetime
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Off by default; flip at runtime with POST /api/admin/profiling or force one
+# request with the X-Profile header (admin token required)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.01))
+# 'sampling' (stack samples, low overhead) or 'cprofile' (deterministic, exact call counts)
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'sampling')
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5))
+PROFILE_ROUTES = [route.strip() for route in os.getenv('PROFILE_ROUTES', '/api/predict').split(',') if route.strip()]
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'data/profiles')
+# Oldest profiles are deleted beyond this many
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', 50))
+
+PROFILE_MODES = ('sampling', 'cprofile')
+# Paths below this share of a cProfile run are dropped from the flame graph export
+FLAME_MIN_SECONDS = 0.0001
+FLAME_MAX_DEPTH = 128
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name  # built-in
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, thread_id, interval_ms=PROFILE_SAMPLE_INTERVAL_MS):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000.0
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+
+def collapse_pstats(stats):
+    """Collapsed stacks (microseconds) from a cProfile call graph.
+
+    cProfile keeps caller/callee edges, not full stacks, so each function's
+    own time is split over its callers in proportion to the time of each
+    edge. Paths under FLAME_MIN_SECONDS are pruned.
+    """
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    lines = Counter()
+
+    def walk(func, path, on_path, share):
+        _, _, own_time, total_time, _ = stats[func]
+        stack = path + (_function_label(func),)
+        micros = int(own_time * share * 1e6)
+        if micros > 0:
+            lines[';'.join(stack)] += micros
+        if len(stack) >= FLAME_MAX_DEPTH:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_total = stats[callee][3]
+            callee_share = share * (edge_time / callee_total if callee_total else 0.0)
+            if callee in on_path or callee_total * callee_share < FLAME_MIN_SECONDS:
+                continue
+            walk(callee, stack, on_path | {callee}, callee_share)
+
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            walk(func, (), frozenset([func]), 1.0)
+    return lines
+
+
+class ProfileSession:
+    """One request being profiled"""
+
+    def __init__(self, mode, reason):
+        self.mode = mode
+        self.reason = reason
+        self.profile_id = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}"
+        self.started_at = datetime.datetime.utcnow()
+        self._start = time.perf_counter()
+        self._profiler = None
+        self._sampler = None
+        if mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+
+    def stop(self):
+        """Stop capturing; returns the request duration in seconds"""
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        return time.perf_counter() - self._start
+
+
+class RequestProfiler:
+    """Opt-in per-request profiling with a bounded on-disk ring of results.
+
+    Requests are profiled when an admin sends ``X-Profile`` (value: a mode or
+    1), or when profiling is enabled and the route is in PROFILE_ROUTES, for
+    a PROFILE_SAMPLE_RATE fraction of requests. Only the thread serving the
+    request is captured; time spent waiting on the inference engine shows up
+    as the wait in ``engine.predict``.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, max_files=PROFILE_MAX_FILES, enabled=PROFILING_ENABLED,
+                 sample_rate=PROFILE_SAMPLE_RATE, mode=PROFILE_MODE, routes=PROFILE_ROUTES):
+        self.directory = directory
+        self.max_files = max(1, int(max_files))
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.mode = mode if mode in PROFILE_MODES else 'sampling'
+        self.routes = set(routes)
+        # cProfile hooks are per interpreter: only one deterministic profile at a time
+        self._cprofile_slot = threading.Semaphore(1)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='profile-writer')
+        self._lock = threading.Lock()
+        self._stats = {'captured': 0, 'skippedBusy': 0, 'errors': 0}
+
+    def configure(self, enabled=None, sample_rate=None, mode=None, routes=None):
+        """Runtime toggle from the admin endpoint; raises ValueError (JSON "false" must not enable anything)"""
+        if enabled is not None and not isinstance(enabled, bool):
+            raise ValueError("enabled must be true or false")
+        if sample_rate is not None and (isinstance(sample_rate, bool) or not isinstance(sample_rate, (int, float))
+                                        or not 0.0 <= sample_rate <= 1.0):
+            raise ValueError("sampleRate must be a number between 0 and 1")
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"mode must be one of {', '.join(PROFILE_MODES)}")
+        if routes is not None and (not isinstance(routes, list) or not all(isinstance(route, str) for route in routes)):
+            raise ValueError("routes must be a list of route templates")
+        with self._lock:
+            if enabled is not None:
+                self.enabled = enabled
+            if sample_rate is not None:
+                self.sample_rate = float(sample_rate)
+            if mode is not None:
+                self.mode = mode
+            if routes is not None:
+                self.routes = set(routes)
+
+    def maybe_start(self, route, forced_mode=None):
+        """ProfileSession for this request, or None (the common, near-free case)"""
+        if forced_mode is not None:
+            mode = forced_mode if forced_mode in PROFILE_MODES else self.mode
+            reason = 'header'
+        elif self.enabled and route in self.routes and random.random() < self.sample_rate:
+            mode = self.mode
+            reason = 'sampled'
+        else:
+            return None
+
+        if mode == 'cprofile' and not self._cprofile_slot.acquire(blocking=False):
+            with self._lock:
+                self._stats['skippedBusy'] += 1
+            return None
+        try:
+            return ProfileSession(mode, reason)
+        except Exception:
+            if mode == 'cprofile':
+                self._cprofile_slot.release()
+            raise
+
+    def finish(self, session, method, route, status):
+        """Stop a session and write it to the ring in the background"""
+        duration = session.stop()
+        if session.mode == 'cprofile':
+            self._cprofile_slot.release()
+            session._profiler.create_stats()
+            payload = session._profiler.stats
+        else:
+            payload = dict(session._sampler.counts)
+
+        meta = {
+            'id': session.profile_id,
+            'mode': session.mode,
+            'reason': session.reason,
+            'method': method,
+            'route': route,
+            'status': status,
+            'durationMs': round(duration * 1000, 3),
+            'startedAt': session.started_at.isoformat(),
+            'samples': sum(payload.values()) if session.mode == 'sampling' else None
+        }
+        self._writer.submit(self._write, meta, payload)
+        return meta
+
+    def _path(self, profile_id, suffix):
+        return os.path.join(self.directory, f"{profile_id}.{suffix}")
+
+    def _write(self, meta, payload):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            if meta['mode'] == 'cprofile':
+                # Same format as cProfile's dump_stats: loadable with pstats or snakeviz
+                with open(self._path(meta['id'], 'prof'), 'wb') as f:
+                    marshal.dump(payload, f)
+            else:
+                with open(self._path(meta['id'], 'collapsed'), 'w') as f:
+                    f.writelines(f"{stack} {count}\n" for stack, count in payload.items())
+            # Metadata last: a profile is listed only once its data is complete
+            with open(self._path(meta['id'], 'json'), 'w') as f:
+                json.dump(meta, f)
+            with self._lock:
+                self._stats['captured'] += 1
+            self._trim()
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            print(f"⚠️ Error saving profile {meta['id']}: {e}")
+
+    def _trim(self):
+        """Delete the oldest profiles beyond max_files (ids sort by capture time)"""
+        for profile_id in self._ids()[:-self.max_files]:
+            for suffix in ('json', 'prof', 'collapsed'):
+                try:
+                    os.remove(self._path(profile_id, suffix))
+                except FileNotFoundError:
+                    pass
+
+    def _ids(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len('.json')] for name in names if name.endswith('.json'))
+
+    def list_profiles(self):
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(self._path(profile_id, 'json')) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def get_profile(self, profile_id):
+        """(metadata, data file path) for a stored profile; raises KeyError"""
+        if profile_id not in self._ids():
+            raise KeyError(profile_id)
+        with open(self._path(profile_id, 'json')) as f:
+            meta = json.load(f)
+        return meta, self._path(profile_id, 'prof' if meta['mode'] == 'cprofile' else 'collapsed')
+
+    def collapsed_stacks(self, profile_id):
+        """Flame-graph input (``frame;frame;frame value`` lines) for a stored profile"""
+        meta, path = self.get_profile(profile_id)
+        if meta['mode'] == 'sampling':
+            with open(path) as f:
+                return f.read()
+        stats = pstats.Stats(path).stats
+        lines = collapse_pstats(stats)
+        return ''.join(f"{stack} {value}\n" for stack, value in lines.most_common())
+
+    def top_functions(self, profile_id, limit=30):
+        """Functions by cumulative time for a cProfile run"""
+        meta, path = self.get_profile(profile_id)
+        if meta['mode'] != 'cprofile':
+            return None
+        stats = pstats.Stats(path).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            {
+                'function': _function_label(func),
+                'calls': calls,
+                'ownMs': round(own_time * 1000, 3),
+                'cumulativeMs': round(total_time * 1000, 3)
+            }
+            for func, (_, calls, own_time, total_time, _) in rows
+        ]
+
+    def get_config(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'sampleRate': self.sample_rate,
+                'mode': self.mode,
+                'routes': sorted(self.routes),
+                'sampleIntervalMs': PROFILE_SAMPLE_INTERVAL_MS,
+                'directory': self.directory,
+                'maxFiles': self.max_files,
+                **self._stats
+            }
+
+
+request_profiler = RequestProfiler()
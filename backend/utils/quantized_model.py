@@ -0,0 +1,86 @@
+import os
+import bisect
+import threading
+import numpy as np
+import tensorflow as tf
+from utils.preprocessing import IMAGE_SHAPE
+from utils.compiled_model import WARMUP_BATCH_SIZES, BatchPredictor
+
+
+def _quantize_input(batch, details):
+    scale, zero_point = details['quantization']
+    if details['dtype'] == np.float32 or not scale:
+        return batch.astype(details['dtype'], copy=False)
+    return np.round(batch / scale + zero_point).astype(details['dtype'])
+
+
+def _dequantize_output(output, details):
+    scale, zero_point = details['quantization']
+    if details['dtype'] == np.float32 or not scale:
+        return output.astype(np.float32, copy=False)
+    return (output.astype(np.float32) - zero_point) * scale
+
+
+class QuantizedModel(BatchPredictor):
+    """TFLite interpreters for the quantized CPU variant of the model.
+
+    Exposes the same ``__call__`` / ``predict`` / ``warmup`` interface as
+    CompiledModel, so the serving code does not care which variant is active.
+    Batches are zero-padded up to the next of ``batch_sizes`` (default
+    INFERENCE_WARMUP_BATCH_SIZES) and each size has its own interpreter,
+    allocated once, so a change of batch size never reallocates tensors.
+    Larger batches run in chunks of the largest size.
+    """
+
+    def __init__(self, model_path, num_threads=None, batch_sizes=None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.input_shape = IMAGE_SHAPE
+        self.batch_sizes = sorted({int(size) for size in batch_sizes or WARMUP_BATCH_SIZES if int(size) > 0}) or [1]
+        self._interpreters = {}
+        self._create_lock = threading.Lock()
+        # Fail at load time on a bad file rather than on the first request
+        self._interpreter_for(self.batch_sizes[0])
+
+    def count_params(self):
+        """Approximate parameter count is not available for TFLite; report file size instead"""
+        return f"{os.path.getsize(self.model_path) / (1024 * 1024):.1f} MB (TFLite)"
+
+    def _interpreter_for(self, batch_size):
+        """(interpreter, input details, output details, lock) allocated for ``batch_size``"""
+        slot = self._interpreters.get(batch_size)
+        if slot is None:
+            with self._create_lock:
+                slot = self._interpreters.get(batch_size)
+                if slot is None:
+                    interpreter = tf.lite.Interpreter(model_path=self.model_path, num_threads=self.num_threads)
+                    interpreter.resize_tensor_input(
+                        interpreter.get_input_details()[0]['index'], [batch_size, *self.input_shape])
+                    interpreter.allocate_tensors()
+                    # An interpreter is not thread-safe; different sizes can run concurrently
+                    slot = self._interpreters[batch_size] = (
+                        interpreter, interpreter.get_input_details()[0], interpreter.get_output_details()[0],
+                        threading.Lock()
+                    )
+        return slot
+
+    def __call__(self, batch):
+        """Run one forward pass on a (N, 128, 128, 3) float32 array"""
+        batch = np.asarray(batch, dtype=np.float32)
+        count = len(batch)
+        index = bisect.bisect_left(self.batch_sizes, count)
+        if index == len(self.batch_sizes):
+            return self.predict(batch, chunk_size=self.batch_sizes[-1])
+
+        batch_size = self.batch_sizes[index]
+        if batch_size != count:
+            padded = np.zeros((batch_size, *batch.shape[1:]), dtype=np.float32)
+            padded[:count] = batch
+            batch = padded
+
+        interpreter, input_details, output_details, lock = self._interpreter_for(batch_size)
+        with lock:
+            interpreter.set_tensor(input_details['index'], _quantize_input(batch, input_details))
+            interpreter.invoke()
+            output = interpreter.get_tensor(output_details['index'])
+        return _dequantize_output(output[:count], output_details)
@@ -0,0 +1,229 @@
+import math
+import threading
+import numpy as np
+
+HIGH_CONFIDENCE_THRESHOLD = 0.8
+LOW_CONFIDENCE_THRESHOLD = 0.5
+# Confidence lives in [0, 1], so a fixed-bin histogram gives quantiles within 1/bins
+QUANTILE_SKETCH_BINS = 1000
+
+
+class RunningStats:
+    """Welford mean/variance plus min/max; mergeable with Chan's parallel update"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def update_many(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        batch = RunningStats()
+        batch.count = len(values)
+        batch.mean = float(values.mean())
+        batch.m2 = float(((values - batch.mean) ** 2).sum())
+        batch.min = float(values.min())
+        batch.max = float(values.max())
+        self.merge(batch)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Population variance (matches np.std's default)"""
+        return self.m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count = data['count']
+        stats.mean = data['mean']
+        stats.m2 = data['m2']
+        stats.min = data['min'] if data['min'] is not None else math.inf
+        stats.max = data['max'] if data['max'] is not None else -math.inf
+        return stats
+
+
+class QuantileSketch:
+    """Fixed-bin histogram over [0, 1]; merging is adding counts"""
+
+    def __init__(self, bins=QUANTILE_SKETCH_BINS):
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+
+    def _bin(self, values):
+        return np.clip((np.asarray(values, dtype=np.float64) * self.bins).astype(np.int64), 0, self.bins - 1)
+
+    def update(self, value):
+        self.counts[self._bin(value)] += 1
+
+    def update_many(self, values):
+        self.counts += np.bincount(self._bin(values), minlength=self.bins)
+
+    def merge(self, other):
+        self.counts += other.counts
+        return self
+
+    def quantile(self, q):
+        """Approximate q-quantile (bin midpoint), None when empty"""
+        total = int(self.counts.sum())
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        index = int(np.searchsorted(np.cumsum(self.counts), rank, side='right'))
+        return (min(index, self.bins - 1) + 0.5) / self.bins
+
+    def to_dict(self):
+        nonzero = np.nonzero(self.counts)[0]
+        return {'bins': self.bins, 'counts': {int(i): int(self.counts[i]) for i in nonzero}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['bins'])
+        for index, count in data['counts'].items():
+            sketch.counts[int(index)] = count
+        return sketch
+
+
+class PredictionStatistics:
+    """Streaming aggregates behind /api/results/statistics.
+
+    Updated on every prediction, so reading them costs the same regardless of
+    history size. ``to_dict``/``from_dict``/``merge`` let aggregates from
+    several worker processes be combined.
+    """
+
+    def __init__(self):
+        self.overall = RunningStats()
+        self.by_class = {}
+        self.method_counts = {}
+        self.high_confidence = 0
+        self.low_confidence = 0
+        self.sketch = QuantileSketch()
+        self._lock = threading.Lock()
+
+    def update(self, result, confidence, method):
+        with self._lock:
+            self.overall.update(confidence)
+            self.by_class.setdefault(result, RunningStats()).update(confidence)
+            self.method_counts[method] = self.method_counts.get(method, 0) + 1
+            self.high_confidence += int(confidence > HIGH_CONFIDENCE_THRESHOLD)
+            self.low_confidence += int(confidence < LOW_CONFIDENCE_THRESHOLD)
+            self.sketch.update(confidence)
+
+    def update_many(self, results, confidences, method):
+        confidences = np.asarray(confidences, dtype=np.float64)
+        if len(confidences) == 0:
+            return
+        results = np.asarray(results, dtype=object)
+        with self._lock:
+            self.overall.update_many(confidences)
+            for result in set(results):
+                self.by_class.setdefault(result, RunningStats()).update_many(confidences[results == result])
+            self.method_counts[method] = self.method_counts.get(method, 0) + len(confidences)
+            self.high_confidence += int(np.count_nonzero(confidences > HIGH_CONFIDENCE_THRESHOLD))
+            self.low_confidence += int(np.count_nonzero(confidences < LOW_CONFIDENCE_THRESHOLD))
+            self.sketch.update_many(confidences)
+
+    def merge(self, other):
+        with self._lock:
+            self.overall.merge(other.overall)
+            for result, stats in other.by_class.items():
+                self.by_class.setdefault(result, RunningStats()).merge(stats)
+            for method, count in other.method_counts.items():
+                self.method_counts[method] = self.method_counts.get(method, 0) + count
+            self.high_confidence += other.high_confidence
+            self.low_confidence += other.low_confidence
+            self.sketch.merge(other.sketch)
+        return self
+
+    def __len__(self):
+        return self.overall.count
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'overall': self.overall.to_dict(),
+                'byClass': {result: stats.to_dict() for result, stats in self.by_class.items()},
+                'methodCounts': dict(self.method_counts),
+                'highConfidence': self.high_confidence,
+                'lowConfidence': self.low_confidence,
+                'sketch': self.sketch.to_dict()
+            }
+
+    @classmethod
+    def from_dict(cls, data):
+        statistics = cls()
+        statistics.overall = RunningStats.from_dict(data['overall'])
+        statistics.by_class = {result: RunningStats.from_dict(s) for result, s in data['byClass'].items()}
+        statistics.method_counts = dict(data['methodCounts'])
+        statistics.high_confidence = data['highConfidence']
+        statistics.low_confidence = data['lowConfidence']
+        statistics.sketch = QuantileSketch.from_dict(data['sketch'])
+        return statistics
+
+    def summary(self):
+        """Payload for /api/results/statistics"""
+        with self._lock:
+            total = self.overall.count
+            tumor_count = sum(
+                stats.count for result, stats in self.by_class.items()
+                if 'Tumor' in result and 'No Tumor' not in result
+            )
+            return {
+                "overall_statistics": {
+                    "total_predictions": total,
+                    "average_confidence": self.overall.mean,
+                    "confidence_std": self.overall.std,
+                    "min_confidence": self.overall.min,
+                    "max_confidence": self.overall.max,
+                    "median_confidence": self.sketch.quantile(0.5)
+                },
+                "class_statistics": {result: stats.count for result, stats in self.by_class.items()},
+                "method_statistics": dict(self.method_counts),
+                "confidence_by_class": {
+                    result: {"mean": stats.mean, "std": stats.std, "count": stats.count}
+                    for result, stats in self.by_class.items()
+                },
+                "performance_metrics": {
+                    "high_confidence_predictions": self.high_confidence,
+                    "low_confidence_predictions": self.low_confidence,
+                    "tumor_detection_rate": tumor_count / total if total else 0.0
+                }
+            }
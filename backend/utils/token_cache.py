@@ -0,0 +1,153 @@
+import os
+import time
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+JWT_CACHE_MAX_ENTRIES = int(os.getenv('JWT_CACHE_MAX_ENTRIES', 10000))
+# How often each process pulls tokens revoked by other processes
+JWT_DENYLIST_REFRESH_SECONDS = float(os.getenv('JWT_DENYLIST_REFRESH_SECONDS', 5))
+
+
+def token_digest(token):
+    """SHA-256 of the raw token; raw tokens are never kept in memory or MongoDB"""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class TokenCache:
+    """Bounded LRU of verified JWT payloads keyed by token digest, plus a revocation denylist.
+
+    Entries expire at the token's own ``exp``. Revoked digests live in the
+    ``revoked_tokens`` collection (TTL-indexed on ``expiresAt``) and in an
+    in-process mirror that a background thread refreshes every
+    JWT_DENYLIST_REFRESH_SECONDS, so a logout in one worker reaches the others
+    within that interval and lookups never touch the database.
+    """
+
+    def __init__(self, max_entries=JWT_CACHE_MAX_ENTRIES, collection_getter=None,
+                 refresh_interval=JWT_DENYLIST_REFRESH_SECONDS):
+        self.max_entries = max(1, int(max_entries))
+        self.collection_getter = collection_getter
+        self.refresh_interval = refresh_interval
+        self._entries = OrderedDict()
+        self._revoked = {}
+        self._refreshed_until = None
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'revokedRejections': 0, 'invalid': 0,
+                       'revocations': 0, 'verifications': 0, 'verifySeconds': 0.0}
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def get(self, digest):
+        """Cached payload for a digest, or None (miss, expired or revoked)"""
+        now = time.time()
+        self._ensure_refresher()
+        with self._lock:
+            if digest in self._revoked:
+                self._stats['revokedRejections'] += 1
+                return None
+            entry = self._entries.get(digest)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            payload, expires_at = entry
+            if expires_at <= now:
+                del self._entries[digest]
+                self._stats['expired'] += 1
+                return None
+            self._entries.move_to_end(digest)
+            self._stats['hits'] += 1
+            return payload
+
+    def is_revoked(self, digest):
+        with self._lock:
+            return digest in self._revoked
+
+    def put(self, digest, payload):
+        with self._lock:
+            self._entries[digest] = (payload, float(payload.get('exp', 0)))
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revoke(self, digest, expires_at):
+        """Deny a token until its exp (epoch seconds), here and in MongoDB"""
+        with self._lock:
+            self._entries.pop(digest, None)
+            self._revoked[digest] = float(expires_at)
+            self._stats['revocations'] += 1
+
+        if self.collection_getter is not None:
+            try:
+                self.collection_getter().update_one(
+                    {'_id': digest},
+                    {'$set': {
+                        'expiresAt': datetime.datetime.utcfromtimestamp(expires_at),
+                        'revokedAt': datetime.datetime.utcnow()
+                    }},
+                    upsert=True
+                )
+            except Exception as e:
+                print(f"⚠️ Could not persist token revocation: {e}")
+
+    def _ensure_refresher(self):
+        if self._refresher is not None or self.collection_getter is None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._refresh_loop, name='denylist-refresher', daemon=True)
+                self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            self._refresh_denylist()
+            time.sleep(self.refresh_interval)
+
+    def _refresh_denylist(self):
+        now = time.time()
+        with self._lock:
+            since = self._refreshed_until
+            # Drop denylist entries whose tokens have expired anyway
+            self._revoked = {digest: exp for digest, exp in self._revoked.items() if exp > now}
+
+        try:
+            refreshed_until = datetime.datetime.utcnow()
+            query = {'expiresAt': {'$gt': refreshed_until}}
+            if since is not None:
+                query['revokedAt'] = {'$gte': since}
+            revoked = {
+                document['_id']: document['expiresAt'].replace(tzinfo=datetime.timezone.utc).timestamp()
+                for document in self.collection_getter().find(query, {'expiresAt': 1})
+            }
+        except Exception as e:
+            print(f"⚠️ Could not refresh token denylist: {e}")
+            return
+
+        with self._lock:
+            self._revoked.update(revoked)
+            for digest in revoked:
+                self._entries.pop(digest, None)
+            # Small overlap so revocations committed during the query are not missed
+            self._refreshed_until = refreshed_until - datetime.timedelta(seconds=1)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._entries)
+            revoked = len(self._revoked)
+        lookups = stats['hits'] + stats['misses'] + stats['expired']
+        return {
+            **stats,
+            'entries': entries,
+            'maxEntries': self.max_entries,
+            'denylistSize': revoked,
+            'hitRate': stats['hits'] / lookups if lookups else 0.0,
+            'averageAuthMicros': stats['verifySeconds'] / stats['verifications'] * 1e6 if stats['verifications'] else 0.0
+        }
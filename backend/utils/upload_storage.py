@@ -0,0 +1,43 @@
+import os
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Persisting originals is an optional side effect, off the request path
+SAVE_UPLOADS = os.getenv('SAVE_UPLOADS', 'true').lower() in ('1', 'true', 'yes')
+UPLOAD_WRITER_THREADS = int(os.getenv('UPLOAD_WRITER_THREADS', 2))
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WRITER_THREADS, thread_name_prefix='upload-writer')
+
+
+def _write_file(data, filepath):
+    """Write bytes to a temp file and atomically move it into place"""
+    try:
+        tmp_path = f"{filepath}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, filepath)
+    except Exception as e:
+        print(f"⚠️ Error saving upload {filepath}: {e}")
+
+
+def save_upload_async(data, filepath):
+    """Schedule a background write of the original upload; returns a Future or None if disabled"""
+    if not SAVE_UPLOADS:
+        return None
+    try:
+        return _executor.submit(_write_file, data, filepath)
+    except RuntimeError:
+        # Writer already shut down (process exiting): save it inline
+        _write_file(data, filepath)
+        return None
+
+
+def shutdown_upload_writer(wait=True):
+    """Finish pending writes (call on shutdown)"""
+    _executor.shutdown(wait=wait)
+
+
+atexit.register(shutdown_upload_writer)
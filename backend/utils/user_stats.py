@@ -0,0 +1,226 @@
+import math
+import heapq
+import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# Length of the capped recentPredictionIds list kept on each rollup
+USER_STATS_RECENT_LIMIT = 5
+# Ids of the latest documents folded into each rollup; an id already listed is not counted again
+USER_STATS_APPLIED_LIMIT = 200
+# Per-user retries when live writes keep landing while its rollup is rebuilt
+REBUILD_ATTEMPTS = 3
+DUPLICATE_KEY_ERROR = 11000
+
+
+def _contribution(collection, document):
+    """$inc one document adds to its user's rollup
+
+    ``predictions`` documents count towards totalPredictions and the tumor
+    distribution (the population the summary always reported); every
+    document with a confidence (single predictions and completed batch
+    images) counts as an analysed image.
+    """
+    inc = {}
+    if collection == 'predictions':
+        inc['totalPredictions'] = 1
+        if document.get('tumorType'):
+            inc[f"tumorTypeCounts.{document['tumorType']}"] = 1
+    confidence = document.get('confidence')
+    if confidence is not None:
+        inc['imagesAnalyzed'] = 1
+        inc['confidenceSum'] = confidence
+        inc['confidenceSumSq'] = confidence * confidence
+    return inc
+
+
+def _rollup_update(collection, user_id, entries, now):
+    """Upserting $inc for ``entries`` that only applies if none of their ids was folded in yet
+
+    When some id is already listed the filter misses the existing rollup and
+    the upsert fails with a duplicate key error instead of counting twice.
+    """
+    inc = {'version': 1}
+    for _, contribution in entries:
+        for key, value in contribution.items():
+            inc[key] = inc.get(key, 0) + value
+    ids = [document['_id'] for document, _ in entries]
+    update = {
+        '$inc': inc,
+        '$set': {'updatedAt': now},
+        '$push': {'appliedIds': {'$each': ids, '$slice': -USER_STATS_APPLIED_LIMIT}}
+    }
+    if collection == 'predictions':
+        update['$push']['recentPredictionIds'] = {'$each': ids, '$slice': -USER_STATS_RECENT_LIMIT}
+    return UpdateOne({'_id': user_id, 'appliedIds': {'$nin': ids}}, update, upsert=True)
+
+
+def rollup_updates(collection, documents):
+    """One idempotent upserting $inc per user for a set of freshly inserted documents
+
+    Returns the updates and, per update, the (document, contribution) pairs
+    it covers so a rejected update can be retried document by document.
+    """
+    per_user = {}
+    for document in documents:
+        user_id = document.get('userId')
+        if user_id is None:
+            continue
+        contribution = _contribution(collection, document)
+        if contribution:
+            per_user.setdefault(user_id, []).append((document, contribution))
+
+    now = datetime.datetime.utcnow()
+    updates = [_rollup_update(collection, user_id, entries, now) for user_id, entries in per_user.items()]
+    return updates, list(per_user.items())
+
+
+def _bulk_rollups(db, updates):
+    """Run rollup updates; returns the indexes rejected with a duplicate key error"""
+    try:
+        db.user_stats.bulk_write(updates, ordered=False)
+        return []
+    except BulkWriteError as e:
+        rejected = []
+        for error in e.details.get('writeErrors', []):
+            if error.get('code') == DUPLICATE_KEY_ERROR:
+                rejected.append(error['index'])
+            else:
+                print(f"⚠️ Error updating user_stats rollups: {error.get('errmsg')}")
+        return rejected
+
+
+def apply_rollups(db, collection, documents):
+    """Fold newly written documents into user_stats (errors are logged; rebuild repairs drift)"""
+    if collection not in ('predictions', 'batch_results'):
+        return
+    updates, groups = rollup_updates(collection, documents)
+    if not updates:
+        return
+    try:
+        rejected = _bulk_rollups(db, updates)
+        if not rejected:
+            return
+
+        # A rejected group holds an id that was already counted, or lost a race to
+        # create the rollup: retry each document alone, repeats are rejected again
+        now = datetime.datetime.utcnow()
+        retries = [
+            _rollup_update(collection, groups[index][0], [entry], now)
+            for index in rejected for entry in groups[index][1]
+        ]
+        _bulk_rollups(db, retries)
+    except Exception as e:
+        print(f"⚠️ Error updating user_stats rollups: {e}")
+
+
+def summarize(rollup, recent_activity=None):
+    """Analytics summary payload from a user_stats document (or None) and its recent predictions"""
+    rollup = rollup or {}
+    images = rollup.get('imagesAnalyzed', 0)
+    mean = rollup.get('confidenceSum', 0.0) / images if images else 0.0
+    variance = rollup.get('confidenceSumSq', 0.0) / images - mean * mean if images else 0.0
+    return {
+        'totalPredictions': rollup.get('totalPredictions', 0),
+        'imagesAnalyzed': images,
+        'tumorDistribution': rollup.get('tumorTypeCounts', {}),
+        'averageConfidence': mean,
+        'confidenceStd': math.sqrt(max(0.0, variance)),
+        'recentActivity': recent_activity or [],
+        'updatedAt': rollup.get('updatedAt')
+    }
+
+
+def _keep_newest(heap, item, limit):
+    if len(heap) < limit:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+
+def _recount(db, match):
+    """Stream predictions and batch_results once; per user, the totals and the newest counted ids"""
+    rollups = {}
+    for collection in ('predictions', 'batch_results'):
+        cursor = db[collection].find(match, {'userId': 1, 'tumorType': 1, 'confidence': 1, 'createdAt': 1})
+        for document in cursor:
+            contribution = _contribution(collection, document)
+            if not contribution:
+                continue
+            inc, applied, recent = rollups.setdefault(document['userId'], ({}, [], []))
+            for key, value in contribution.items():
+                inc[key] = inc.get(key, 0) + value
+            newest = (document.get('createdAt') or datetime.datetime.min, document['_id'])
+            _keep_newest(applied, newest, USER_STATS_APPLIED_LIMIT)
+            if collection == 'predictions':
+                _keep_newest(recent, newest, USER_STATS_RECENT_LIMIT)
+    return rollups
+
+
+def _rollup_document(user_id, counted, version):
+    inc, applied, recent = counted or ({}, [], [])
+    document = {
+        '_id': user_id, 'totalPredictions': 0, 'imagesAnalyzed': 0, 'tumorTypeCounts': {},
+        'confidenceSum': 0.0, 'confidenceSumSq': 0.0
+    }
+    for key, value in inc.items():
+        if key.startswith('tumorTypeCounts.'):
+            document['tumorTypeCounts'][key.split('.', 1)[1]] = value
+        else:
+            document[key] = value
+    document['appliedIds'] = [document_id for _, document_id in sorted(applied)]
+    document['recentPredictionIds'] = [document_id for _, document_id in sorted(recent)]
+    document['version'] = version + 1
+    document['updatedAt'] = datetime.datetime.utcnow()
+    return document
+
+
+def _swap(db, user_id, counted, version):
+    """Install a recounted rollup unless a live update landed since ``version`` was read"""
+    document = _rollup_document(user_id, counted, version or 0)
+    if version is None:
+        try:
+            db.user_stats.insert_one(document)
+            return True
+        except DuplicateKeyError:
+            return False
+    return db.user_stats.replace_one({'_id': user_id, 'version': version}, document).matched_count == 1
+
+
+def rebuild_user_stats(db, user_id=None):
+    """Recompute rollups from predictions and batch_results; returns the number rebuilt
+
+    Each rollup is recounted from the source documents and swapped in with
+    one replace conditioned on the version read before the recount; every
+    live $inc bumps that version, so a rollup that changed meanwhile is
+    recounted again instead of being overwritten. The swapped-in rollup
+    lists the newest ids it counted, so a live $inc for one of them that
+    lands afterwards is rejected rather than counted twice. Users with no
+    documents left end up at zero.
+    """
+    scope = {} if user_id is None else {'_id': user_id}
+    # Rollups written before versioning start at version 0
+    db.user_stats.update_many({**scope, 'version': {'$exists': False}}, {'$set': {'version': 0}})
+    versions = {document['_id']: document['version'] for document in db.user_stats.find(scope, {'version': 1})}
+
+    match = {'userId': {'$exists': True}} if user_id is None else {'userId': user_id}
+    counted = _recount(db, match)
+
+    rebuilt = 0
+    retry = []
+    for uid in set(versions) | set(counted):
+        if _swap(db, uid, counted.get(uid), versions.get(uid)):
+            rebuilt += 1
+        else:
+            retry.append(uid)
+
+    for uid in retry:
+        for _ in range(REBUILD_ATTEMPTS):
+            current = db.user_stats.find_one({'_id': uid}, {'version': 1})
+            version = current.get('version', 0) if current else None
+            if _swap(db, uid, _recount(db, {'userId': uid}).get(uid), version):
+                rebuilt += 1
+                break
+        else:
+            print(f"⚠️ user_stats for {uid} kept changing during the rebuild; run it again")
+    return rebuilt
@@ -0,0 +1,319 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from dotenv import load_dotenv
+from utils.preprocessing import IMAGE_SHAPE
+
+load_dotenv()
+
+# 0 disables the pool and keeps inference in the web process
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 0))
+# Per-worker intra-op threads; 0 = size of the worker's core set
+INFERENCE_WORKER_THREADS = int(os.getenv('INFERENCE_WORKER_THREADS', 0))
+INFERENCE_WORKER_TIMEOUT = float(os.getenv('INFERENCE_WORKER_TIMEOUT', 30))
+
+NUM_CLASSES = 4
+HEALTH_CHECK_INTERVAL = 2.0
+
+
+def is_worker_process():
+    """True inside a spawned inference or chart worker (which re-imports the main module)"""
+    return mp.current_process().name.startswith(('inference-worker-', 'chart-worker-'))
+
+
+def split_cores(num_workers):
+    """Split the CPUs available to this process into disjoint per-worker sets"""
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+
+    if num_workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(num_workers)]
+
+    per_worker = len(cores) // num_workers
+    return [cores[i * per_worker:(i + 1) * per_worker] for i in range(num_workers)]
+
+
+def _worker_main(worker_id, cores, intra_threads, model_path, model_variant, max_batch_size,
+                 input_name, output_name, conn):
+    """Inference worker: owns one model instance, reads inputs from shared memory"""
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    if model_variant == 'quantized':
+        from utils.quantized_model import QuantizedModel
+        model = QuantizedModel(model_path, num_threads=intra_threads)
+    else:
+        from tensorflow.keras.models import load_model
+        from utils.compiled_model import CompiledModel
+        model = CompiledModel(load_model(model_path))
+    model.warmup()
+
+    input_shm = shared_memory.SharedMemory(name=input_name)
+    output_shm = shared_memory.SharedMemory(name=output_name)
+    inputs = np.ndarray((max_batch_size, *IMAGE_SHAPE), dtype=np.float32, buffer=input_shm.buf)
+    outputs = np.ndarray((max_batch_size, NUM_CLASSES), dtype=np.float32, buffer=output_shm.buf)
+
+    conn.send(('ready', worker_id))
+    try:
+        while True:
+            message = conn.recv()
+            if message[0] == 'stop':
+                break
+
+            _, batch_size = message
+            try:
+                outputs[:batch_size] = model(inputs[:batch_size])
+                conn.send(('ok', batch_size))
+            except Exception as e:
+                conn.send(('error', str(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del inputs, outputs
+        input_shm.close()
+        output_shm.close()
+
+
+class _Worker:
+    def __init__(self, worker_id, cores, max_batch_size):
+        self.worker_id = worker_id
+        self.cores = cores
+        self.process = None
+        self.conn = None
+        self.input_shm = shared_memory.SharedMemory(
+            create=True, size=max_batch_size * int(np.prod(IMAGE_SHAPE)) * 4)
+        self.output_shm = shared_memory.SharedMemory(
+            create=True, size=max_batch_size * NUM_CLASSES * 4)
+        self.inputs = np.ndarray((max_batch_size, *IMAGE_SHAPE), dtype=np.float32, buffer=self.input_shm.buf)
+        self.outputs = np.ndarray((max_batch_size, NUM_CLASSES), dtype=np.float32, buffer=self.output_shm.buf)
+        self.requests = 0
+        self.restarts = 0
+        self.last_error = None
+
+    def release(self):
+        del self.inputs, self.outputs
+        self.input_shm.close()
+        self.input_shm.unlink()
+        self.output_shm.close()
+        self.output_shm.unlink()
+
+
+class InferenceWorkerPool:
+    """Pool of inference processes, each pinned to its own core set with its own model.
+
+    Tensors travel through per-worker shared-memory slots instead of being
+    pickled; only the batch size crosses the pipe. A worker that dies, times
+    out or drops its pipe is taken out of rotation, and the monitor thread
+    restarts it; it goes back into rotation only once it reports ready.
+    """
+
+    def __init__(self, model_path, model_variant='float', num_workers=INFERENCE_WORKERS,
+                 intra_threads=INFERENCE_WORKER_THREADS, max_batch_size=32, timeout=INFERENCE_WORKER_TIMEOUT):
+        self.model_path = model_path
+        self.model_variant = model_variant
+        self.num_workers = max(1, int(num_workers))
+        self.intra_threads = intra_threads
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+        self._ctx = mp.get_context('spawn')
+        self._workers = [
+            _Worker(i, cores, max_batch_size) for i, cores in enumerate(split_cores(self.num_workers))
+        ]
+        self._idle = queue.Queue()
+        # worker_id -> reason, for workers out of rotation until the monitor restarts them
+        self._failed = {}
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._running = False
+        self._monitor = None
+
+    def start(self, wait_ready=True):
+        """Spawn all workers and the health monitor"""
+        self._running = True
+        for worker in self._workers:
+            self._spawn(worker)
+        if wait_ready:
+            for worker in self._workers:
+                self._wait_ready(worker)
+                self._idle.put(worker)
+        self._monitor = threading.Thread(target=self._monitor_loop, name='inference-pool-monitor', daemon=True)
+        self._monitor.start()
+        print(f"✅ Inference worker pool started: {self.num_workers} workers")
+
+    def _spawn(self, worker):
+        parent_conn, child_conn = self._ctx.Pipe()
+        intra_threads = self.intra_threads or len(worker.cores)
+        worker.conn = parent_conn
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.worker_id, worker.cores, intra_threads, self.model_path, self.model_variant,
+                  self.max_batch_size, worker.input_shm.name, worker.output_shm.name, child_conn),
+            name=f'inference-worker-{worker.worker_id}',
+            daemon=True
+        )
+        worker.process.start()
+        child_conn.close()
+
+    def _wait_ready(self, worker, timeout=300):
+        if not worker.conn.poll(timeout):
+            raise RuntimeError(f"Inference worker {worker.worker_id} did not become ready")
+        worker.conn.recv()
+
+    def _restart(self, worker, reason):
+        """Replace a dead or wedged worker process (monitor thread only)"""
+        print(f"⚠️ Restarting inference worker {worker.worker_id}: {reason}")
+        worker.restarts += 1
+        if worker.process is not None and worker.process.is_alive():
+            worker.process.kill()
+        if worker.process is not None:
+            worker.process.join(timeout=5)
+        self._spawn(worker)
+        self._wait_ready(worker)
+
+    def _mark_failed(self, worker, reason):
+        """Keep a worker out of rotation and have the monitor restart it"""
+        worker.last_error = reason
+        with self._lock:
+            self._failed[worker.worker_id] = reason
+        self._wake.set()
+
+    def predict(self, batch, chunk_size=None):
+        """Run a (N, 128, 128, 3) float32 batch on the next idle worker"""
+        batch = np.asarray(batch, dtype=np.float32)
+        chunk_size = min(chunk_size or self.max_batch_size, self.max_batch_size)
+        if len(batch) > chunk_size:
+            return np.concatenate([
+                self.predict(batch[start:start + chunk_size])
+                for start in range(0, len(batch), chunk_size)
+            ])
+
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError("No inference worker available (all busy or restarting)")
+
+        healthy = True
+        try:
+            batch_size = len(batch)
+            worker.inputs[:batch_size] = batch
+            worker.conn.send(('predict', batch_size))
+
+            if not worker.conn.poll(self.timeout):
+                healthy = False
+                self._mark_failed(worker, 'timeout')
+                raise RuntimeError(f"Inference worker {worker.worker_id} timed out")
+
+            status, payload = worker.conn.recv()
+            if status != 'ok':
+                raise RuntimeError(f"Inference worker {worker.worker_id} failed: {payload}")
+
+            worker.requests += 1
+            return worker.outputs[:batch_size].copy()
+        except (EOFError, BrokenPipeError, ConnectionResetError) as e:
+            healthy = False
+            self._mark_failed(worker, f'connection lost ({e})')
+            raise RuntimeError(f"Inference worker {worker.worker_id} crashed") from e
+        finally:
+            if healthy:
+                self._idle.put(worker)
+
+    def __call__(self, batch):
+        return self.predict(batch)
+
+    def warmup(self, batch_sizes=None):
+        """Workers warm up their own model on spawn"""
+        return {}
+
+    def _take_idle(self, worker):
+        """Remove ``worker`` from the idle queue; False if a request holds it"""
+        with self._lock:
+            idle = []
+            found = False
+            while True:
+                try:
+                    candidate = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if candidate is worker:
+                    found = True
+                else:
+                    idle.append(candidate)
+            for candidate in idle:
+                self._idle.put(candidate)
+        return found
+
+    def _monitor_loop(self):
+        while self._running:
+            # Woken early when a request hands over a failed worker
+            self._wake.wait(HEALTH_CHECK_INTERVAL)
+            self._wake.clear()
+            for worker in self._workers:
+                if not self._running:
+                    return
+                if worker.process is not None and not worker.process.is_alive() and self._take_idle(worker):
+                    # A busy worker is reported by the request that holds it
+                    self._mark_failed(worker, f'exit code {worker.process.exitcode}')
+
+            with self._lock:
+                failed = dict(self._failed)
+            for worker_id, reason in failed.items():
+                if not self._running:
+                    return
+                worker = self._workers[worker_id]
+                try:
+                    self._restart(worker, reason)
+                except Exception as e:
+                    # Stays out of rotation; retried on the next pass
+                    worker.last_error = f'restart failed: {e}'
+                    print(f"❌ Failed to restart inference worker {worker.worker_id}: {e}")
+                    continue
+                with self._lock:
+                    self._failed.pop(worker_id, None)
+                self._idle.put(worker)
+
+    def stop(self):
+        """Stop workers and release shared memory"""
+        self._running = False
+        self._wake.set()
+        for worker in self._workers:
+            try:
+                worker.conn.send(('stop',))
+            except Exception:
+                pass
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(timeout=5)
+                if worker.process.is_alive():
+                    worker.process.kill()
+            worker.release()
+
+    def get_stats(self):
+        """Worker health and per-worker request counts"""
+        return {
+            'workers': self.num_workers,
+            'idleWorkers': self._idle.qsize(),
+            'restartingWorkers': len(self._failed),
+            'modelVariant': self.model_variant,
+            'details': [
+                {
+                    'id': worker.worker_id,
+                    'pid': worker.process.pid if worker.process else None,
+                    'alive': bool(worker.process and worker.process.is_alive()),
+                    'cores': worker.cores,
+                    'requests': worker.requests,
+                    'restarts': worker.restarts,
+                    'lastError': worker.last_error
+                }
+                for worker in self._workers
+            ]
+        }